@@ -2,48 +2,45 @@
 import os
 import re
 import json
+import asyncio
+import logging
 import requests
-from typing import Optional
+from typing import List, Optional
+from functools import partial
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.database import get_db
-from app.models import Note, File
-
-# --- OpenAI SDK ---
-from openai import OpenAI
-_openai_client: Optional[OpenAI] = None
-
-# --- Opsiyonel bağımlılıklar ---
-try:
-    import pdfplumber
-except ImportError:
-    pdfplumber = None
-
-try:
-    import pytesseract
-    from PIL import Image
-except ImportError:
-    pytesseract = None
-    Image = None
-
-try:
-    import whisper
-except ImportError:
-    whisper = None
+from app.models import Note
+from app.utils.folder_content import folder_content_parts
+from app.utils.context_builder import build_context, count_tokens, CONTEXT_MAP_SUMMARY_TOKENS
+from app.utils.folder_summary import refresh_part_summaries, store_folder_summary, reuse_report
+from app.utils.llm_cache import llm_cache, cache_key
+from app.utils.llm_client import chat, achat, astream_speech
+from app.utils.single_flight import llm_flight, flight_key
+from app.utils.retrieval import retrieve
+from app.utils.http_range import ranged_response
+from app.utils.tts_cache import tts_key, cached_tts, tee_to_cache
+from app.utils.presentation_engine import generate_deck, render_canva_payload, render_gamma_markdown, render_ppt_markdown
+from app.utils.llm_stream import stream_chat_completion, sse_event, sse_response
+
+logger = logging.getLogger("neurodraft.ai")
 
 # ===================== Config =====================
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY env değişkeni set edilmeli.")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# OpenAI istemcisi app.utils.llm_client'ta tektir (bağlantı havuzu, eşzamanlılık sınırı, retry)
 TEXT_MODEL = "gpt-4o-mini"
 TTS_MODEL = "gpt-4o-mini-tts"
 DEFAULT_TTS_VOICE = "verse"
+# /ai/note_batch: bundan kısa notlarda eksik işlemler tek JSON çağrısında birleştirilir
+NOTE_BATCH_MERGE_MAX_TOKENS = int(os.getenv("NOTE_BATCH_MERGE_MAX_TOKENS") or 4000)
 
 # Canva API
 CANVA_API_BASE = "https://api.canva.com/v1"
@@ -63,81 +60,94 @@ class TTSRequest(BaseModel):
     text: str
     voice: Optional[str] = None
 
-# ===================== Dosya/Not Yardımcıları =====================
-def extract_pdf_text(pdf_path: str) -> str:
-    if pdfplumber is None:
-        return "[pdfplumber yüklü değil]"
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            return "\n".join([page.extract_text() or "" for page in pdf.pages])
-    except Exception as e:
-        return f"[PDF okunamadı: {e}]"
-
-def extract_image_text(image_path: str) -> str:
-    if pytesseract is None or Image is None:
-        return "[pytesseract/Pillow yüklü değil]"
-    try:
-        img = Image.open(image_path)
-        return pytesseract.image_to_string(img, lang="tur")
-    except Exception as e:
-        return f"[Resimden metin okunamadı: {e}]"
-
-def transcribe_audio(audio_path: str) -> str:
-    if whisper is None:
-        return "[whisper yüklü değil]"
-    try:
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_path, language="tr")
-        return result["text"]
-    except Exception as e:
-        return f"[Ses dosyası çözümlenemedi: {e}]"
+class NoteBatchRequest(BaseModel):
+    note_id: Optional[int] = None
+    text: Optional[str] = None  # verilmezse not içeriği note_id'den okunur
+    operations: List[str]
+    no_cache: bool = False
 
+# ===================== Dosya/Not Yardımcıları =====================
 def get_folder_all_contents(db: Session, folder_id: int) -> str:
-    result = []
-    notes = db.query(Note).filter(Note.folder_id == folder_id).all()
-    files = db.query(File).filter(File.folder_id == folder_id).all()
-
-    for note in notes:
-        result.append(f"[Not: {note.title}]\n{note.content}")
-
-    for f in files:
-        if f.filetype == "pdf":
-            result.append(f"[PDF: {f.filename}]\n{extract_pdf_text(f.path)}")
-        elif f.filetype in ("mp3", "wav", "m4a", "audio"):
-            result.append(f"[Ses: {f.filename}]\n{transcribe_audio(f.path)}")
-        elif f.filetype in ("png", "jpg", "jpeg", "image"):
-            result.append(f"[Görsel: {f.filename}]\n{extract_image_text(f.path)}")
-        else:
-            result.append(f"[Dosya: {f.filename}] (Tip: {f.filetype})")
-
-    return "\n\n".join(result)
+    # Dosya metinleri File.extracted_text'ten okunur; yalnızca eksik/bayatsa yeniden çıkarılır.
+    # Token bütçesini aşan klasörler önce parça parça özetlenir (map-reduce)
+    return build_context(folder_content_parts(db, folder_id), summarize_chunk)
+
+def get_folder_chat_context(db: Session, folder_id: int, question: str) -> str:
+    # Tüm klasör yerine soruyla en ilgili parçalar; istem boyutu klasör büyüdükçe sabit kalır
+    return "\n\n".join(retrieve(db, folder_id, question))
+
+def summarize_chunk(chunk: str) -> str:
+    """Map adımı; ai_chat_openai önbellekli olduğu için değişmeyen parçalar tekrar ücretlendirilmez."""
+    prompt = (
+        "Aşağıdaki klasör içeriği parçasını, sonradan yapılacak genel özet ve sorular için "
+        "önemli bilgileri (kavramlar, tanımlar, sayılar, isimler) koruyarak Türkçe, kısa maddelerle özetle. "
+        "Köşeli parantezli kaynak başlıklarını koru.\n\n" + chunk
+    )
+    return ai_chat_openai(prompt, max_tokens=CONTEXT_MAP_SUMMARY_TOKENS, temperature=0.2)
 
 def get_note_content(db: Session, note_id: int) -> str:
     note = db.query(Note).filter(Note.id == note_id).first()
     return note.content if note else ""
 
 # ===================== OpenAI Yardımcıları =====================
-def get_openai_client() -> OpenAI:
-    global _openai_client
-    if _openai_client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY ortam değişkeni tanımlı değil!")
-        _openai_client = OpenAI(api_key=api_key)
-    return _openai_client
-
-def ai_chat_openai(prompt: str, max_tokens: int = 512, temperature: float = 0.6) -> str:
-    resp = client.chat.completions.create(
-        model=TEXT_MODEL,
-        messages=[
-            {"role": "system", "content": "Sadece Türkçe, kısa ve doğrudan cevap ver."},
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=max_tokens,
-        temperature=temperature,
-        n=1,
-    )
-    return clean_ai_response(resp.choices[0].message.content or "")
+def chat_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": "Sadece Türkçe, kısa ve doğrudan cevap ver."},
+        {"role": "user", "content": prompt},
+    ]
+
+def chat_cache_key(prompt: str, max_tokens: int, temperature: float) -> str:
+    return cache_key(TEXT_MODEL, chat_messages(prompt), max_tokens, temperature)
+
+def ai_chat_openai(prompt: str, max_tokens: int = 512, temperature: float = 0.6, use_cache: bool = True) -> str:
+    # Thread'lerden (map-reduce, parça özetleri) çağrılır; async handler'lar ai_chat_openai_async kullanır
+    messages = chat_messages(prompt)
+    # Aynı içerik + aynı istem kısa süre önce sorulduysa model çağrılmaz
+    key = chat_cache_key(prompt, max_tokens, temperature)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+    else:
+        llm_cache.note_bypass()
+    # Aynı anahtarla uçuştaki çağrı varsa (çift tık, birden çok sekme) onun sonucu beklenir
+    return llm_flight.do(flight_key(key, use_cache), _complete_chat, key, messages, max_tokens, temperature, use_cache)
+
+def _complete_chat(key: str, messages: list, max_tokens: int, temperature: float, use_cache: bool = True) -> str:
+    if use_cache:
+        # Önceki lider ilk bakış ile liderlik arasında bitirip yazmış olabilir; model tekrar çağrılmasın
+        cached = llm_cache.get(key, count_miss=False)
+        if cached is not None:
+            return cached
+    resp = chat(model=TEXT_MODEL, messages=messages, max_tokens=max_tokens, temperature=temperature, n=1)
+    text = clean_ai_response(resp.choices[0].message.content or "")
+    # Bypass'ta da yazılır: istemci taze yanıt istediyse sonraki istekler onu görsün
+    llm_cache.put(key, TEXT_MODEL, text)
+    return text
+
+async def ai_chat_openai_async(prompt: str, max_tokens: int = 512, temperature: float = 0.6, use_cache: bool = True) -> str:
+    # Model yanıtı beklenirken thread tutulmaz; yalnızca önbellek (DB) erişimi thread havuzunda
+    messages = chat_messages(prompt)
+    key = chat_cache_key(prompt, max_tokens, temperature)
+    if use_cache:
+        cached = await run_in_threadpool(llm_cache.get, key)
+        if cached is not None:
+            return cached
+    else:
+        llm_cache.note_bypass()
+    # Senkron ai_chat_openai ile aynı uçuş tablosu: thread'deki çağrıyla da birleşir
+    return await llm_flight.ado(flight_key(key, use_cache), _acomplete_chat, key, messages, max_tokens, temperature, use_cache)
+
+async def _acomplete_chat(key: str, messages: list, max_tokens: int, temperature: float, use_cache: bool = True) -> str:
+    if use_cache:
+        # Önceki lider ilk bakış ile liderlik arasında bitirip yazmış olabilir; model tekrar çağrılmasın
+        cached = await run_in_threadpool(llm_cache.get, key, False)
+        if cached is not None:
+            return cached
+    resp = await achat(model=TEXT_MODEL, messages=messages, max_tokens=max_tokens, temperature=temperature, n=1)
+    text = clean_ai_response(resp.choices[0].message.content or "")
+    await run_in_threadpool(llm_cache.put, key, TEXT_MODEL, text)
+    return text
 
 def clean_ai_response(text: str) -> str:
     text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL | re.IGNORECASE)
@@ -157,119 +167,290 @@ def _post_to_canva(canva_payload: dict) -> dict:
     return {"ok": resp.status_code in (200, 201), "status": resp.status_code, "data": data}
 
 # ===================== FOLDER AI ENDPOINTS =====================
+# Akışlı ve akışsız uç noktalar aynı istemi kullanır; önbellek anahtarları ortak olur
+def folder_summary_prompt(content: str) -> str:
+    return f"Sen çok iyi bir özetleme asistanısın. Türkçe, 2-3 madde halinde, net yaz.\n\n{content}"
+
+def folder_chat_prompt(content: str, question: str) -> str:
+    return f"Klasör notlarının asistanısın. Türkçe, kısa ve net cevap ver.\n\n{content}\n---\nSoru: {question}"
+
+def note_summary_prompt(text: str) -> str:
+    return f"Türkçe, madde madde kısa özetle:\n\n{text}"
+
+def note_chat_prompt(content: str, question: str) -> str:
+    return f"Not asistanısın. Türkçe, kısa cevap ver:\n\n{content}\n---\nSoru: {question}"
+
+def note_title_prompt(text: str) -> str:
+    return f"Kısa ve etkileyici Türkçe başlık üret:\n\n{text}"
+
+def note_markdown_prompt(text: str) -> str:
+    return f"Markdown düzelt:\n\n{text}"
+
+def note_references_prompt(text: str) -> str:
+    return f"Not içindeki kaynak/atfı listele:\n\n{text}"
+
+# İşlem -> (istem, max_tokens, temperature); tekil uç noktalar ve /ai/note_batch aynı önbellek anahtarlarını paylaşır
+NOTE_OPERATIONS = {
+    "summary": (note_summary_prompt, 250, 0.3),
+    "title": (note_title_prompt, 20, 0.7),
+    "markdown": (note_markdown_prompt, 400, 0.2),
+    "references": (note_references_prompt, 250, 0.2),
+}
+# Birleşik çağrıda her alanın modele tarifi
+NOTE_OPERATION_SPECS = {
+    "summary": "Türkçe, madde madde kısa özet",
+    "title": "kısa ve etkileyici Türkçe başlık (tek satır)",
+    "markdown": "notun düzeltilmiş Markdown hali",
+    "references": "not içindeki kaynak/atıfların listesi",
+}
+
+async def note_operation(op: str, text: str, use_cache: bool = True) -> str:
+    prompt, max_tokens, temperature = NOTE_OPERATIONS[op]
+    return await ai_chat_openai_async(prompt(text), max_tokens=max_tokens, temperature=temperature, use_cache=use_cache)
+
+def summarize_part(text: str) -> str:
+    return ai_chat_openai(
+        f"Türkçe, 2-4 kısa madde halinde özetle; önemli kavram, tanım ve sayıları koru. Baştaki başlığı koru.\n\n{text}",
+        max_tokens=250, temperature=0.3,
+    )
+
 @router.post("/ai/folder_summary")
-def folder_summary(folder_id: int = Body(...), db: Session = Depends(get_db)):
-    content = get_folder_all_contents(db, folder_id)
-    if not content.strip():
+async def folder_summary(folder_id: int = Body(...), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    # Yalnızca içeriği değişen notlar yeniden özetlenir; klasör özeti parça özetlerinden kurulur
+    plan = await run_in_threadpool(refresh_part_summaries, db, folder_id, summarize_part)
+    if not plan["parts_total"]:
         return {"summary": "Bu klasörde özetlenecek içerik yok."}
-    prompt = f"Sen çok iyi bir özetleme asistanısın. Türkçe, 2-3 madde halinde, net yaz.\n\n{content}"
-    return {"summary": ai_chat_openai(prompt, max_tokens=350, temperature=0.3)}
+
+    rollup_reused = plan["stored_summary"] is not None and not no_cache
+    if rollup_reused:
+        summary = plan["stored_summary"]
+    else:
+        content = await run_in_threadpool(build_context, plan["part_summaries"], summarize_chunk)
+        summary = await ai_chat_openai_async(folder_summary_prompt(content), max_tokens=350, temperature=0.3, use_cache=not no_cache)
+        await run_in_threadpool(store_folder_summary, folder_id, plan["parts_hash"], summary)
+    return {"summary": summary, "reused": reuse_report({**plan, "rollup_reused": rollup_reused})}
 
 @router.post("/ai/folder_tags")
-def folder_tags(folder_id: int = Body(...), db: Session = Depends(get_db)):
-    content = get_folder_all_contents(db, folder_id)
+async def folder_tags(folder_id: int = Body(...), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    content = await run_in_threadpool(get_folder_all_contents, db, folder_id)
     prompt = f"Etiketleme uzmanısın. Türkçe kısa etiketler üret; virgülle ayır.\n\n{content}"
-    return {"tags": ai_chat_openai(prompt, max_tokens=80, temperature=0.4)}
+    return {"tags": await ai_chat_openai_async(prompt, max_tokens=80, temperature=0.4, use_cache=not no_cache)}
 
 @router.post("/ai/folder_presentation")
-def folder_presentation(folder_id: int = Body(...), style: Optional[str] = Body(None), push_to_canva: bool = Body(False), db: Session = Depends(get_db)):
-    content = get_folder_all_contents(db, folder_id)
+async def folder_presentation(folder_id: int = Body(...), style: Optional[str] = Body(None), push_to_canva: bool = Body(False), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    content = await run_in_threadpool(get_folder_all_contents, db, folder_id)
     if not content.strip():
         return {"presentation": {"title": "Boş Sunum", "slides": []}, "canva_payload": None, "ppt_markdown": ""}
 
-    style_hint = f"\nStil: {style}." if style else ""
-    system_msg = (
-        "Sadece GEÇERLİ JSON üret.\n"
-        '{ "title": "string", "slides": [ { "title": "string", "bullets": ["string",...], "notes": "string" } ] }\n'
-        "Bullets ≤5 madde, ≤15 kelime, notes kısa."
-    )
-    user_msg = f"Klasör içeriğinden 6-10 slayt arası Türkçe sunum üret.{style_hint}\n\n{content}"
-
-    raw = client.chat.completions.create(
-        model=TEXT_MODEL,
-        messages=[{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}],
-        max_tokens=1200,
-        temperature=0.7,
-        n=1,
-    )
-    try:
-        data = json.loads((raw.choices[0].message.content or "").strip())
-    except Exception:
-        data = {"title": "Otomatik Sunum", "slides": [{"title": "Özet", "bullets": ["İçerik analiz edildi."], "notes": ""}]}
-
-    slides = []
-    for s in data.get("slides", []):
-        title = s.get("title", "").strip()[:90]
-        bullets = [b.strip() for b in (s.get("bullets") or []) if b.strip()][:5]
-        notes = s.get("notes", "").strip()
-        if title and bullets:
-            slides.append({"title": title, "bullets": bullets, "notes": notes})
-    if len(slides) < 6:
-        while len(slides) < 6:
-            slides.append({"title": f"Ek {len(slides)+1}", "bullets": ["Önemli nokta"], "notes": ""})
-    elif len(slides) > 10:
-        slides = slides[:10]
-
-    presentation = {"title": data.get("title", "Sunum"), "slides": slides}
-    canva_payload = {"title": presentation["title"], "pages": [{"elements": [{"type": "heading", "text": s["title"]}, {"type": "bulleted_list", "items": s["bullets"]}], "notes": s.get("notes", "")} for s in slides]}
-    ppt_md = "\n".join([f"# {presentation['title']}"] + [f"## Slide {i+1}: {s['title']}\n" + "\n".join(f"- {b}" for b in s["bullets"]) for i, s in enumerate(slides)])
-
-    canva_result = _post_to_canva(canva_payload) if push_to_canva else None
-    return {"presentation": presentation, "canva_payload": canva_payload, "ppt_markdown": ppt_md, "canva_result": canva_result}
+    deck, cached = await generate_deck(content, TEXT_MODEL, style, use_cache=not no_cache)
+    canva_payload = render_canva_payload(deck)
+    canva_result = await run_in_threadpool(_post_to_canva, canva_payload) if push_to_canva else None
+    return {"presentation": deck, "canva_payload": canva_payload, "ppt_markdown": render_ppt_markdown(deck), "canva_result": canva_result, "cached": cached}
 
 @router.post("/ai/folder_chat")
-def folder_chat(folder_id: int = Body(...), question: str = Body(...), db: Session = Depends(get_db)):
-    content = get_folder_all_contents(db, folder_id)
-    prompt = f"Klasör notlarının asistanısın. Türkçe, kısa ve net cevap ver.\n\n{content}\n---\nSoru: {question}"
-    return {"answer": ai_chat_openai(prompt, max_tokens=350, temperature=0.5)}
+async def folder_chat(folder_id: int = Body(...), question: str = Body(...), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    content = await run_in_threadpool(get_folder_chat_context, db, folder_id, question)
+    return {"answer": await ai_chat_openai_async(folder_chat_prompt(content, question), max_tokens=350, temperature=0.5, use_cache=not no_cache)}
 
 # ===================== NOTE AI ENDPOINTS =====================
 @router.post("/ai/note_summary")
-def note_summary(note_id: int = Body(...), text: str = Body(...)):
-    return {"summary": ai_chat_openai(f"Türkçe, madde madde kısa özetle:\n\n{text}", max_tokens=250, temperature=0.3)}
+async def note_summary(note_id: int = Body(...), text: str = Body(...), no_cache: bool = Body(False)):
+    return {"summary": await note_operation("summary", text, use_cache=not no_cache)}
 
 @router.post("/ai/note_title")
-def note_title(note_id: int = Body(...), text: str = Body(...)):
-    return {"title": ai_chat_openai(f"Kısa ve etkileyici Türkçe başlık üret:\n\n{text}", max_tokens=20, temperature=0.7)}
+async def note_title(note_id: int = Body(...), text: str = Body(...), no_cache: bool = Body(False)):
+    return {"title": await note_operation("title", text, use_cache=not no_cache)}
 
 @router.post("/ai/note_markdown")
-def note_markdown(note_id: int = Body(...), text: str = Body(...)):
-    return {"markdown": ai_chat_openai(f"Markdown düzelt:\n\n{text}", max_tokens=400, temperature=0.2)}
+async def note_markdown(note_id: int = Body(...), text: str = Body(...), no_cache: bool = Body(False)):
+    return {"markdown": await note_operation("markdown", text, use_cache=not no_cache)}
 
 @router.post("/ai/note_chat")
-def note_chat(note_id: int = Body(...), question: str = Body(...), db: Session = Depends(get_db)):
-    content = get_note_content(db, note_id)
-    return {"answer": ai_chat_openai(f"Not asistanısın. Türkçe, kısa cevap ver:\n\n{content}\n---\nSoru: {question}", max_tokens=350, temperature=0.5)}
+async def note_chat(note_id: int = Body(...), question: str = Body(...), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    content = await run_in_threadpool(get_note_content, db, note_id)
+    return {"answer": await ai_chat_openai_async(note_chat_prompt(content, question), max_tokens=350, temperature=0.5, use_cache=not no_cache)}
 
 @router.post("/ai/note_references")
-def note_references(note_id: int = Body(...), text: str = Body(...)):
-    return {"references": ai_chat_openai(f"Not içindeki kaynak/atfı listele:\n\n{text}", max_tokens=250, temperature=0.2)}
+async def note_references(note_id: int = Body(...), text: str = Body(...), no_cache: bool = Body(False)):
+    return {"references": await note_operation("references", text, use_cache=not no_cache)}
+
+async def _merged_note_operations(ops: list, text: str) -> Optional[dict]:
+    """Eksik işlemleri tek JSON çağrısında üretir; yanıt eksik/bozuksa None (tek tek çağrılır)."""
+    fields = "\n".join(f'  "{op}": "{NOTE_OPERATION_SPECS[op]}"' for op in ops)
+    system_msg = "Sadece GEÇERLİ JSON üret. Türkçe yaz.\nŞema:\n{\n" + fields + "\n}"
+    try:
+        raw = await achat(
+            model=TEXT_MODEL,
+            messages=[{"role": "system", "content": system_msg}, {"role": "user", "content": text}],
+            max_tokens=sum(NOTE_OPERATIONS[op][1] for op in ops),
+            temperature=0.3,
+            n=1,
+            response_format={"type": "json_object"},
+        )
+        data = json.loads(raw.choices[0].message.content or "")
+    except Exception:
+        logger.warning("Birleşik not işlemi başarısız, tek tek denenecek (işlemler: %s)", ", ".join(ops), exc_info=True)
+        return None
+    results = {}
+    for op in ops:
+        value = data.get(op) if isinstance(data, dict) else None
+        if isinstance(value, list):
+            value = "\n".join(f"- {v}" for v in value if isinstance(v, str))
+        if not isinstance(value, str) or not clean_ai_response(value):
+            return None
+        results[op] = clean_ai_response(value)
+    return results
+
+@router.post("/ai/note_batch")
+async def note_batch(body: NoteBatchRequest, db: Session = Depends(get_db)):
+    """
+    summary/title/markdown/references işlemlerini tek istekte döner. Önbellekte olanlar
+    doğrudan gelir; eksikler kısa notlarda tek JSON çağrısında birleştirilir, aksi halde
+    eşzamanlı çağrılır. Sonuçlar işlem başına, tekil uç noktalarla aynı anahtarla saklanır.
+    """
+    ops = list(dict.fromkeys(body.operations))
+    unknown = [op for op in ops if op not in NOTE_OPERATIONS]
+    if not ops or unknown:
+        raise HTTPException(status_code=400, detail=f"Geçersiz işlem: {', '.join(unknown) or '(boş)'}. Geçerli: {', '.join(NOTE_OPERATIONS)}")
+    text = body.text
+    if text is None:
+        if body.note_id is None:
+            raise HTTPException(status_code=400, detail="text veya note_id verilmeli.")
+        text = await run_in_threadpool(get_note_content, db, body.note_id)
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Not içeriği boş.")
+
+    keys = {op: chat_cache_key(NOTE_OPERATIONS[op][0](text), *NOTE_OPERATIONS[op][1:]) for op in ops}
+    results = {}
+    if body.no_cache:
+        llm_cache.note_bypass()
+    else:
+        cached = await asyncio.gather(*(run_in_threadpool(llm_cache.get, keys[op]) for op in ops))
+        results = {op: value for op, value in zip(ops, cached) if value is not None}
+    cached_ops = list(results)
+    missing = [op for op in ops if op not in results]
+
+    merged = False
+    if len(missing) > 1 and count_tokens(text) <= NOTE_BATCH_MERGE_MAX_TOKENS:
+        produced = await _merged_note_operations(missing, text)
+        if produced is not None:
+            merged = True
+            results.update(produced)
+            for op, value in produced.items():
+                await run_in_threadpool(llm_cache.put, keys[op], TEXT_MODEL, value)
+    if not merged and missing:
+        values = await asyncio.gather(*(note_operation(op, text, use_cache=not body.no_cache) for op in missing))
+        results.update(zip(missing, values))
+
+    return {"results": {op: results[op] for op in ops}, "cached": cached_ops, "merged": merged}
+
+# ===================== SSE (akışlı) ENDPOINTS =====================
+# Yanıt parça parça "data: {"delta": ...}" olarak gelir, sonda "event: done" tam metni taşır.
+@router.post("/ai/folder_chat/stream")
+async def folder_chat_stream(request: Request, folder_id: int = Body(...), question: str = Body(...), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    content = await run_in_threadpool(get_folder_chat_context, db, folder_id, question)
+    messages = chat_messages(folder_chat_prompt(content, question))
+    return sse_response(stream_chat_completion(request, TEXT_MODEL, messages, 350, 0.5, use_cache=not no_cache))
+
+@router.post("/ai/note_chat/stream")
+async def note_chat_stream(request: Request, note_id: int = Body(...), question: str = Body(...), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    content = await run_in_threadpool(get_note_content, db, note_id)
+    messages = chat_messages(note_chat_prompt(content, question))
+    return sse_response(stream_chat_completion(request, TEXT_MODEL, messages, 350, 0.5, use_cache=not no_cache))
+
+@router.post("/ai/note_summary/stream")
+async def note_summary_stream(request: Request, note_id: int = Body(...), text: str = Body(...), no_cache: bool = Body(False)):
+    messages = chat_messages(note_summary_prompt(text))
+    return sse_response(stream_chat_completion(request, TEXT_MODEL, messages, 250, 0.3, use_cache=not no_cache))
+
+@router.post("/ai/folder_summary/stream")
+async def folder_summary_stream(request: Request, folder_id: int = Body(...), no_cache: bool = Body(False), db: Session = Depends(get_db)):
+    # Parça özetleri (değişenler) akıştan önce hazırlanır; yalnızca klasör özeti akıtılır
+    plan = await run_in_threadpool(refresh_part_summaries, db, folder_id, summarize_part)
+    rollup_reused = plan["stored_summary"] is not None and not no_cache
+    meta = sse_event({"reused": reuse_report({**plan, "rollup_reused": rollup_reused})}, event="meta")
+
+    if not plan["parts_total"] or rollup_reused:
+        text = plan["stored_summary"] or "Bu klasörde özetlenecek içerik yok."
+
+        async def stored_events():
+            yield meta
+            yield sse_event({"delta": text})
+            yield sse_event({"text": text, "cached": True}, event="done")
+        return sse_response(stored_events())
+
+    content = await run_in_threadpool(build_context, plan["part_summaries"], summarize_chunk)
+    messages = chat_messages(folder_summary_prompt(content))
+
+    async def rollup_events():
+        yield meta
+        async for event in stream_chat_completion(
+            request, TEXT_MODEL, messages, 350, 0.3, use_cache=not no_cache,
+            on_complete=partial(store_folder_summary, folder_id, plan["parts_hash"]),
+        ):
+            yield event
+    return sse_response(rollup_events())
 
 # ===================== OpenAI TTS =====================
+def _cached_audio_response(request: Request, key: str, path: str):
+    # Anahtar (metin, ses, model) içerikten türediği için dosya hiç değişmez; Range ile ileri/geri sarılabilir
+    return ranged_response(
+        request,
+        lambda: open(path, "rb"),
+        os.path.getsize(path),
+        media_type="audio/mpeg",
+        etag=f'"{key}"',
+        last_modified=os.path.getmtime(path),
+        disposition="inline",
+        cache_control="private, max-age=31536000, immutable",
+    )
+
 @router.post("/ai/note_audio_summary")
-def note_audio_summary(body: TTSRequest):
+async def note_audio_summary(body: TTSRequest, request: Request):
     text = (body.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="Metin boş olamaz.")
     voice = (body.voice or DEFAULT_TTS_VOICE).strip()
 
-    def audio_stream():
-        with client.audio.speech.with_streaming_response.create(model=TTS_MODEL, voice=voice, input=text) as resp:
-            for chunk in resp.iter_bytes():
-                yield chunk
-    return StreamingResponse(audio_stream(), media_type="audio/mpeg")
+    key = tts_key(text, voice, TTS_MODEL)
+    # Tekrar dinleme (ve <audio> ile sarma) için GET adresi; ilk yanıtta da bildirilir
+    headers = {"Content-Location": f"/ai/note_audio/{key}", "X-Audio-Key": key}
+    path = await run_in_threadpool(cached_tts, key)
+    if path:
+        response = _cached_audio_response(request, key, path)
+        response.headers.update(headers)
+        return response
+
+    # İlk sentez: parçalar istemciye akarken diske de yazılır. İstemci bağlantıyı
+    # kapatırsa akış iptal edilir, upstream yanıt kapanır ve yarım dosya atılır
+    return StreamingResponse(
+        tee_to_cache(key, astream_speech(model=TTS_MODEL, voice=voice, input=text)),
+        media_type="audio/mpeg",
+        headers=headers,
+    )
+
+@router.get("/ai/note_audio/{key}")
+async def note_audio(key: str, request: Request):
+    if not re.fullmatch(r"[0-9a-f]{64}", key):
+        raise HTTPException(status_code=404, detail="Ses bulunamadı!")
+    path = await run_in_threadpool(cached_tts, key)
+    if not path:
+        raise HTTPException(status_code=404, detail="Ses bulunamadı!")
+    return _cached_audio_response(request, key, path)
 
 
 @router.post("/ai/folder_presentation_gamma")
-def folder_presentation_gamma(
+async def folder_presentation_gamma(
     folder_id: int = Body(...),
     style: Optional[str] = Body(None),
+    no_cache: bool = Body(False),
     db: Session = Depends(get_db),
 ):
     """
     Gamma.app paste akışı için optimize edilmiş Markdown döndürür.
+    Deste /ai/folder_presentation ile ortaktır; aynı klasör + stil için yeniden üretilmez.
     """
-    content = get_folder_all_contents(db, folder_id)
+    content = await run_in_threadpool(get_folder_all_contents, db, folder_id)
     if not content.strip():
         return {
             "presentation": {"title": "Boş Sunum", "slides": []},
@@ -277,74 +458,10 @@ def folder_presentation_gamma(
             "gamma_tip_url": "https://gamma.app/create",
         }
 
-    style_hint = ""
-    if style:
-        style_hint = f"\nStil: {style}. Ton: net ve Türkçe. Başlıklar kısa, maddeler tek satır."
-
-    system_msg = (
-        "Sadece GEÇERLİ JSON üret. Markdown veya açıklama verme.\n"
-        "Şema:\n{\n"
-        '  "title": "string",\n'
-        '  "slides": [ {"title": "string", "bullets": ["string", ...], "notes": "string"} ]\n'
-        "}\n"
-        "Kurallar: bullets max 5 madde, her madde 15 kelimeyi aşmasın. 'notes' kısa olsun."
-    )
-    user_msg = (
-        f"Aşağıdaki içerikten 6-10 slayt arası sunum üret.{style_hint}\n\n"
-        f"İçerik:\n{content}"
-    )
-
-    raw = client.chat.completions.create(
-        model=TEXT_MODEL,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user",   "content": user_msg},
-        ],
-        max_tokens=1200,
-        temperature=0.7,
-        n=1,
-    )
-    txt = (raw.choices[0].message.content or "").strip()
-    try:
-        data = json.loads(txt)
-    except Exception:
-        data = {
-            "title": "Otomatik Sunum",
-            "slides": [
-                {"title": "Özet", "bullets": ["İçerik analiz edildi.", "JSON formatı alınamadı."], "notes": ""}
-            ],
-        }
-
-    title = (data.get("title") or "Sunum").strip()
-    slides_in = data.get("slides") or []
-    cleaned = []
-    for s in slides_in:
-        st = (s.get("title") or "").strip()[:90]
-        bullets = [b.strip() for b in (s.get("bullets") or []) if isinstance(b, str)]
-        bullets = [b for b in bullets if b][:5]
-        notes = (s.get("notes") or "").strip()
-        if st and bullets:
-            cleaned.append({"title": st, "bullets": bullets, "notes": notes})
-
-    if len(cleaned) < 6:
-        while len(cleaned) < 6:
-            cleaned.append({"title": f"Ek {len(cleaned)+1}", "bullets": ["Önemli nokta", "Örnek/çıkarım"], "notes": ""})
-    elif len(cleaned) > 10:
-        cleaned = cleaned[:10]
-
-    # --- Gamma paste-friendly Markdown ---
-    md_lines = [f"# {title}", ""]
-    for idx, s in enumerate(cleaned, start=1):
-        md_lines.append(f"## {s['title']}")
-        for b in s["bullets"]:
-            md_lines.append(f"- {b}")
-        if s.get("notes"):
-            md_lines.append(f"> Konuşmacı Notu: {s['notes']}")
-        md_lines.append("")
-    gamma_md = "\n".join(md_lines)
-
+    deck, cached = await generate_deck(content, TEXT_MODEL, style, use_cache=not no_cache)
     return {
-        "presentation": {"title": title, "slides": cleaned},
-        "gamma_markdown": gamma_md,
+        "presentation": deck,
+        "gamma_markdown": render_gamma_markdown(deck),
         "gamma_tip_url": "https://gamma.app/create",  # yeni sunum oluşturma
+        "cached": cached,
     }
\ No newline at end of file
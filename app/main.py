@@ -1,32 +1,80 @@
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.models import Base
 from app.database import engine, get_db
-from app.routes import folders, notes, file, demo_login, presentation
+from app.routes import folders, notes, file, demo_login, presentation, stats, search
 from app.auth import routes
 from .ai import router as ai_router
 from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from .utils.cleanup_demo import cleanup_expired_demo_sessions
+from .utils.executors import start_executors, shutdown_executors
+from .utils.whisper_models import evict_idle_models, warm_up_in_background
+from .utils.ingest_queue import start_workers, stop_workers
+from .utils.intake import UploadSizeLimitMiddleware
+from .utils.llm_cache import prune_llm_cache
+from .utils.search import ensure_search_index
+from .utils.schema_upgrade import ensure_schema
 from apscheduler.schedulers.background import BackgroundScheduler
 
 Base.metadata.create_all(bind=engine)
+# Var olan tablolara sonradan eklenen kolonlar; create_all bunları eklemez
+ensure_schema(engine)
+# Tam metin arama: SQLite'ta FTS5 burada kurulur; Postgres'te yalnızca migration'la kurulmuş dizin aranır
+ensure_search_index(engine)
 
 scheduler = BackgroundScheduler()
 scheduler.add_job(cleanup_expired_demo_sessions, 'interval', minutes=1)
+scheduler.add_job(evict_idle_models, 'interval', minutes=5)
+scheduler.add_job(prune_llm_cache, 'interval', minutes=30)
 scheduler.start()
 
 app = FastAPI()
+
+# uploaded_files altında statik servis edilmeyecek klasörler: ham yüklemeler ve
+# içerik adresli (tahmin edilebilir yollu) eski blob'lar/önizlemeler/sesler; bunlar yalnızca yetkili /files uçlarından okunur
+_PRIVATE_UPLOAD_DIRS = {"incoming", "blobs", "thumbs", "tts"}
+
+
+class PublicUploads(StaticFiles):
+    def get_path(self, scope) -> str:
+        path = super().get_path(scope)
+        if path.split(os.sep, 1)[0] in _PRIVATE_UPLOAD_DIRS:
+            raise StarletteHTTPException(status_code=404)
+        return path
+
+
+@app.on_event("startup")
+def start_background_services():
+    # Whisper modellerini ilk ses yüklemesinden önce belleğe al (tek registry, ana process)
+    warm_up_in_background()
+    # cpu worker process'lerini ilk yüklemeden önce aç
+    start_executors()
+    # Yükleme işlerini işleyen worker'lar; bu makinede yarım kalan işler hemen yeniden kuyruğa alınır
+    start_workers()
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    stop_workers()
+    shutdown_executors()
+
+
 app.include_router(folders.router)
 
 app.include_router(demo_login.router)
 
 
-app.mount("/uploaded_files", StaticFiles(directory="uploaded_files"), name="uploaded_files")
+app.mount("/uploaded_files", PublicUploads(directory="uploaded_files"), name="uploaded_files")
 app.include_router(presentation.router)
 app.include_router(file.router)
 app.include_router(notes.router)
 app.include_router(ai_router)
 app.include_router(routes.router)
+app.include_router(stats.router)
+app.include_router(search.router)
 
 origins = [
     "https://www.neurodrafts.com",     # Prod domainin
@@ -38,6 +86,9 @@ origins = [
 
 ]
 
+# Büyük yüklemeleri gövde tamamen okunmadan reddet
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=file.MAX_SIZE_MB * 1024 * 1024, path_pattern=r"/folders/\d+/files")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
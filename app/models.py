@@ -1,6 +1,6 @@
 from datetime import datetime
 from app.database import Base
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, UniqueConstraint, LargeBinary, func
 from sqlalchemy.orm import relationship
 
 
@@ -63,6 +63,19 @@ class Note(Base):
     folder = relationship("Folder", back_populates="notes")
     demo_session_id = Column(Integer, ForeignKey('demo_sessions.id'), nullable=True)
 
+class StoredBlob(Base):
+    """Aynı içerik (SHA-256) diskte tek kopya; File kayıtları ref_count ile paylaşır."""
+    __tablename__ = "stored_blobs"
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=True)
+    mime = Column(String, nullable=True)
+    stored_path = Column(String, nullable=True)  # sıkıştırılmış/arşivlenmiş artefakt
+    storage_codec = Column(String, nullable=True)  # store | deflate | zstd
+    extracted_text = Column(String, nullable=True)
+    extractor_version = Column(Integer, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class File(Base):
     __tablename__ = "files"
     id = Column(Integer, primary_key=True, index=True)
@@ -73,6 +86,82 @@ class File(Base):
     filetype = Column(String, nullable=False)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     extracted_text = Column(String, nullable=False)
+    extractor_version = Column(Integer, nullable=True)  # NULL: eski kayıt, metin varsa geçerli say
+    extracted_at = Column(DateTime, nullable=True)
+    blob_sha256 = Column(String(64), ForeignKey("stored_blobs.sha256"), nullable=True, index=True)
+    storage_codec = Column(String, nullable=True)  # store | deflate | zstd (eski kayıtlar ensure_schema'da doldurulur)
     folder = relationship("Folder", back_populates="files")
     user = relationship("User")
-    demo_session_id = Column(Integer, ForeignKey('demo_sessions.id'), nullable=True)
\ No newline at end of file
+    blob = relationship("StoredBlob")
+    demo_session_id = Column(Integer, ForeignKey('demo_sessions.id'), nullable=True)
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(String, primary_key=True)  # uuid4 hex
+    folder_id = Column(Integer, ForeignKey("folders.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    demo_session_id = Column(Integer, ForeignKey('demo_sessions.id'), nullable=True)
+    original_filename = Column(String, nullable=False)
+    raw_path = Column(String, nullable=False)  # işlenene kadar ham dosya burada durur
+    size = Column(Integer, nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    mime = Column(String, nullable=True)  # içerikten (magic bytes) tespit edilen tür
+    status = Column(String, default="queued", index=True)  # queued | running | done | failed
+    attempts = Column(Integer, default=0, nullable=False)
+    claimed_by = Column(String, nullable=True)  # "host:pid"; açılışta ölmüş process'in işleri geri alınır
+    error = Column(String, nullable=True)
+    result = Column(String, nullable=True)  # JSON
+    # FK yok: dosya/not sonradan silinse de iş kaydı kalabilsin
+    file_id = Column(Integer, nullable=True)
+    note_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class LLMCacheEntry(Base):
+    """LLM yanıt önbelleğinin kalıcı katmanı; anahtar (model, mesajlar, parametreler) hash'i."""
+    __tablename__ = "llm_cache_entries"
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    response = Column(String, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+class ContentSummary(Base):
+    """Klasördeki tek bir not/dosyanın özeti; içerik hash'i değişince bayat sayılır."""
+    __tablename__ = "content_summaries"
+    __table_args__ = (UniqueConstraint("source_type", "source_id", name="uq_content_summary_source"),)
+    id = Column(Integer, primary_key=True)
+    folder_id = Column(Integer, ForeignKey("folders.id"), nullable=False, index=True)
+    # FK yok: not/dosya silinince kayıt bir sonraki klasör özetinde temizlenir
+    source_type = Column(String, nullable=False)  # note | file
+    source_id = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    summary = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class FolderSummary(Base):
+    """Parça özetlerinden üretilen klasör özeti; parts_hash parça hash'lerinin sıralı özetidir."""
+    __tablename__ = "folder_summaries"
+    folder_id = Column(Integer, ForeignKey("folders.id"), primary_key=True)
+    parts_hash = Column(String(64), nullable=False)
+    summary = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class RetrievalChunk(Base):
+    """folder_chat araması için not/dosya metninin bir parçası ve vektörü (float16)."""
+    __tablename__ = "retrieval_chunks"
+    # Aynı kaynağı eşzamanlı dizinleyen iki istekten yalnızca biri yazabilir; index de (tür, id) aramalarına yeter
+    __table_args__ = (UniqueConstraint("source_type", "source_id", "chunk_index", name="uq_retrieval_chunk_source"),)
+    id = Column(Integer, primary_key=True)
+    # FK yok: klasör/not/dosya silinince parçalar ayrıca (veya ilk aramada) temizlenir
+    folder_id = Column(Integer, nullable=False, index=True)
+    source_type = Column(String, nullable=False)  # note | file
+    source_id = Column(Integer, nullable=False)
+    source_hash = Column(String(64), nullable=False)  # etiket + metin + embedder
+    chunk_index = Column(Integer, nullable=False)
+    label = Column(String, nullable=False)
+    text = Column(String, nullable=False)
+    embedder = Column(String, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
@@ -1,21 +1,31 @@
 import os
+import zipfile
+import mimetypes
 from datetime import datetime
 
-from fastapi import APIRouter, UploadFile, File as FastAPIFile, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File as FastAPIFile, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import File as FileModel, Folder, File, Note, DemoSession
+from app.models import File as FileModel, Folder, File, DemoSession, IngestJob
 from app.auth.routes import get_current_user, get_current_user_optional
-from app.utils.compression import compress_image, zip_any_file, get_mime_type
 from uuid import uuid4
-from app.utils.extractors import extract_text_auto
+from app.utils.ingest_queue import INCOMING_DIR, create_job, job_to_dict
+from app.utils.blob_store import release_ref, remove_released
+from app.utils.intake import stream_to_disk
+from app.utils.retrieval import remove_source
+from app.utils.compression import stored_content
+from app.utils.http_range import ranged_response
+from app.utils.executors import io_pool
+from app.utils.thumbnails import (
+    THUMBNAIL_SIZES, THUMBNAIL_DEFAULT_SIZE, thumbnail_supported, ensure_thumbnail, remove_thumbnails,
+)
 
 router = APIRouter()
 UPLOAD_DIR = "uploaded_files"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 MAX_SIZE_MB = 30  # Gerekirse değiştir
 
-@router.post("/folders/{folder_id}/files")
+@router.post("/folders/{folder_id}/files", status_code=202)
 async def upload_file(
     folder_id: int,
     file: UploadFile = FastAPIFile(...),
@@ -26,76 +36,50 @@ async def upload_file(
     if not folder:
         raise HTTPException(status_code=404, detail="Klasör bulunamadı!")
 
-    content = await file.read()
-    if len(content) > MAX_SIZE_MB * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="Dosya çok büyük!")
+    # Ham dosyayı parça parça diske yaz; çıkarma/sıkıştırma/kayıt işleri ingest worker'larında yapılır.
+    # İçerik özeti yazarken hesaplanır; aynı içerik daha önce işlendiyse worker onu yeniden kullanır.
+    job_id = uuid4().hex
+    raw_path = os.path.join(INCOMING_DIR, f"{job_id}_{os.path.basename(file.filename)}")
+    intake = await stream_to_disk(file, raw_path, MAX_SIZE_MB * 1024 * 1024)
 
-    # Geçici olarak kaydet
-    temp_id = str(uuid4())
-    filename = f"{temp_id}_{file.filename}"
-    temp_path = os.path.join(UPLOAD_DIR, filename)
-    with open(temp_path, "wb") as f:
-        f.write(content)
-
-    # MIME türünü bul
-    mime = get_mime_type(temp_path)
-
-    # --- 1. ADIM: Extract text from ORIGINAL FILE! ---
-    try:
-        extracted_text = extract_text_auto(temp_path, mime=mime)
-    except Exception as e:
-        print(f"Extract error: {e}")
-        extracted_text = None
-
-    # --- 2. ADIM: Sıkıştırma/optimizasyon (optional, prod için faydalı) ---
-    final_path = temp_path
-    if "image" in mime:
-        compressed_path = temp_path.rsplit('.', 1)[0] + "_compressed.jpg"
-        compress_image(temp_path, compressed_path)
-        os.remove(temp_path)
-        final_path = compressed_path
-    elif not ("image" in mime):
-        zipped_path = temp_path + ".zip"
-        zip_any_file(temp_path, zipped_path)
-        os.remove(temp_path)
-        final_path = zipped_path
-
-    # --- 3. ADIM: File kaydı ---
-    new_file = FileModel(
+    job = create_job(
+        db,
+        job_id=job_id,
         folder_id=folder_id,
+        original_filename=file.filename,
+        raw_path=intake.path,
+        size=intake.size,
+        sha256=intake.sha256,
+        mime=intake.mime,
         user_id=user.id,
-        filename=os.path.basename(final_path),
-        filepath=final_path,
-        filetype=mime,
-        extracted_text=extracted_text or ""  # NULL constraint hatasını engelle
     )
-    db.add(new_file)
-    db.commit()
-    db.refresh(new_file)
-
-    # --- 4. ADIM: Note olarak da kaydet (AI notu) ---
-    new_note = None
-    if extracted_text and extracted_text.strip():
-        new_note = Note(
-            folder_id=folder_id,
-            title=file.filename,
-            content=extracted_text,
-        )
-        db.add(new_note)
-        db.commit()
-        db.refresh(new_note)
-
     return {
-        "message": "Dosya başarıyla yüklendi, işlendi ve not olarak kaydedildi!",
-        "file_id": new_file.id,
-        "note_id": new_note.id if new_note else None,
-        "filename": new_file.filename,
-        "type": new_file.filetype,
-        "extracted_text_preview": extracted_text[:300] if extracted_text else None
+        "message": "Dosya alındı, işleniyor.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/ingest/jobs/{job.id}",
     }
 
 
-from fastapi import Request
+@router.get("/ingest/jobs/{job_id}")
+def get_ingest_job(
+    job_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user_optional),
+):
+    job = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+    if job and not user:
+        ip = request.client.host
+        demo_session = db.query(DemoSession).filter_by(ip_address=ip).first()
+        if not demo_session or job.demo_session_id != demo_session.id:
+            job = None
+    elif job and job.user_id != user.id and user.role != "admin":
+        job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="İş bulunamadı!")
+    return job_to_dict(job)
+
 
 @router.get("/folders/{folder_id}/files")
 async def list_files(
@@ -137,11 +121,21 @@ def delete_file(
         raise HTTPException(status_code=404, detail="File not found")
 
     file_path = file.filepath  # <--- DİKKAT! Senin modelinde yol/fiziksel isim neyse onu kullan
+    blob_sha256 = file.blob_sha256
+    thumbnail_key = _thumbnail_key(file)
 
-    # Önce DB'den sil
+    # Kayıt silme ve referans bırakma tek transaction'da; dosyalar ancak commit'ten sonra silinir
     db.delete(file)
+    released = release_ref(db, blob_sha256) if blob_sha256 else None
     db.commit()
+    remove_source(db, "file", file_id)
+
+    # İçerik paylaşılan bir blob'daysa yalnızca son referansla birlikte diskten silinir
+    if blob_sha256:
+        remove_released(db, [released])
+        return {"detail": "File and physical file deleted"}
 
+    remove_thumbnails(thumbnail_key)
     # Sonra dosyayı diskten sil (yoksa hata vermez)
     if file_path and os.path.exists(file_path):
         try:
@@ -152,13 +146,7 @@ def delete_file(
 
     return {"detail": "File and physical file deleted"}
 
-@router.get("/files/{file_id}/preview")
-def preview_file(
-    file_id: int,
-    request: Request,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user_optional),
-):
+def _accessible_file(file_id: int, request: Request, db: Session, user):
     if not user:
         # DEMO kullanıcısı ise:
         ip = request.client.host
@@ -178,20 +166,79 @@ def preview_file(
 
     if not file:
         raise HTTPException(status_code=404, detail="Dosya bulunamadı!")
+    return file
+
+
+def _thumbnail_key(file) -> str:
+    # Blob'a bağlı dosyalarda içerik hash'i; eski kayıtlarda dosya id'si
+    return file.blob_sha256 or f"file-{file.id}"
+
+
+@router.get("/files/{file_id}/preview")
+def preview_file(
+    file_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user_optional),
+):
+    file = _accessible_file(file_id, request, db, user)
+
+    # Zip'liyse üye arşivden doğrudan akıtılır; geçici dosya yok, Range ile seek edilebilir
+    try:
+        content = stored_content(file.filepath, file.storage_codec)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı!")
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=500, detail="Dosya okunamadı!")
+
+    download_name = file.filename if file.blob_sha256 else content.name
+    media_type = mimetypes.guess_type(content.name)[0] or file.filetype or "application/octet-stream"
+    if file.blob_sha256:
+        etag = f'"{file.blob_sha256}"'
+    else:
+        etag = f'"{file.id}-{int(content.mtime)}-{content.size}"'
+    return ranged_response(
+        request,
+        content.open,
+        content.size,
+        media_type=media_type,
+        etag=etag,
+        last_modified=content.mtime,
+        filename=download_name,
+    )
+
 
-    # Eğer .zip dosyasıysa aç
-    if file.filepath.endswith(".zip"):
-        import zipfile, tempfile, os
-        with zipfile.ZipFile(file.filepath, "r") as zipf:
-            namelist = zipf.namelist()
-            if not namelist:
-                raise HTTPException(status_code=404, detail="Zip dosyası boş!")
-            tmp_dir = tempfile.mkdtemp()
-            member = namelist[0]
-            out_path = os.path.join(tmp_dir, member)
-            zipf.extract(member, tmp_dir)
-            from fastapi.responses import FileResponse
-            return FileResponse(out_path, filename=member)
-    # Zipsiz ise direkt dosyayı göster
-    from fastapi.responses import FileResponse
-    return FileResponse(file.filepath, filename=file.filename)
+@router.get("/files/{file_id}/thumbnail")
+async def file_thumbnail(
+    file_id: int,
+    request: Request,
+    size: int = THUMBNAIL_DEFAULT_SIZE,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user_optional),
+):
+    """Görseller için küçük resim, PDF'ler için ilk sayfa; ilk istekte üretilip diskte saklanır."""
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Geçersiz boyut! İzin verilenler: {THUMBNAIL_SIZES}")
+    file = _accessible_file(file_id, request, db, user)
+    if not thumbnail_supported(file.filetype):
+        raise HTTPException(status_code=404, detail="Bu dosya türü için önizleme yok.")
+
+    key = _thumbnail_key(file)
+    try:
+        path = await io_pool.run(ensure_thumbnail, key, file.filepath, file.filetype, size, file.storage_codec)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı!")
+    except Exception as e:
+        print(f"Önizleme üretilemedi: {file.id} - {e}")
+        raise HTTPException(status_code=500, detail="Önizleme üretilemedi!")
+
+    # Anahtar içerikten türediği için dosya hiç değişmez; tarayıcı bir daha sormasın
+    return ranged_response(
+        request,
+        lambda: open(path, "rb"),
+        os.path.getsize(path),
+        media_type="image/jpeg",
+        etag=f'"{key}-{size}"',
+        last_modified=os.path.getmtime(path),
+        cache_control="private, max-age=31536000, immutable",
+    )
@@ -5,6 +5,7 @@ from app.models import Folder, Note, File, DemoSession
 from app.database import get_db
 from app.auth.routes import get_current_user, get_current_user_optional
 from app.schemas import FolderCreate
+from app.utils.retrieval import drop_folder_chunks
 
 router = APIRouter()
 
@@ -42,6 +43,7 @@ def delete_folder(folder_id: int, db: Session = Depends(get_db), user=Depends(ge
     folder = db.query(Folder).filter(Folder.id == folder_id, Folder.user_id == user.id).first()
     if not folder and user.role != "admin":
         raise HTTPException(404, "Klasör bulunamadı veya yetkiniz yok.")
+    drop_folder_chunks(db, [folder_id])
     db.delete(folder)
     db.commit()
     return {"msg": "Klasör silindi."}
@@ -6,6 +6,7 @@ from app.models import Note, Folder, DemoSession
 from app.database import get_db
 from app.auth.routes import get_current_user_optional, get_current_user
 from app.schemas import NoteCreate
+from app.utils.retrieval import index_note, remove_source
 import shutil
 
 router = APIRouter()
@@ -51,6 +52,7 @@ def add_note(
     db.add(new_note)
     db.commit()
     db.refresh(new_note)
+    index_note(db, new_note)
     return new_note
 
 
@@ -116,6 +118,7 @@ def delete_note(note_id: int, db: Session = Depends(get_db), user=Depends(get_cu
         raise HTTPException(404, "Not bulunamadı veya yetkiniz yok.")
     db.delete(note)
     db.commit()
+    remove_source(db, "note", note_id)
     return {"msg": "Not silindi."}
 
 # NOTU DÜZENLE
@@ -134,4 +137,5 @@ def edit_note(note_id: int, note: NoteCreate, db: Session = Depends(get_db), use
     db_note.title = note.title   # <-- Bunu ekle!
     db.commit()
     db.refresh(db_note)
+    index_note(db, db_note)
     return db_note
\ No newline at end of file
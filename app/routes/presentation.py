@@ -1,14 +1,15 @@
 import os
-import json
 import requests
-from typing import Optional, List, Dict
+from typing import Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.database import get_db
-from app.ai import get_openai_client, get_folder_all_contents
+from app.ai import TEXT_MODEL, get_folder_all_contents
 from app.routes.canva import _get_valid_token, _owner_key
+from app.utils.presentation_engine import generate_deck, canva_pages
 
 router = APIRouter()
 
@@ -17,39 +18,8 @@ router = APIRouter()
 CANVA_CREATE_URL = os.getenv("CANVA_CREATE_URL", "https://api.canva.com/v1/designs")
 
 
-def _slides_to_canva_pages(presentation: Dict) -> List[Dict]:
-    """
-    OpenAI’dan dönen {title, slides[{title, bullets, notes}]} yapısını
-    Canva tarafında basit bir sayfa/eleman şemasına çeviriyoruz.
-    Gerçek Canva API şeman için sağlayıcı dokümantasyonunu izleyip
-    burayı ufak oynamalarla güncelle.
-    """
-    pages = []
-
-    # Kapak
-    pages.append({
-        "elements": [
-            {"type": "heading", "text": presentation["title"]},
-            {"type": "subheading", "text": "AI tarafından oluşturulan sunum"}
-        ],
-        "notes": ""
-    })
-
-    # İçerik
-    for s in presentation["slides"]:
-        pages.append({
-            "elements": [
-                {"type": "heading", "text": s["title"]},
-                {"type": "bulleted_list", "items": s["bullets"]},
-            ],
-            "notes": s.get("notes") or ""
-        })
-
-    return pages
-
-
 @router.post("/ai/folder_presentation_full")
-def folder_presentation_full(
+async def folder_presentation_full(
     request: Request,
     folder_id: int = Body(...),
     style: Optional[str] = Body(None),
@@ -62,71 +32,16 @@ def folder_presentation_full(
     4) link/ids frontend’e dön
     """
     # 1) İçerik
-    content = get_folder_all_contents(db, folder_id)
+    content = await run_in_threadpool(get_folder_all_contents, db, folder_id)
     if not content.strip():
         raise HTTPException(400, "Klasör boş.")
 
-    style_hint = f" Stil: {style}." if style else ""
-    system_msg = (
-        "Sadece GEÇERLİ JSON üret. Markdown ya da açıklama ekleme.\n"
-        "Şema:\n{\n"
-        '  "title": "string",\n'
-        '  "slides": [\n'
-        '    {"title": "string", "bullets": ["string", ...], "notes": "string"}\n'
-        "  ]\n"
-        "}\n"
-        "Kurallar: 6-10 slayt, bullets en fazla 5 madde; her madde 15 kelimeyi aşmasın. Türkçe yaz."
-    )
-    user_msg = (
-        f"Aşağıdaki içeriği {style_hint} sunuma çevir.\n\n"
-        f"İçerik:\n{content}"
-    )
-
-    # 2) OpenAI
-    client = get_openai_client()
-    raw = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-        max_tokens=1200,
-        temperature=0.7,
-        n=1,
-    )
-    text = (raw.choices[0].message.content or "").strip()
-    try:
-        presentation = json.loads(text)
-    except Exception:
-        presentation = {
-            "title": "Otomatik Sunum",
-            "slides": [
-                {"title": "Özet", "bullets": ["JSON üretimi başarısız.", "Manuel düzenleme gerekli olabilir."], "notes": ""}
-            ]
-        }
-
-    # Temizle / sınırla
-    pres_title = (presentation.get("title") or "Sunum").strip()[:90]
-    slides = presentation.get("slides") or []
-    cleaned = []
-    for s in slides:
-        t = (s.get("title") or "").strip()[:90]
-        bullets = [b.strip() for b in (s.get("bullets") or []) if isinstance(b, str)]
-        bullets = [b for b in bullets if b][:5]
-        notes = (s.get("notes") or "").strip()
-        if t and bullets:
-            cleaned.append({"title": t, "bullets": bullets, "notes": notes})
-    if len(cleaned) < 6:
-        while len(cleaned) < 6:
-            cleaned.append({"title": f"Ek {len(cleaned)+1}", "bullets": ["Önemli nokta", "Örnek/çıkarım"], "notes": ""})
-    elif len(cleaned) > 10:
-        cleaned = cleaned[:10]
-
-    presentation = {"title": pres_title, "slides": cleaned}
+    # 2) Deste (klasör içeriği + stil ile önbellekte; Canva/Gamma/PPT görünümleri ortak)
+    presentation, _ = await generate_deck(content, TEXT_MODEL, style)
 
     # 3) Canva’ya gönder
     owner = _owner_key(request)
-    access_token = _get_valid_token(owner)
+    access_token = await run_in_threadpool(_get_valid_token, owner)
     if not access_token:
         # FE: önce /canva/auth → izin ver → /canva/callback sonrası tekrar dener
         return {
@@ -142,11 +57,11 @@ def folder_presentation_full(
     payload = {
         "title": presentation["title"],
         "documentType": "presentation",
-        "pages": _slides_to_canva_pages(presentation),
+        "pages": canva_pages(presentation, cover=True),
     }
 
     try:
-        resp = requests.post(CANVA_CREATE_URL, headers=headers, json=payload, timeout=30)
+        resp = await run_in_threadpool(requests.post, CANVA_CREATE_URL, headers=headers, json=payload, timeout=30)
     except requests.RequestException as e:
         # Canva API erişilemezse: en azından taslağı döndür
         return {
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import DemoSession
+from app.auth.routes import get_current_user_optional
+from app.utils.search import search_contents, SEARCH_MAX_LIMIT, SEARCH_MAX_OFFSET
+
+router = APIRouter()
+
+
+# Not başlığı/içeriği ve dosya metinlerinde arama; sonuçlar kullanıcının (veya demo oturumunun) klasörleriyle sınırlı
+@router.get("/search")
+def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    folder_id: Optional[int] = None,
+    kind: Optional[str] = None,  # note | file; boşsa ikisi
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user_optional),
+):
+    if kind not in (None, "note", "file"):
+        raise HTTPException(400, "kind 'note' veya 'file' olmalı.")
+    if not user:
+        # DEMO kullanıcı
+        ip = request.client.host
+        demo_session = db.query(DemoSession).filter_by(ip_address=ip).first()
+        if not demo_session or demo_session.expires_at < datetime.utcnow():
+            raise HTTPException(403, "Demo süresi dolmuş veya aktif demo yok.")
+        scope = {"demo_session_id": demo_session.id}
+    elif user.role == "admin":
+        scope = {}
+    else:
+        scope = {"user_id": user.id}
+
+    kinds = (kind,) if kind else ("note", "file")
+    return search_contents(db, q.strip(), scope, folder_id=folder_id, kinds=kinds, limit=limit, offset=offset)
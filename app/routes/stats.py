@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.auth.routes import get_current_user
+from app.utils.executors import executor_stats
+from app.utils.ingest_queue import queue_stats
+from app.utils.llm_cache import llm_cache_stats
+from app.utils.llm_client import llm_client_stats
+from app.utils.single_flight import single_flight_stats
+from app.utils.tool_runner import tool_stats
+from app.utils.tts_cache import tts_cache_stats
+from app.utils.whisper_models import whisper_stats
+
+router = APIRouter()
+
+
+# Sadece admin: worker başına çalışma zamanı istatistikleri.
+# queue_stats senkron DB sorgusu yapar; sync handler FastAPI'nin thread havuzunda çalışır
+@router.get("/stats/runtime")
+def runtime_stats(user=Depends(get_current_user)):
+    if user.role != "admin":
+        raise HTTPException(403, "Yetkiniz yok.")
+    return {
+        "whisper": whisper_stats(),
+        "ingest": queue_stats(),
+        "executors": executor_stats(),
+        "tools": tool_stats(),
+        "llm_cache": llm_cache_stats(),
+        "openai": llm_client_stats(),
+        "tts_cache": tts_cache_stats(),
+        "coalescing": single_flight_stats(),
+    }
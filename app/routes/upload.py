@@ -1,15 +1,18 @@
+from datetime import datetime
 import os
+import shutil
 from fastapi import APIRouter, UploadFile, File as FastAPIFile, Form, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
 from app.models import File as FileModel, Note  # <-- Note modelini import et!
 from app.auth.routes import get_current_user
-from app.utils.compression import (
-    compress_image, compress_pdf, compress_audio, zip_any_file, get_mime_type
-)
-from app.utils.extractors import (
-    extract_text_from_pdf, extract_text_from_image, extract_text_from_audio
-)
+from app.utils.compression import compress_image, compress_pdf, compress_audio, CODEC_STORE
+from app.utils.tool_runner import ToolTimeout
+from app.utils.blob_store import materialize_and_acquire_async, BlobRefLost, staging_path, store_adaptive
+from app.utils.intake import stream_to_disk
+from app.utils.retrieval import index_file, index_note
+from app.utils.ingest_queue import INCOMING_DIR
 from uuid import uuid4
 
 router = APIRouter()
@@ -17,6 +20,30 @@ UPLOAD_DIR = "uploaded_files"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 MAX_SIZE_MB = int(os.getenv("MAX_SIZE_MB") or 32)
 
+
+def _compress_for_upload(original_path, base_path, mime):
+    """Bu uç noktanın profili: PDF için Ghostscript, ses için ffmpeg, gerisi içeriğe uygun codec."""
+    if "image" in mime:
+        compressed_path = base_path.rsplit('.', 1)[0] + "_compressed.jpg"
+        compress_image(original_path, staging_path(compressed_path))
+    elif "pdf" in mime:
+        compressed_path = base_path.rsplit('.', 1)[0] + "_compressed.pdf"
+        compress_pdf(original_path, staging_path(compressed_path))
+    elif "audio" in mime:
+        compressed_path = base_path.rsplit('.', 1)[0] + "_compressed.mp3"
+        try:
+            compress_audio(original_path, staging_path(compressed_path))
+        except ToolTimeout:
+            # ffmpeg takıldı: orijinal ses dosyası olduğu gibi saklanır
+            compressed_path = base_path
+            shutil.copyfile(original_path, staging_path(compressed_path))
+    else:
+        # Zaten sıkışık formatlar olduğu gibi, diğerleri deflate/zstd ile saklanır
+        return store_adaptive(original_path, base_path, mime)
+    os.replace(staging_path(compressed_path), compressed_path)
+    return compressed_path, CODEC_STORE
+
+
 @router.post("/files/upload")
 async def upload_file(
     folder_id: int = Form(...),
@@ -24,82 +51,62 @@ async def upload_file(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
-    # --- Dosya Boyut Limiti ---
-    content = await file.read()
-    if len(content) > MAX_SIZE_MB * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="Dosya çok büyük.")
-
+    # --- Dosya Boyut Limiti (akış sırasında, limit aşılınca hemen 413) ---
     temp_id = str(uuid4())
-    original_path = os.path.join(UPLOAD_DIR, f"{temp_id}_{file.filename}")
-    with open(original_path, "wb") as f:
-        f.write(content)
-
-    mime = get_mime_type(original_path)
-    compressed_path = original_path
+    original_path = os.path.join(INCOMING_DIR, f"{temp_id}_{os.path.basename(file.filename)}")
+    intake = await stream_to_disk(file, original_path, MAX_SIZE_MB * 1024 * 1024)
+    sha256 = intake.sha256
 
-    # --- METİN ÇIKAR ---
+    # --- METİN ÇIKAR + SIKIŞTIR (aynı içerik daha önce geldiyse yeniden kullanılır) ---
     try:
-        if "pdf" in mime:
-            extracted_text = extract_text_from_pdf(original_path)
-        elif "image" in mime:
-            extracted_text = extract_text_from_image(original_path)
-        elif "audio" in mime:
-            extracted_text = extract_text_from_audio(original_path)
-        else:
-            extracted_text = ""
+        # Ingest kuyruğuyla aynı yardımcı: blob eşzamanlı silindiyse bir kez yeniden üretilir
+        blob, _, _ = await materialize_and_acquire_async(db, sha256, original_path, file.filename, compress=_compress_for_upload, mime=intake.mime)
+    except BlobRefLost:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Dosya eşzamanlı silindi, tekrar deneyin.")
     except Exception as e:
-        extracted_text = ""
-        print(f"Extract Error: {file.filename} - {e}")
-
-    # --- SIKIŞTIR ---
-    try:
-        if "image" in mime:
-            compressed_path = original_path.rsplit('.', 1)[0] + "_compressed.jpg"
-            compress_image(original_path, compressed_path)
-            os.remove(original_path)
-        elif "pdf" in mime:
-            compressed_path = original_path.rsplit('.', 1)[0] + "_compressed.pdf"
-            compress_pdf(original_path, compressed_path)
-            os.remove(original_path)
-        elif "audio" in mime:
-            compressed_path = original_path.rsplit('.', 1)[0] + "_compressed.mp3"
-            compress_audio(original_path, compressed_path)
-            os.remove(original_path)
-        else:
-            compressed_path = original_path + ".zip"
-            zip_any_file(original_path, compressed_path)
-            os.remove(original_path)
-    except Exception as e:
-        if os.path.exists(original_path):
-            os.remove(original_path)
+        db.rollback()
         print(f"Compression Error: {file.filename} - {e}")
         raise HTTPException(status_code=500, detail="Sıkıştırma işlemi başarısız.")
+    finally:
+        if os.path.exists(original_path):
+            os.remove(original_path)
+
+    mime = blob.mime
+    extracted_text = blob.extracted_text
+    compressed_path = blob.stored_path
 
     # --- DOSYA VERİTABANI KAYDI ---
     new_file = FileModel(
         folder_id=folder_id,
-        user_id=current_user["id"],
-        filename=os.path.basename(compressed_path),
+        user_id=current_user.id,
+        filename=file.filename,
         filetype=mime,
         filepath=compressed_path,
-        extracted_text=extracted_text or ""
+        extracted_text=extracted_text or "",
+        extractor_version=blob.extractor_version,
+        extracted_at=datetime.utcnow(),
+        blob_sha256=sha256,
+        storage_codec=blob.storage_codec,
     )
     db.add(new_file)
     db.commit()
     db.refresh(new_file)
+    # Parçalama/dizinleme senkron DB işi; event loop bloklanmasın
+    await run_in_threadpool(index_file, db, new_file)
 
     # --- ÇIKAN TEXT'TEN OTOMATİK NOT EKLEME ---
     created_note_id = None
     if extracted_text and extracted_text.strip():
         note = Note(
             folder_id=folder_id,
-            created_at=current_user["id"],
             title=f"AI ile çıkarılan: {file.filename}",
             content=extracted_text[:10000]  # Çok büyükse kırp (ör: 10k karakter)
         )
         db.add(note)
         db.commit()
         db.refresh(note)
+        await run_in_threadpool(index_note, db, note)
         created_note_id = note.id
 
     return {
@@ -107,7 +114,7 @@ async def upload_file(
         "file_id": new_file.id,
         "filename": new_file.filename,
         "compressed_size": os.path.getsize(compressed_path),
-        "original_size": len(content),
+        "original_size": intake.size,
         "type": mime,
         "extracted_text": extracted_text[:400] if extracted_text else None,
         "note_id": created_note_id,
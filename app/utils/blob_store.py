@@ -0,0 +1,214 @@
+import os
+import asyncio
+import hashlib
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import StoredBlob
+from app.utils.compression import compress_image, get_mime_type, choose_codec, store_with_codec, CODEC_STORE
+from app.utils.executors import io_pool
+from app.utils.extractors import submit_extraction, EXTRACTOR_VERSION
+from app.utils.thumbnails import remove_thumbnails
+
+# ===================== Config =====================
+# /uploaded_files statik mount'unun dışında: yollar içerikten türediği için tahmin edilebilir,
+# içerik yalnızca yetki kontrolü yapan /files uç noktalarından okunur
+STORAGE_DIR = os.getenv("STORAGE_DIR") or "storage"
+BLOB_DIR = os.path.join(STORAGE_DIR, "blobs")
+
+os.makedirs(BLOB_DIR, exist_ok=True)
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_base_path(sha256: str, original_filename: str) -> str:
+    """storage/blobs/ab/abcdef....pdf — uzantı çıkarıcılar için korunur."""
+    ext = os.path.splitext(original_filename or "")[1].lower()
+    folder = os.path.join(BLOB_DIR, sha256[:2])
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{sha256}{ext}")
+
+
+def staging_path(path: str) -> str:
+    """Yazım bitene kadar kullanılacak yol; uzantı korunur (ffmpeg formatı uzantıdan anlıyor)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.part{ext}"
+
+
+def store_adaptive(raw_path: str, base_path: str, mime: str) -> tuple:
+    """
+    İçeriğe göre store/deflate/zstd seçip saklar; zaten sıkışık dosyalar için CPU harcanmaz.
+    (yol, codec) döner; codec kayda yazılır, okurken yol uzantısından tahmin edilmez.
+    """
+    codec = choose_codec(raw_path, mime)
+    tmp_base = staging_path(base_path)
+    tmp_path = store_with_codec(raw_path, tmp_base, codec, arcname=os.path.basename(base_path))
+    out_path = base_path + tmp_path[len(tmp_base):]
+    # Aynı blob'u eşzamanlı üreten iki worker birbirinin yarım dosyasını görmesin
+    os.replace(tmp_path, out_path)
+    return out_path, codec
+
+
+def default_compress(raw_path: str, base_path: str, mime: str) -> tuple:
+    """Görseller JPEG'e, diğer her şey içeriğe uygun codec'le; üretilen artefaktın (yol, codec) çiftini döner."""
+    if "image" in mime:
+        out_path = base_path.rsplit('.', 1)[0] + "_compressed.jpg"
+        tmp_path = staging_path(out_path)
+        compress_image(raw_path, tmp_path)
+        os.replace(tmp_path, out_path)
+        return out_path, CODEC_STORE
+    return store_adaptive(raw_path, base_path, mime)
+
+
+def _get_or_create(db: Session, sha256: str, size: int, mime: str) -> StoredBlob:
+    blob = db.query(StoredBlob).filter(StoredBlob.sha256 == sha256).first()
+    if blob:
+        return blob
+    try:
+        blob = StoredBlob(sha256=sha256, size=size, mime=mime, ref_count=0, created_at=datetime.utcnow())
+        db.add(blob)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        blob = db.query(StoredBlob).filter(StoredBlob.sha256 == sha256).first()
+    return blob
+
+
+def _prepare(db: Session, sha256: str, raw_path: str, mime: str) -> tuple:
+    mime = mime or get_mime_type(raw_path)
+    blob = _get_or_create(db, sha256, os.path.getsize(raw_path), mime)
+    text_reused = blob.extractor_version == EXTRACTOR_VERSION and blob.extracted_text is not None
+    artifact_reused = bool(blob.stored_path) and os.path.exists(blob.stored_path)
+    return blob, mime, text_reused, artifact_reused
+
+
+def _finish(db: Session, blob: StoredBlob, mime: str, text, stored):
+    if text is not None:
+        blob.extracted_text = text
+        blob.extractor_version = EXTRACTOR_VERSION
+    if stored is not None:
+        blob.stored_path, blob.storage_codec = stored
+    blob.mime = blob.mime or mime
+    db.commit()
+
+
+def materialize_blob(db: Session, sha256: str, raw_path: str, original_filename: str,
+                     compress=default_compress, mime: str = None) -> tuple:
+    """
+    Ham dosyayı içerik adresli blob'a dönüştürür.
+    Aynı içerik daha önce işlendiyse çıkarılmış metin ve sıkıştırılmış artefakt
+    yeniden kullanılır. compress (yol, codec) döner. (blob, text_reused, artifact_reused) döner.
+    Çıkarma cpu (ses için audio) havuzunda, sıkıştırma io havuzunda çalışır; ikisi paralel yürür.
+    """
+    blob, mime, text_reused, artifact_reused = _prepare(db, sha256, raw_path, mime)
+    text_future = None if text_reused else submit_extraction(raw_path, mime)
+    stored = None
+    if not artifact_reused:
+        stored = io_pool.call(compress, raw_path, blob_base_path(sha256, original_filename), mime)
+    text = text_future.result() if text_future else None
+    _finish(db, blob, mime, text, stored)
+    return blob, text_reused, artifact_reused
+
+
+async def materialize_blob_async(db: Session, sha256: str, raw_path: str, original_filename: str,
+                                 compress=default_compress, mime: str = None) -> tuple:
+    """materialize_blob'un async handler'lar için sürümü; event loop bloklanmaz."""
+    blob, mime, text_reused, artifact_reused = _prepare(db, sha256, raw_path, mime)
+    text_future = None if text_reused else submit_extraction(raw_path, mime)
+    stored = None
+    if not artifact_reused:
+        stored = await io_pool.run(compress, raw_path, blob_base_path(sha256, original_filename), mime)
+    text = await asyncio.wrap_future(text_future) if text_future else None
+    _finish(db, blob, mime, text, stored)
+    return blob, text_reused, artifact_reused
+
+
+class BlobRefLost(RuntimeError):
+    """Blob, referans alınamadan iki kez art arda son referansıyla silindi."""
+
+
+def acquire_ref(db: Session, sha256: str) -> bool:
+    """ref_count'u atomik olarak artırır; blob bu arada silindiyse False döner."""
+    updated = (
+        db.query(StoredBlob)
+        .filter(StoredBlob.sha256 == sha256)
+        .update({StoredBlob.ref_count: StoredBlob.ref_count + 1}, synchronize_session=False)
+    )
+    return updated == 1
+
+
+def materialize_and_acquire(db: Session, sha256: str, raw_path: str, original_filename: str,
+                            compress=default_compress, mime: str = None) -> tuple:
+    """
+    materialize_blob + acquire_ref. Blob son referansıyla tam bu arada silindiyse bir kez
+    yeniden üretilir. Referans commit edilmez; çağıran File kaydıyla birlikte commit eder.
+    """
+    result = materialize_blob(db, sha256, raw_path, original_filename, compress=compress, mime=mime)
+    if acquire_ref(db, sha256):
+        return result
+    result = materialize_blob(db, sha256, raw_path, original_filename, compress=compress, mime=mime)
+    if acquire_ref(db, sha256):
+        return result
+    raise BlobRefLost(f"Blob referansı alınamadı: {sha256}")
+
+
+async def materialize_and_acquire_async(db: Session, sha256: str, raw_path: str, original_filename: str,
+                                        compress=default_compress, mime: str = None) -> tuple:
+    """materialize_and_acquire'ın async handler'lar için sürümü."""
+    result = await materialize_blob_async(db, sha256, raw_path, original_filename, compress=compress, mime=mime)
+    if acquire_ref(db, sha256):
+        return result
+    result = await materialize_blob_async(db, sha256, raw_path, original_filename, compress=compress, mime=mime)
+    if acquire_ref(db, sha256):
+        return result
+    raise BlobRefLost(f"Blob referansı alınamadı: {sha256}")
+
+
+def release_ref(db: Session, sha256: str):
+    """
+    Referansı çağıranın transaction'ında bırakır, commit etmez: çağıran File kaydını aynı
+    transaction'da siler ve ikisini birlikte commit eder. Son referanssa blob kaydı da silinir
+    ve (sha256, yol) döner; diskteki dosyalar commit'ten sonra remove_released ile silinir.
+    """
+    # Satır kilidi commit'e kadar tutulur: aynı içeriği yükleyen istek acquire_ref'te bekler,
+    # sayaç 0'a inmişse kayıt silinmiş bulur ve artefaktı yeniden üretir
+    blob = db.query(StoredBlob).filter(StoredBlob.sha256 == sha256).with_for_update().first()
+    if blob is None:
+        return None
+    blob.ref_count -= 1
+    if blob.ref_count > 0:
+        return None
+    stored_path = blob.stored_path
+    try:
+        with db.begin_nested():
+            db.delete(blob)
+    except IntegrityError:
+        # Sayaç dışında bağlanmış bir File kaydı var; blob kalsın (yalnızca savepoint geri alınır)
+        return None
+    return sha256, stored_path
+
+
+def remove_released(db: Session, released: list):
+    """release_ref'in döndürdüğü blob'ların artefaktını ve önizlemelerini commit'ten sonra siler."""
+    for item in released:
+        if not item:
+            continue
+        sha256, stored_path = item
+        # Aynı içerik commit'ten sonra yeniden yüklendiyse yeni kaydın dosyası silinmez. Yeni
+        # yükleme kaydı dosyayı yazmadan önce commit ettiği için bu kontrol yeterli
+        if db.query(StoredBlob.sha256).filter(StoredBlob.sha256 == sha256).first() is not None:
+            continue
+        if stored_path and os.path.exists(stored_path):
+            try:
+                os.remove(stored_path)
+            except Exception as e:
+                print(f"Blob silinirken hata: {e}")
+        remove_thumbnails(sha256)
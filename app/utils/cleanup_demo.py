@@ -2,18 +2,27 @@ from datetime import datetime, timedelta
 from app.models import DemoSession, DemoBan, Note, File, Folder
 from app.database import SessionLocal  # DİKKAT: get_db değil, SessionLocal!
 from sqlalchemy.orm import Session
+from app.utils.blob_store import release_ref, remove_released
+from app.utils.retrieval import drop_folder_chunks
 
 def cleanup_expired_demo_sessions():
     db: Session = SessionLocal()
     try:
         now = datetime.utcnow()
         expired_sessions = db.query(DemoSession).filter(DemoSession.expires_at < now).all()
+        shas = []
         for session in expired_sessions:
             # 1. Tüm notları sil
             db.query(Note).filter(Note.demo_session_id == session.id).delete()
-            # 2. Tüm dosyaları sil
+            # 2. Tüm dosyaları sil (paylaşılan blob referansları aynı transaction'da bırakılır)
+            shas += [
+                sha for (sha,) in db.query(File.blob_sha256).filter(
+                    File.demo_session_id == session.id, File.blob_sha256.isnot(None)
+                ).all()
+            ]
             db.query(File).filter(File.demo_session_id == session.id).delete()
-            # 3. Tüm klasörleri sil
+            # 3. Tüm klasörleri (ve arama dizinlerini) sil
+            drop_folder_chunks(db, db.query(Folder.id).filter(Folder.demo_session_id == session.id).scalar_subquery())
             db.query(Folder).filter(Folder.demo_session_id == session.id).delete()
             # 4. DemoSession kaydını sil
             db.delete(session)
@@ -24,7 +33,10 @@ def cleanup_expired_demo_sessions():
                 ban.banned_until = banned_until
             else:
                 db.add(DemoBan(ip_address=session.ip_address, banned_until=banned_until))
+        # Sabit sırayla kilitlenir; aynı blob'ları bırakan eşzamanlı silmeler kilitlenmesin
+        released = [release_ref(db, sha) for sha in sorted(shas)]
         db.commit()
+        remove_released(db, released)
         return len(expired_sessions)  # Kaç tane session silindiğini döndür
     finally:
         db.close()
@@ -1,22 +1,68 @@
 import os
-from PIL import Image
+from PIL import Image, ImageOps
 from PyPDF2 import PdfReader, PdfWriter
 import zipfile
-import subprocess
+import zlib
 import mimetypes
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, NamedTuple
 
-def compress_image(file_path, out_path, quality=70):
-    img = Image.open(file_path)
-    if img.mode in ("RGBA", "LA"):
+from app.utils.tool_runner import run_tool_sync, ToolTimeout
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ===================== Görsel =====================
+# Uzun kenar bu değeri aşarsa küçültülür (0: orijinal çözünürlük)
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION") or 2560)
+# Bu boyutun altındaki ve sınırı aşmayan JPEG'ler yeniden kodlanmadan olduğu gibi saklanır
+IMAGE_SKIP_REENCODE_BYTES = int(os.getenv("IMAGE_SKIP_REENCODE_BYTES") or 512 * 1024)
+
+
+def _flatten_to_rgb(img):
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
         bg = Image.new("RGB", img.size, (255, 255, 255))
-        bg.paste(img, mask=img.split()[3])
-        img = bg
-    img.save(out_path, "JPEG", quality=quality, optimize=True)
+        bg.paste(img, mask=img.split()[-1])
+        return bg
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+
+def compress_image(file_path, out_path, quality=70, max_dimension=IMAGE_MAX_DIMENSION):
+    with Image.open(file_path) as img:
+        fits = not max_dimension or max(img.size) <= max_dimension
+        if img.format == "JPEG" and fits and os.path.getsize(file_path) <= IMAGE_SKIP_REENCODE_BYTES:
+            # Zaten küçük bir JPEG; yeniden kodlamak kalite kaybı ve CPU'dan başka bir şey getirmez
+            shutil.copyfile(file_path, out_path)
+            return
+
+        if max_dimension:
+            # JPEG'de DCT ölçeklemesi: 48 MP fotoğraf tam çözünürlükte belleğe hiç açılmaz
+            img.draft("RGB", (max_dimension, max_dimension))
+        img = ImageOps.exif_transpose(img)  # yönü piksellere işle; EXIF'siz çıktı yine doğru dursun
+
+        if max_dimension and max(img.size) > max_dimension:
+            factor = max(img.size) // max_dimension
+            if factor >= 2:
+                img = img.reduce(factor)  # ucuz tam sayı küçültme, kalan kısmı resize halleder
+            if max(img.size) > max_dimension:
+                scale = max_dimension / max(img.size)
+                img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                                 Image.LANCZOS)
+
+        img = _flatten_to_rgb(img)
+        img.save(out_path, "JPEG", quality=quality, optimize=True, progressive=True)
 
 def compress_pdf(file_path, out_path):
     # Ghostscript ile daha iyi sıkıştırma, sistemde gs kurulu olmalı
     try:
-        subprocess.run([
+        run_tool_sync([
             "gs",
             "-sDEVICE=pdfwrite",
             "-dCompatibilityLevel=1.4",
@@ -26,7 +72,10 @@ def compress_pdf(file_path, out_path):
             "-dBATCH",
             f"-sOutputFile={out_path}",
             file_path
-        ], check=True)
+        ])
+    except ToolTimeout:
+        # Patolojik PDF: uğraşma, orijinali olduğu gibi sakla
+        shutil.copyfile(file_path, out_path)
     except Exception:
         # fallback: PyPDF2 ile sadece kopyalama, gerçek sıkıştırma yapmaz
         reader = PdfReader(file_path)
@@ -37,17 +86,148 @@ def compress_pdf(file_path, out_path):
             writer.write(f)
 
 def compress_audio(input_path, output_path, bitrate="64k"):
+    """Zaman aşımında ToolTimeout fırlatır; çağıran orijinali saklamaya karar verir."""
     try:
-        subprocess.run([
-            "ffmpeg", "-i", input_path, "-b:a", bitrate, output_path,
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        run_tool_sync([
+            "ffmpeg", "-nostdin", "-y", "-i", input_path, "-b:a", bitrate, output_path,
+        ])
     except Exception as e:
         print("FFmpeg Error:", e)
         raise
 
-def zip_any_file(file_path, out_path):
+def zip_any_file(file_path, out_path, arcname=None):
     with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(file_path, arcname=os.path.basename(file_path))
+        zipf.write(file_path, arcname=arcname or os.path.basename(file_path))
 
 def get_mime_type(file_path):
     return mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+
+
+# ===================== Depolama codec'i =====================
+CODEC_STORE = "store"
+CODEC_DEFLATE = "deflate"
+CODEC_ZSTD = "zstd"
+
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL") or 3)
+# Örnek blok bu orandan daha az küçülüyorsa içerik zaten sıkışık sayılır
+INCOMPRESSIBLE_RATIO = float(os.getenv("INCOMPRESSIBLE_RATIO") or 0.9)
+SAMPLE_WINDOW = 64 * 1024
+
+# İçi zaten sıkıştırılmış kapsayıcılar: tekrar sıkıştırmak CPU yakar, ~%0 kazanç
+_PRECOMPRESSED_EXTS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac", ".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi",
+}
+
+
+def _sample_ratio(file_path) -> float:
+    """Dosyanın başından, ortasından ve sonundan alınan örneklerin hızlı zlib sıkıştırma oranı."""
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return 1.0
+    offsets = sorted({0, max(0, size // 2 - SAMPLE_WINDOW // 2), max(0, size - SAMPLE_WINDOW)})
+    sample = b""
+    with open(file_path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            sample += f.read(SAMPLE_WINDOW)
+    return len(zlib.compress(sample, 1)) / len(sample)
+
+
+def choose_codec(file_path, mime=None) -> str:
+    ext = os.path.splitext(file_path)[1].lower()
+    mime = mime or get_mime_type(file_path)
+    if ext in _PRECOMPRESSED_EXTS or mime.startswith(("video/", "audio/")) or mime in ("application/zip", "application/gzip"):
+        return CODEC_STORE
+    if _sample_ratio(file_path) > INCOMPRESSIBLE_RATIO:
+        return CODEC_STORE
+    return CODEC_ZSTD if zstandard is not None else CODEC_DEFLATE
+
+
+def store_with_codec(file_path, base_path, codec, arcname=None) -> str:
+    """
+    Dosyayı seçilen codec ile base_path'e göre saklar ve oluşan yolu döner.
+    store: olduğu gibi (mümkünse hard link, kopya yok), deflate: .zip, zstd: .zst
+    """
+    arcname = arcname or os.path.basename(base_path)
+    if codec == CODEC_DEFLATE:
+        out_path = base_path + ".zip"
+        zip_any_file(file_path, out_path, arcname=arcname)
+    elif codec == CODEC_ZSTD:
+        out_path = base_path + ".zst"
+        cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL, write_content_size=True)
+        with open(file_path, "rb") as src, open(out_path, "wb") as dst:
+            cctx.copy_stream(src, dst, size=os.path.getsize(file_path))
+    else:
+        out_path = base_path
+        try:
+            os.link(file_path, out_path)
+        except OSError:
+            shutil.copyfile(file_path, out_path)
+    return out_path
+
+
+class StoredContent(NamedTuple):
+    name: str  # açılmış içeriğin adı (zip üyesi veya dosya adı)
+    size: int  # açılmış boyut
+    mtime: float
+    open: Callable  # seek edilebilir binary dosya nesnesi döner
+
+
+def stored_content(stored_path, codec) -> StoredContent:
+    """
+    Depolanmış dosyanın açılmış içeriğine diske çıkarmadan erişim sağlar.
+    codec kayıttaki değerdir (uzantıdan tahmin edilmez: kullanıcının yüklediği .zip
+    olduğu gibi de saklanmış olabilir). deflate ise ilk üye doğrudan arşivden,
+    zstd ise akış halinde açılarak okunur; diğerleri olduğu gibi.
+    """
+    mtime = os.path.getmtime(stored_path)
+
+    if codec == CODEC_ZSTD:
+        with open(stored_path, "rb") as f:
+            size = zstandard.frame_content_size(f.read(18))
+
+        def _open_zstd():
+            # Okuyucu yalnız ileri seek eder; her istek kendi akışını açtığı için yeterli
+            return zstandard.ZstdDecompressor().stream_reader(open(stored_path, "rb"), closefd=True)
+
+        return StoredContent(os.path.basename(stored_path)[:-len(".zst")], size, mtime, _open_zstd)
+
+    if codec != CODEC_DEFLATE:
+        return StoredContent(os.path.basename(stored_path), os.path.getsize(stored_path), mtime,
+                             lambda: open(stored_path, "rb"))
+
+    with zipfile.ZipFile(stored_path, "r") as zipf:
+        infos = zipf.infolist()
+    if not infos:
+        raise FileNotFoundError(f"Zip dosyası boş: {stored_path}")
+    info = infos[0]
+
+    def _open():
+        # ZipFile kapansa da açık üye alttaki dosyayı kendisi kapatana kadar tutar
+        with zipfile.ZipFile(stored_path, "r") as zipf:
+            return zipf.open(info)
+
+    return StoredContent(info.filename, info.file_size, mtime, _open)
+
+
+@contextmanager
+def unpacked_copy(stored_path, codec):
+    """
+    Depolanmış dosyanın okunabilir bir kopyasının yolunu verir.
+    Sıkıştırılmışsa geçici klasöre açar ve iş bitince siler.
+    """
+    if codec not in (CODEC_DEFLATE, CODEC_ZSTD):
+        yield stored_path
+        return
+    content = stored_content(stored_path, codec)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        out_path = os.path.join(tmp_dir, os.path.basename(content.name))
+        with content.open() as src, open(out_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        yield out_path
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# ===================== Config =====================
+# Bu sınırın altındaki klasör içeriği modele olduğu gibi gider
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET") or 12000)
+# Map adımında tek çağrıya giren parça boyutu
+CONTEXT_CHUNK_TOKENS = int(os.getenv("CONTEXT_CHUNK_TOKENS") or 3000)
+CONTEXT_MAP_SUMMARY_TOKENS = int(os.getenv("CONTEXT_MAP_SUMMARY_TOKENS") or 400)
+CONTEXT_MAP_CONCURRENCY = int(os.getenv("CONTEXT_MAP_CONCURRENCY") or 4)
+# Özetler hâlâ bütçeyi aşıyorsa özetlerin özeti alınır; en fazla bu kadar tur
+CONTEXT_MAX_ROUNDS = 3
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+# Map çağrıları ağ beklemesi; thread havuzu yeterli
+_map_pool = ThreadPoolExecutor(max_workers=CONTEXT_MAP_CONCURRENCY, thread_name_prefix="context-map")
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            # Kodlama dosyası indirilemediyse (çevrimdışı) yaklaşık saymaya düş
+            _encoding_failed = True
+            print(f"tiktoken yüklenemedi, yaklaşık token sayımı kullanılacak: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Kaba tahmin: ~4 karakter/token
+    return (len(text) + 3) // 4
+
+
+def _split_text(text: str, limit: int) -> list:
+    """Tek başına sınırı aşan metni paragraf, satır, cümle, kelime sırasıyla böler."""
+    if count_tokens(text) <= limit:
+        return [text]
+    for sep in ("\n\n", "\n", ". ", " "):
+        pieces = text.split(sep)
+        if len(pieces) < 2:
+            continue
+        segments, current, current_tokens = [], [], 0
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if tokens > limit:
+                if current:
+                    segments.append(sep.join(current))
+                    current, current_tokens = [], 0
+                segments.extend(_split_text(piece, limit))
+                continue
+            # Ayraç yaklaşık bir token; her adımda birleşik metni yeniden saymamak için toplanır
+            if current and current_tokens + tokens + 1 > limit:
+                segments.append(sep.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens + 1
+        if current:
+            segments.append(sep.join(current))
+        return segments
+    # Boşluksuz dev metin: karakter penceresiyle kes
+    step = max(1, limit * 4)
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def chunk_parts(parts: list, chunk_tokens: int = CONTEXT_CHUNK_TOKENS) -> list:
+    """
+    Parçaları (not/dosya metinleri) sırayla bütçeye kadar aynı parçaya doldurur.
+    Parça sınırları korunduğu için klasöre yeni dosya eklenince önceki parçalar
+    (ve önbellekteki özetleri) çoğunlukla aynı kalır.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for part in parts:
+        for piece in _split_text(part, chunk_tokens):
+            tokens = count_tokens(piece)
+            if current and current_tokens + tokens > chunk_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    return text[:budget * 4]
+
+
+def map_concurrently(fn, items: list) -> list:
+    """fn'i öğelere map havuzunda eşzamanlı uygular; sıra korunur."""
+    return list(_map_pool.map(fn, items))
+
+
+def build_context(parts: list, summarize, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Bütçeye sığan içerik olduğu gibi döner. Sığmıyorsa map-reduce:
+    parçalar summarize(chunk) ile eşzamanlı özetlenir, özetler birleştirilir;
+    hâlâ büyükse özetler tekrar özetlenir. Son cevabı çağıran endpoint üretir.
+    summarize önbellekli olmalı (ai_chat_openai); değişmeyen parçalar tekrar ücretlendirilmez.
+    """
+    parts = [p for p in parts if p and p.strip()]
+    text = "\n\n".join(parts)
+    total = count_tokens(text)
+    if total <= budget:
+        return text
+
+    rounds = 0
+    while total > budget and rounds < CONTEXT_MAX_ROUNDS:
+        chunks = chunk_parts(parts)
+        parts = [s for s in map_concurrently(summarize, chunks) if s and s.strip()]
+        text = "\n\n".join(parts)
+        print(f"Bağlam özetlendi: {total} -> {count_tokens(text)} token, {len(chunks)} parça (tur {rounds + 1})")
+        total = count_tokens(text)
+        rounds += 1
+
+    if total > budget:
+        text = _truncate_to_tokens(text, budget)
+    return text
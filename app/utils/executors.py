@@ -0,0 +1,170 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# ===================== Config =====================
+# cpu:     sayfa düzeyindeki işler: PDF sayfa aralıkları, OCR (ayrı process'ler, GIL'i paylaşmaz)
+# extract: dosya başına çıkarma akışı (ana process'te thread'ler); yalnızca işleri cpu havuzuna
+#          dağıtıp sonuçları bekler, kendisi CPU harcamaz
+# audio:   Whisper transkripsiyonu (ana process'te thread'ler; model registry'si ve bellek bütçesi tek)
+# io:      zip, görsel sıkıştırma, dosya yazma (thread'ler)
+EXECUTOR_CPU_WORKERS = int(os.getenv("EXECUTOR_CPU_WORKERS") or max(1, (os.cpu_count() or 2) - 1))
+EXECUTOR_EXTRACT_WORKERS = int(os.getenv("EXECUTOR_EXTRACT_WORKERS") or 4)
+EXECUTOR_AUDIO_WORKERS = int(os.getenv("EXECUTOR_AUDIO_WORKERS") or 1)
+EXECUTOR_IO_WORKERS = int(os.getenv("EXECUTOR_IO_WORKERS") or 8)
+
+
+def _timed_call(fn, args, kwargs):
+    # Worker içinde çalışır; başlama anı kuyrukta bekleme süresini ölçmek için döner
+    started = time.time()
+    return started, fn(*args, **kwargs)
+
+
+def _init_cpu_worker():
+    # Sayfalar worker'lar arasında paralel OCR'lanıyor; tesseract'ın kendi OpenMP
+    # thread'leri çekirdekleri boğmasın (ortam değişkeni alt process'lere geçer)
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _noop():
+    return None
+
+
+class BoundedExecutor:
+    """
+    Sabit sayıda worker'lı havuz. Senkron çağıranlar call(), async handler'lar
+    await run() kullanır. Kuyruk derinliği ve bekleme süreleri istatistiklerde tutulur.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, initializer=None):
+        self.name = name
+        self.kind = kind  # "process" | "thread"
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0,
+            "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "run_seconds_total": 0.0,
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=self.initializer,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"{self.name}-pool",
+                        initializer=self.initializer,
+                    )
+            return self._executor
+
+    def _discard_broken(self, executor):
+        # Çöken bir worker (ör. OOM) havuzu kalıcı bozar; sonraki istek yenisini açar
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        submitted = time.time()
+        outer = Future()
+        executor = self._get_executor()
+        with self._lock:
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+
+        def _done(inner):
+            finished = time.time()
+            try:
+                started, result = inner.result()
+            except BaseException as e:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._stats["failed"] += 1
+                if isinstance(e, BrokenProcessPool):
+                    self._discard_broken(executor)
+                outer.set_exception(e)
+                return
+            with self._lock:
+                self._in_flight -= 1
+                self._stats["completed"] += 1
+                wait = max(0.0, started - submitted)
+                self._stats["wait_seconds_total"] += wait
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait)
+                self._stats["run_seconds_total"] += max(0.0, finished - started)
+            outer.set_result(result)
+
+        try:
+            executor.submit(_timed_call, fn, args, kwargs).add_done_callback(_done)
+        except BrokenProcessPool as e:
+            self._discard_broken(executor)
+            with self._lock:
+                self._in_flight -= 1
+                self._stats["failed"] += 1
+            outer.set_exception(e)
+        return outer
+
+    def call(self, fn, *args, **kwargs):
+        """Senkron kod (ingest worker thread'leri) için: sonucu bekleyip döner."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run(self, fn, *args, **kwargs):
+        """Async handler'lar için: event loop'u bloklamadan sonucu bekler."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def prestart(self):
+        """Tüm worker'ları şimdi açar (initializer'lar ilk istekten önce çalışsın)."""
+        for _ in range(self.max_workers):
+            self.submit(_noop)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self._stats["completed"] or 1
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                **self._stats,
+                "wait_seconds_avg": self._stats["wait_seconds_total"] / finished,
+                "run_seconds_avg": self._stats["run_seconds_total"] / finished,
+            }
+
+
+cpu_pool = BoundedExecutor("cpu", "process", EXECUTOR_CPU_WORKERS, initializer=_init_cpu_worker)
+extract_pool = BoundedExecutor("extract", "thread", EXECUTOR_EXTRACT_WORKERS)
+audio_pool = BoundedExecutor("audio", "thread", EXECUTOR_AUDIO_WORKERS)
+io_pool = BoundedExecutor("io", "thread", EXECUTOR_IO_WORKERS)
+
+
+def start_executors():
+    cpu_pool.prestart()
+
+
+def shutdown_executors():
+    cpu_pool.shutdown()
+    extract_pool.shutdown()
+    audio_pool.shutdown()
+    io_pool.shutdown()
+
+
+def executor_stats() -> dict:
+    return {"cpu": cpu_pool.stats(), "extract": extract_pool.stats(), "audio": audio_pool.stats(), "io": io_pool.stats()}
@@ -1,48 +1,71 @@
 import os
-import pdfplumber
-from PIL import Image
-import pytesseract
-import whisper
 import traceback
 
+from app.utils.executors import audio_pool, cpu_pool, extract_pool
+from app.utils.ocr import OCR_LANG, ocr_image, ocr_pdf_page
+from app.utils.pdf_pages import extract_native_pages
+from app.utils.whisper_models import transcribe
+
 try:
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
 except ImportError:
     convert_from_path = None
+    pdfinfo_from_path = None
+
+# Çıkarma mantığı değiştiğinde artır; eski sürümle çıkarılan File kayıtları bayat sayılır
+EXTRACTOR_VERSION = 2
+
+# Metin katmanı bu karakter sayısının altında kalan sayfalar taranmış sayılır ve OCR'lanır
+PDF_OCR_MIN_CHARS = int(os.getenv("PDF_OCR_MIN_CHARS") or 25)
+
+
+def _ocr_pages(filepath, targets):
+    """
+    Hedef sayfaları cpu havuzunda paralel OCR'lar ve (sayfa, metin) üretir; hata veren
+    sayfa atlanır. Her sayfa ayrı iş olduğundan taranmış bir PDF birden çok worker'ı kullanır.
+    """
+    futures = {i: cpu_pool.submit(ocr_pdf_page, filepath, i) for i in targets}
+    for i, future in futures.items():
+        try:
+            yield i, future.result() or ""
+        except Exception as e:
+            print(f"PDF OCR Extraction Error: {filepath} page {i + 1} - {e}\n{traceback.format_exc()}")
+
+
+def _pdf_page_count(filepath):
+    try:
+        return int(pdfinfo_from_path(filepath)["Pages"])
+    except Exception as e:
+        print(f"PDF page count error: {filepath} - {e}")
+        return 0
+
 
 def extract_text_from_pdf(filepath):
     try:
-        with pdfplumber.open(filepath) as pdf:
-            text = []
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text.append(page_text)
-            text = "\n".join(text) if text else ""
-            if text and text.strip():
-                return text
+        # Büyük PDF'ler sayfa aralıklarına bölünüp cpu havuzunda paralel okunur
+        pages = extract_native_pages(filepath)
     except Exception as e:
         print(f"PDF Extraction Error (plumber): {filepath} - {e}\n{traceback.format_exc()}")
+        pages = None
 
-    # fallback: OCR
+    # Sadece metin katmanı boş/yetersiz olan sayfalar OCR'lanır
     if convert_from_path is None:
-        print("pdf2image yüklü değil, PDF OCR yapılamıyor.")
-        return ""
-    try:
-        images = convert_from_path(filepath)
-        text = ""
-        for img in images:
-            t = pytesseract.image_to_string(img, lang="tur+eng")
-            text += t + "\n"
-        return text.strip() if text.strip() else ""
-    except Exception as e:
-        print(f"PDF OCR Extraction Error: {filepath} - {e}\n{traceback.format_exc()}")
-        return ""
+        if pages is None or any(len(p.strip()) < PDF_OCR_MIN_CHARS for p in pages):
+            print("pdf2image yüklü değil, taranmış sayfalar OCR'lanamıyor.")
+    else:
+        if pages is None:
+            pages = [""] * _pdf_page_count(filepath)
+        targets = [i for i, p in enumerate(pages) if len(p.strip()) < PDF_OCR_MIN_CHARS]
+        for i, ocr_text in _ocr_pages(filepath, targets):
+            if len(ocr_text.strip()) > len(pages[i].strip()):
+                pages[i] = ocr_text
 
-def extract_text_from_image(filepath, lang="tur+eng"):
+    text = "\n".join(p.strip() for p in (pages or []) if p and p.strip())
+    return text
+
+def extract_text_from_image(filepath, lang=OCR_LANG):
     try:
-        img = Image.open(filepath)
-        text = pytesseract.image_to_string(img, lang=lang)
+        text = cpu_pool.call(ocr_image, filepath, lang)
         return text if text.strip() else ""
     except Exception as e:
         print(f"Image OCR Error: {filepath} - {e}\n{traceback.format_exc()}")
@@ -50,8 +73,7 @@ def extract_text_from_image(filepath, lang="tur+eng"):
 
 def extract_text_from_audio(filepath, model_size="base"):
     try:
-        model = whisper.load_model(model_size)
-        result = model.transcribe(filepath)
+        result = transcribe(filepath, model_size=model_size)
         return result["text"].strip() if result["text"] else ""
     except Exception as e:
         print(f"Audio Extraction Error: {filepath} - {e}\n{traceback.format_exc()}")
@@ -65,6 +87,35 @@ def extract_text_from_txt(filepath):
         print(f"TXT Extraction Error: {filepath} - {e}\n{traceback.format_exc()}")
         return ""
 
+_TEXT_EXTS = [".txt", ".csv", ".md"]
+_IMAGE_EXTS = [".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".gif"]
+_AUDIO_EXTS = [".mp3", ".wav", ".m4a", ".ogg"]
+
+
+def is_audio(filepath, mime=None) -> bool:
+    """extract_text_auto bu dosyayı Whisper'a mı gönderir? (aynı karar sırası)"""
+    ext = os.path.splitext(filepath)[1].lower()
+    if mime:
+        if "pdf" in mime or "image" in mime:
+            return False
+        if "audio" in mime:
+            return True
+        if "text" in mime or ext in _TEXT_EXTS:
+            return False
+    return ext in _AUDIO_EXTS
+
+
+def submit_extraction(filepath, mime=None):
+    """
+    extract_text_auto'yu uygun havuza verir ve Future döner. Sesler ana process'teki
+    audio havuzunda çalışır (Whisper modelleri tek registry'de, tek bellek bütçesiyle).
+    Diğerlerinin akışı extract havuzundaki bir thread'de yürür; PDF sayfa aralıkları
+    oradan cpu havuzuna dağıtılır, yani tek bir büyük PDF birden çok worker'ı kullanır.
+    """
+    pool = audio_pool if is_audio(filepath, mime) else extract_pool
+    return pool.submit(extract_text_auto, filepath, mime)
+
+
 def extract_text_auto(filepath, mime=None):
     ext = os.path.splitext(filepath)[1].lower()
     try:
@@ -75,15 +126,15 @@ def extract_text_auto(filepath, mime=None):
                 return extract_text_from_image(filepath)
             elif "audio" in mime:
                 return extract_text_from_audio(filepath)
-            elif "text" in mime or ext in [".txt", ".csv", ".md"]:
+            elif "text" in mime or ext in _TEXT_EXTS:
                 return extract_text_from_txt(filepath)
         if ext == ".pdf":
             return extract_text_from_pdf(filepath)
-        elif ext in [".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".gif"]:
+        elif ext in _IMAGE_EXTS:
             return extract_text_from_image(filepath)
-        elif ext in [".mp3", ".wav", ".m4a", ".ogg"]:
+        elif ext in _AUDIO_EXTS:
             return extract_text_from_audio(filepath)
-        elif ext in [".txt", ".csv", ".md"]:
+        elif ext in _TEXT_EXTS:
             return extract_text_from_txt(filepath)
         else:
             return ""
@@ -92,9 +143,12 @@ def extract_text_auto(filepath, mime=None):
         return ""
 
 __all__ = [
+    "EXTRACTOR_VERSION",
     "extract_text_from_pdf",
     "extract_text_from_image",
     "extract_text_from_audio",
     "extract_text_from_txt",
     "extract_text_auto",
+    "is_audio",
+    "submit_extraction",
 ]
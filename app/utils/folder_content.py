@@ -0,0 +1,113 @@
+import os
+import traceback
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.models import Note, File
+from app.utils.compression import unpacked_copy
+from app.utils.extractors import submit_extraction, EXTRACTOR_VERSION
+
+
+def _file_label(filetype: str) -> str:
+    filetype = (filetype or "").lower()
+    if "pdf" in filetype:
+        return "PDF"
+    if "audio" in filetype:
+        return "Ses"
+    if "image" in filetype:
+        return "Görsel"
+    return "Dosya"
+
+
+def note_label(note: Note) -> str:
+    return f"[Not: {note.title}]"
+
+
+def file_label(f: File) -> str:
+    return f"[{_file_label(f.filetype)}: {f.filename}]"
+
+
+def needs_extraction(f: File) -> bool:
+    """
+    Kayıttaki metin yoksa veya eski bir çıkarıcı sürümüyle üretildiyse True.
+    Sürümü olmayan eski kayıtlarda metin doluysa yeniden OCR/Whisper yapılmaz.
+    """
+    if f.extractor_version == EXTRACTOR_VERSION:
+        return False
+    if f.extractor_version is None:
+        return not (f.extracted_text or "").strip()
+    return True
+
+
+def refresh_extracted_text(db: Session, f: File) -> str:
+    """Depodaki dosyadan metni yeniden çıkarır ve File kaydına geri yazar."""
+    if not f.filepath or not os.path.exists(f.filepath):
+        # Kaynak yoksa elde olan metin korunur; boş sonuç onu ve sürümünü ezmesin
+        print(f"Re-extract skipped, file missing: {f.filepath}")
+        return f.extracted_text or ""
+    try:
+        with unpacked_copy(f.filepath, f.storage_codec) as path:
+            text = submit_extraction(path, f.filetype).result() or ""
+    except Exception as e:
+        print(f"Re-extract error: {f.filepath} - {e}\n{traceback.format_exc()}")
+        return f.extracted_text or ""
+    if f.blob is not None:
+        # Aynı içeriği paylaşan diğer kayıtlar ve sonraki yüklemeler de faydalansın
+        f.blob.extracted_text = text
+        f.blob.extractor_version = EXTRACTOR_VERSION
+    # Boş sonuç da sürümle kaydedilir; aynı dosya bir daha çıkarılmaz
+    return _store_text(db, f, text)
+
+
+def _store_text(db: Session, f: File, text: str) -> str:
+    """Yeni metni sürümüyle kaydeder; metin değiştiyse retrieval parçaları da yeniden yazılır."""
+    changed = text != (f.extracted_text or "")
+    f.extracted_text = text
+    f.extractor_version = EXTRACTOR_VERSION
+    f.extracted_at = datetime.utcnow()
+    db.commit()
+    if changed:
+        # retrieval bu modülü import ediyor; döngü olmasın diye burada
+        from app.utils.retrieval import index_file
+        index_file(db, f)
+    return text
+
+
+def file_text(db: Session, f: File) -> str:
+    if needs_extraction(f):
+        blob = f.blob
+        if blob is not None and blob.extractor_version == EXTRACTOR_VERSION and blob.extracted_text is not None:
+            # Aynı içerik başka bir kayıt üzerinden zaten güncel sürümle çıkarılmış
+            return _store_text(db, f, blob.extracted_text)
+        return refresh_extracted_text(db, f)
+    return f.extracted_text or ""
+
+
+def folder_sources(db: Session, folder_id: int) -> list:
+    """Klasördeki her not/dosya için (kaynak türü, id, etiketli metin)."""
+    result = []
+    # Sabit sıra: parça sınırları ve özet hash'leri istekten isteğe değişmesin
+    notes = db.query(Note).filter(Note.folder_id == folder_id).order_by(Note.id).all()
+    files = db.query(File).filter(File.folder_id == folder_id).order_by(File.id).all()
+
+    for note in notes:
+        result.append(("note", note.id, f"{note_label(note)}\n{note.content}"))
+
+    for f in files:
+        text = file_text(db, f).strip()
+        if text:
+            result.append(("file", f.id, f"{file_label(f)}\n{text}"))
+        else:
+            result.append(("file", f.id, f"[Dosya: {f.filename}] (Tip: {f.filetype})"))
+
+    return result
+
+
+def folder_content_parts(db: Session, folder_id: int) -> list:
+    """Klasördeki her not/dosya için etiketli bir metin parçası."""
+    return [text for _, _, text in folder_sources(db, folder_id)]
+
+
+def assemble_folder_content(db: Session, folder_id: int) -> str:
+    return "\n\n".join(folder_content_parts(db, folder_id))
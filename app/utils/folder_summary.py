@@ -0,0 +1,131 @@
+import os
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ContentSummary, FolderSummary
+from app.utils.folder_content import folder_sources
+from app.utils.context_builder import count_tokens, map_concurrently
+
+# ===================== Config =====================
+# Parça özet istemi değişince artır; tüm kayıtlı parça özetleri bayat sayılır
+SUMMARY_PROMPT_VERSION = 1
+# Bundan kısa notlar/dosyalar LLM'e gönderilmeden olduğu gibi özete girer
+PART_SUMMARY_MIN_TOKENS = int(os.getenv("PART_SUMMARY_MIN_TOKENS") or 300)
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(f"{SUMMARY_PROMPT_VERSION}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _existing_summaries(db: Session, folder_id: int, sources: list) -> dict:
+    note_ids = [sid for stype, sid, _ in sources if stype == "note"]
+    file_ids = [sid for stype, sid, _ in sources if stype == "file"]
+    # Başka klasörden taşınan notun özeti de yeniden kullanılabilir
+    rows = db.query(ContentSummary).filter(or_(
+        ContentSummary.folder_id == folder_id,
+        and_(ContentSummary.source_type == "note", ContentSummary.source_id.in_(note_ids)),
+        and_(ContentSummary.source_type == "file", ContentSummary.source_id.in_(file_ids)),
+    )).all()
+    return {(r.source_type, r.source_id): r for r in rows}
+
+
+def _commit(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        # Aynı klasör eşzamanlı özetlendi; sonuç yine geçerli, kayıt diğer istekten gelir
+        db.rollback()
+
+
+def refresh_part_summaries(db: Session, folder_id: int, summarize_part) -> dict:
+    """
+    Her not/dosyanın özeti içerik hash'iyle saklanır; yalnızca hash'i değişen
+    parçalar summarize_part(text) ile yeniden özetlenir. Parça hash'leri
+    değişmediyse kayıtlı klasör özeti "stored_summary" olarak döner.
+    """
+    sources = folder_sources(db, folder_id)
+    existing = _existing_summaries(db, folder_id, sources) if sources else {}
+    current_keys = set()
+    stale, reused, recomputed = [], [], []
+    for stype, sid, text in sources:
+        key = (stype, sid)
+        current_keys.add(key)
+        row = existing.get(key)
+        content_hash = _content_hash(text)
+        if row is not None and row.content_hash == content_hash:
+            row.folder_id = folder_id
+            reused.append({"type": stype, "id": sid})
+        else:
+            stale.append((key, content_hash, text))
+
+    # Kısa parçalar için model çağrısı yok; uzunlar eşzamanlı özetlenir
+    long_texts = [text for _, _, text in stale if count_tokens(text) >= PART_SUMMARY_MIN_TOKENS]
+    long_summaries = iter(map_concurrently(summarize_part, long_texts))
+    for (stype, sid), content_hash, text in stale:
+        summary = next(long_summaries) if count_tokens(text) >= PART_SUMMARY_MIN_TOKENS else text
+        row = existing.get((stype, sid))
+        if row is None:
+            row = ContentSummary(source_type=stype, source_id=sid)
+            db.add(row)
+            existing[(stype, sid)] = row
+        row.folder_id = folder_id
+        row.content_hash = content_hash
+        row.summary = summary or ""
+        row.updated_at = datetime.utcnow()
+        recomputed.append({"type": stype, "id": sid})
+
+    # Silinen not/dosyaların özetleri
+    for key, row in existing.items():
+        if row.folder_id == folder_id and key not in current_keys:
+            db.delete(row)
+
+    part_summaries = [existing[(stype, sid)].summary for stype, sid, _ in sources]
+    parts_hash = hashlib.sha256(
+        "\n".join(f"{stype}:{sid}:{existing[(stype, sid)].content_hash}" for stype, sid, _ in sources).encode("utf-8")
+    ).hexdigest()
+    _commit(db)
+
+    folder_row = db.query(FolderSummary).filter(FolderSummary.folder_id == folder_id).first()
+    stored = folder_row.summary if folder_row is not None and folder_row.parts_hash == parts_hash else None
+    return {
+        "part_summaries": part_summaries,
+        "parts_hash": parts_hash,
+        "stored_summary": stored,
+        "parts_total": len(sources),
+        "parts_reused": reused,
+        "parts_recomputed": recomputed,
+    }
+
+
+def save_folder_summary(db: Session, folder_id: int, parts_hash: str, summary: str):
+    folder_row = db.query(FolderSummary).filter(FolderSummary.folder_id == folder_id).first()
+    if folder_row is None:
+        folder_row = FolderSummary(folder_id=folder_id)
+        db.add(folder_row)
+    folder_row.parts_hash = parts_hash
+    folder_row.summary = summary
+    folder_row.updated_at = datetime.utcnow()
+    _commit(db)
+
+
+def store_folder_summary(folder_id: int, parts_hash: str, summary: str):
+    """İstek session'ı kapanmış olabilecek yerlerden (SSE akışının sonu) çağrılır."""
+    db = SessionLocal()
+    try:
+        save_folder_summary(db, folder_id, parts_hash, summary)
+    finally:
+        db.close()
+
+
+def reuse_report(result: dict) -> dict:
+    return {
+        "parts_total": result["parts_total"],
+        "parts_reused": result["parts_reused"],
+        "parts_recomputed": result["parts_recomputed"],
+        "rollup_reused": result["rollup_reused"],
+    }
@@ -0,0 +1,315 @@
+import os
+import json
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import IngestJob, File as FileModel, Note, StoredBlob
+from app.utils.blob_store import materialize_and_acquire, hash_file
+from app.utils.compression import CODEC_STORE
+from app.utils.retrieval import index_file, index_note
+from app.utils.thumbnails import THUMBNAIL_EAGER, ensure_thumbnail
+
+# ===================== Config =====================
+UPLOAD_DIR = "uploaded_files"
+INCOMING_DIR = os.path.join(UPLOAD_DIR, "incoming")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS") or 2)
+INGEST_POLL_SEC = float(os.getenv("INGEST_POLL_SEC") or 5)
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS") or 3)
+# Bu süreden uzun "running" kalan iş, başka bir makinede çöken bir worker'dan kalmış sayılır.
+# Aynı makinede yeniden başlayan process kendi yarım işlerini açılışta hemen geri alır.
+INGEST_JOB_TIMEOUT_SEC = int(os.getenv("INGEST_JOB_TIMEOUT_SEC") or 1800)
+
+_HOST = socket.gethostname()
+
+os.makedirs(INCOMING_DIR, exist_ok=True)
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_threads = []
+
+
+# ===================== Pipeline =====================
+def _run_pipeline(db: Session, job: IngestJob) -> dict:
+    sha256 = job.sha256 or hash_file(job.raw_path)
+
+    # --- 1-2. ADIM: Metin çıkarma + sıkıştırma; aynı içerik daha önce geldiyse yeniden kullan ---
+    # Blob son referansıyla tam bu sırada silindiyse yeniden üretilir
+    blob, text_reused, artifact_reused = materialize_and_acquire(db, sha256, job.raw_path, job.original_filename, mime=job.mime)
+
+    if THUMBNAIL_EAGER:
+        _make_thumbnail(blob, job.raw_path)
+
+    # Referans artışı File kaydıyla aynı transaction'da commit edilir; hata olursa birlikte geri alınır
+    return _save_records(db, job, blob, text_reused, artifact_reused)
+
+
+def _make_thumbnail(blob: StoredBlob, raw_path: str):
+    # Ham dosya hâlâ diskte; artefaktı açmadan ondan üretilir. Hata yüklemeyi bozmaz, ilk istekte tekrar denenir
+    try:
+        ensure_thumbnail(blob.sha256, raw_path, blob.mime, codec=CODEC_STORE)
+    except Exception as e:
+        print(f"Önizleme üretilemedi: {blob.sha256} - {e}")
+
+
+def _save_records(db: Session, job: IngestJob, blob: StoredBlob, text_reused: bool, artifact_reused: bool) -> dict:
+    extracted_text = blob.extracted_text
+
+    # --- 3. ADIM: File kaydı ---
+    new_file = FileModel(
+        folder_id=job.folder_id,
+        user_id=job.user_id,
+        demo_session_id=job.demo_session_id,
+        filename=job.original_filename,
+        filepath=blob.stored_path,
+        filetype=blob.mime,
+        extracted_text=extracted_text or "",  # NULL constraint hatasını engelle
+        extractor_version=blob.extractor_version,
+        extracted_at=datetime.utcnow(),
+        blob_sha256=blob.sha256,
+        storage_codec=blob.storage_codec,
+    )
+    db.add(new_file)
+    db.flush()
+
+    # --- 4. ADIM: Note olarak da kaydet (AI notu) ---
+    new_note = None
+    if extracted_text and extracted_text.strip():
+        new_note = Note(
+            folder_id=job.folder_id,
+            demo_session_id=job.demo_session_id,
+            title=job.original_filename,
+            content=extracted_text,
+        )
+        db.add(new_note)
+        db.flush()
+
+    job.file_id = new_file.id
+    job.note_id = new_note.id if new_note else None
+    return {
+        "file_id": new_file.id,
+        "note_id": new_note.id if new_note else None,
+        "filename": new_file.filename,
+        "type": new_file.filetype,
+        "extracted_text_preview": extracted_text[:300] if extracted_text else None,
+        "deduplicated": text_reused and artifact_reused,
+    }
+
+
+# ===================== Kuyruk =====================
+def create_job(db: Session, job_id: str, folder_id: int, original_filename: str, raw_path: str,
+               size: int = None, sha256: str = None, mime: str = None, user_id: int = None, demo_session_id: int = None) -> IngestJob:
+    job = IngestJob(
+        id=job_id,
+        folder_id=folder_id,
+        user_id=user_id,
+        demo_session_id=demo_session_id,
+        original_filename=original_filename,
+        raw_path=raw_path,
+        size=size,
+        sha256=sha256,
+        mime=mime,
+        status="queued",
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _wakeup.set()
+    return job
+
+
+def _claimable():
+    stale_before = datetime.utcnow() - timedelta(seconds=INGEST_JOB_TIMEOUT_SEC)
+    return or_(
+        IngestJob.status == "queued",
+        and_(IngestJob.status == "running", IngestJob.started_at < stale_before),
+    )
+
+
+def _claim_next(db: Session):
+    """Sıradaki işi atomik olarak 'running' yapar; başka worker kaptıysa bir sonrakine geçer."""
+    candidates = (
+        db.query(IngestJob.id)
+        .filter(_claimable())
+        .order_by(IngestJob.created_at)
+        .limit(10)
+        .all()
+    )
+    for (job_id,) in candidates:
+        updated = (
+            db.query(IngestJob)
+            .filter(IngestJob.id == job_id, _claimable())
+            .update(
+                {
+                    IngestJob.status: "running",
+                    IngestJob.started_at: datetime.utcnow(),
+                    IngestJob.attempts: IngestJob.attempts + 1,
+                    IngestJob.claimed_by: f"{_HOST}:{os.getpid()}",
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if updated == 1:
+            return db.query(IngestJob).filter(IngestJob.id == job_id).first()
+    return None
+
+
+def _remove_raw(job: IngestJob):
+    if job.raw_path and os.path.exists(job.raw_path):
+        try:
+            os.remove(job.raw_path)
+        except Exception as e:
+            print(f"Ham dosya silinirken hata: {e}")
+
+
+def _index_records(db: Session, job: IngestJob):
+    # Yeni dosya ve ondan üretilen not folder_chat aramasına eklenir
+    if job.file_id:
+        index_file(db, db.query(FileModel).filter(FileModel.id == job.file_id).first())
+    if job.note_id:
+        index_note(db, db.query(Note).filter(Note.id == job.note_id).first())
+
+
+def process_job(db: Session, job: IngestJob):
+    try:
+        result = _run_pipeline(db, job)
+        job.status = "done"
+        job.error = None
+        job.result = json.dumps(result, ensure_ascii=False)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        _remove_raw(job)
+        _index_records(db, job)
+    except Exception as e:
+        db.rollback()
+        print(f"Ingest job error: {job.id} - {e}\n{traceback.format_exc()}")
+        job = db.query(IngestJob).filter(IngestJob.id == job.id).first()
+        job.error = str(e)[:1000]
+        if job.attempts >= INGEST_MAX_ATTEMPTS or not os.path.exists(job.raw_path):
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            _remove_raw(job)
+        else:
+            job.status = "queued"
+        db.commit()
+
+
+def _worker_loop():
+    while not _stop.is_set():
+        db = SessionLocal()
+        try:
+            job = _claim_next(db)
+            if job is not None:
+                process_job(db, job)
+                continue
+        except Exception as e:
+            print(f"Ingest worker error: {e}\n{traceback.format_exc()}")
+        finally:
+            db.close()
+        _wakeup.wait(INGEST_POLL_SEC)
+        _wakeup.clear()
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return False  # yeni açıldık; bu pid'le kayıtlı iş önceki (ölmüş) process'ten kalmış
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # başka kullanıcının process'i; yaşıyor say
+    return True
+
+
+def requeue_orphaned_jobs() -> int:
+    """
+    Bu makinede ölmüş process'lerin "running" bıraktığı işleri hemen kuyruğa döndürür;
+    deploy sırasında yarıda kalan yüklemeler zaman aşımını beklemez. Yaşayan
+    komşu worker'ların (aynı makinedeki diğer uvicorn process'leri) işlerine dokunulmaz.
+    """
+    db = SessionLocal()
+    try:
+        orphaned = []
+        for job_id, claimed_by in (
+            db.query(IngestJob.id, IngestJob.claimed_by)
+            .filter(IngestJob.status == "running", IngestJob.claimed_by.like(f"{_HOST}:%"))
+            .all()
+        ):
+            pid = claimed_by.rsplit(":", 1)[1]
+            if not pid.isdigit() or not _pid_alive(int(pid)):
+                orphaned.append((job_id, claimed_by))
+        requeued = 0
+        for job_id, claimed_by in orphaned:
+            # Yeniden başlatma işin hatası değil; deneme hakkı iade edilir
+            requeued += (
+                db.query(IngestJob)
+                .filter(IngestJob.id == job_id, IngestJob.status == "running", IngestJob.claimed_by == claimed_by)
+                .update(
+                    {
+                        IngestJob.status: "queued",
+                        IngestJob.started_at: None,
+                        IngestJob.claimed_by: None,
+                        IngestJob.attempts: IngestJob.attempts - 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+        db.commit()
+        if requeued:
+            print(f"Yarım kalan {requeued} yükleme işi yeniden kuyruğa alındı")
+        return requeued
+    except Exception as e:
+        db.rollback()
+        print(f"Yarım kalan işler geri alınamadı: {e}\n{traceback.format_exc()}")
+        return 0
+    finally:
+        db.close()
+
+
+def start_workers():
+    """Uygulama açılışında çağrılır; bu makinede yarım kalan işler hemen yeniden kuyruğa girer."""
+    if _threads:
+        return
+    _stop.clear()
+    requeue_orphaned_jobs()
+    for i in range(INGEST_WORKERS):
+        t = threading.Thread(target=_worker_loop, name=f"ingest-worker-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+
+
+def stop_workers():
+    _stop.set()
+    _wakeup.set()
+
+
+def job_to_dict(job: IngestJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "folder_id": job.folder_id,
+        "filename": job.original_filename,
+        "attempts": job.attempts,
+        "error": job.error if job.status == "failed" else None,
+        "result": json.loads(job.result) if job.result else None,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def queue_stats() -> dict:
+    db = SessionLocal()
+    try:
+        counts = {}
+        for status in ("queued", "running", "done", "failed"):
+            counts[status] = db.query(IngestJob).filter(IngestJob.status == status).count()
+        return {"workers": len(_threads), **counts}
+    finally:
+        db.close()
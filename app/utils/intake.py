@@ -0,0 +1,141 @@
+import os
+import re
+import hashlib
+import mimetypes
+from typing import NamedTuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from starlette.concurrency import run_in_threadpool
+
+# ===================== Config =====================
+INTAKE_CHUNK_SIZE = int(os.getenv("INTAKE_CHUNK_SIZE") or 256 * 1024)
+SNIFF_BYTES = 64
+# multipart sınırları/başlıkları için istek gövdesine tanınan pay
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class IntakeResult(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+    mime: str
+
+
+# Zip tabanlı kapsayıcılar (docx/xlsx/pptx...) için uzantı tahmini daha doğru
+_ZIP_CONTAINER_EXTS = {".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub", ".jar", ".apk"}
+
+
+def sniff_mime(head: bytes, filename: str = "") -> str:
+    """İlk baytlara (magic number) bakarak MIME türünü tahmin eder; bulamazsa uzantıya bakar."""
+    guessed = mimetypes.guess_type(filename or "")[0]
+    if head.startswith(b"%PDF"):
+        return "application/pdf"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head.startswith(b"ID3") or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "audio/mpeg"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"M4A ", b"M4B "):
+            return "audio/mp4"
+        return guessed if guessed and guessed.startswith(("audio/", "video/")) else "video/mp4"
+    if head.startswith(b"PK\x03\x04"):
+        if os.path.splitext(filename or "")[1].lower() in _ZIP_CONTAINER_EXTS and guessed:
+            return guessed
+        return "application/zip"
+    return guessed or "application/octet-stream"
+
+
+def _copy_spooled(src, dest_path: str, max_bytes: int) -> tuple:
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            chunk = src.read(INTAKE_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail="Dosya çok büyük!")
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+            digest.update(chunk)
+            out.write(chunk)
+    return size, digest.hexdigest(), head
+
+
+async def stream_to_disk(upload: UploadFile, dest_path: str, max_bytes: int) -> IntakeResult:
+    """
+    Yüklenen dosyayı parça parça hedef dosyaya kopyalar; SHA-256 ve MIME türü aynı geçişte
+    hesaplanır. Starlette gövdeyi bu noktada zaten geçici dosyaya almıştır: erken 413
+    UploadSizeLimitMiddleware'in işidir, buradaki boyut kontrolü yalnızca son emniyettir.
+    Kopyanın tamamı tek bir threadpool çağrısında yapılır; parça başına havuz geçişi olmaz.
+    """
+    if getattr(upload, "size", None) is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail="Dosya çok büyük!")
+
+    try:
+        await upload.seek(0)
+        size, sha256, head = await run_in_threadpool(_copy_spooled, upload.file, dest_path, max_bytes)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return IntakeResult(dest_path, size, sha256, sniff_mime(head, upload.filename))
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Yükleme uç noktalarında istek gövdesini akarken sayar; limit aşılırsa
+    multipart ayrıştırması bitmeden 413 ile keser. Content-Length biliniyorsa
+    gövde hiç okunmadan reddedilir.
+    """
+
+    def __init__(self, app, max_bytes: int, path_pattern: str):
+        self.app = app
+        self.max_bytes = max_bytes + MULTIPART_OVERHEAD
+        self.path_re = re.compile(path_pattern)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.path_re.fullmatch(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": "Dosya çok büyük!"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Dosya çok büyük!")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models import LLMCacheEntry
+
+# ===================== Config =====================
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC") or 7 * 24 * 3600)
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES") or 512)
+LLM_CACHE_DB_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DB_MAX_ENTRIES") or 20000)
+# Bundan uzun yanıtlar saklanmaz (bayt, UTF-8)
+LLM_CACHE_MAX_VALUE_BYTES = int(os.getenv("LLM_CACHE_MAX_VALUE_BYTES") or 256 * 1024)
+
+
+def cache_key(model: str, messages, max_tokens: int, temperature: float, **extra) -> str:
+    """Aynı model + mesajlar + üretim parametreleri -> aynı anahtar."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        **extra,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    İki katmanlı yanıt önbelleği: process içi LRU (milisaniye) ve restart'tan
+    sağ çıkan veritabanı katmanı. DB'den gelen kayıt bellek katmanına da alınır.
+    """
+
+    def __init__(self, ttl_sec: int = LLM_CACHE_TTL_SEC, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 db_max_entries: int = LLM_CACHE_DB_MAX_ENTRIES):
+        self.ttl = ttl_sec
+        self.memory_entries = memory_entries
+        self.db_max_entries = db_max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at monotonic)
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "bypassed": 0,
+            "evictions": 0, "expired": 0, "db_errors": 0, "too_large": 0,
+        }
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _remember(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._memory[key] = (value, time.monotonic() + ttl)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get(self, key: str, count_miss: bool = True):
+        """
+        Önbellekteki yanıtı döner; yoksa veya süresi dolmuşsa None. Aynı istek için
+        ikinci bakışta (single-flight liderinin yeniden kontrolü) count_miss=False verilir.
+        """
+        if not LLM_CACHE_ENABLED:
+            return None
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).first()
+            now = datetime.utcnow()
+            if entry is None or (entry.expires_at is not None and entry.expires_at <= now):
+                if count_miss:
+                    self._count("misses")
+                return None
+            value = entry.response
+            remaining = (entry.expires_at - now).total_seconds() if entry.expires_at else self.ttl
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).update(
+                {LLMCacheEntry.hits: LLMCacheEntry.hits + 1}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            # Önbellek hatası isteği bozmamalı; model çağrısına düşülür
+            db.rollback()
+            self._count("db_errors")
+            self._count("misses")
+            print(f"LLM cache okuma hatası: {e}")
+            return None
+        finally:
+            db.close()
+
+        self._count("db_hits")
+        self._remember(key, value, remaining)
+        return value
+
+    def put(self, key: str, model: str, value: str, ttl_sec: int = None):
+        if not LLM_CACHE_ENABLED or not value:
+            return
+        if len(value.encode("utf-8")) > LLM_CACHE_MAX_VALUE_BYTES:
+            self._count("too_large")
+            return
+        ttl = ttl_sec or self.ttl
+        self._remember(key, value, ttl)
+
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).first()
+            if entry is None:
+                entry = LLMCacheEntry(key=key, model=model)
+                db.add(entry)
+            entry.response = value
+            entry.created_at = datetime.utcnow()
+            entry.expires_at = entry.created_at + timedelta(seconds=ttl)
+            db.commit()
+            self._count("stores")
+        except IntegrityError:
+            # Aynı yanıtı eşzamanlı başka bir istek yazdı
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            self._count("db_errors")
+            print(f"LLM cache yazma hatası: {e}")
+        finally:
+            db.close()
+
+    def note_bypass(self):
+        self._count("bypassed")
+
+    def prune(self) -> int:
+        """Süresi dolan kayıtları ve kapasiteyi aşan en eski kayıtları siler."""
+        db = SessionLocal()
+        try:
+            removed = (
+                db.query(LLMCacheEntry)
+                .filter(LLMCacheEntry.expires_at <= datetime.utcnow())
+                .delete(synchronize_session=False)
+            )
+            overflow = db.query(LLMCacheEntry).count() - self.db_max_entries
+            if overflow > 0:
+                oldest = [
+                    key for (key,) in db.query(LLMCacheEntry.key)
+                    .order_by(LLMCacheEntry.created_at)
+                    .limit(overflow)
+                    .all()
+                ]
+                removed += (
+                    db.query(LLMCacheEntry)
+                    .filter(LLMCacheEntry.key.in_(oldest))
+                    .delete(synchronize_session=False)
+                )
+            db.commit()
+            return removed
+        except Exception as e:
+            db.rollback()
+            print(f"LLM cache temizleme hatası: {e}\n{traceback.format_exc()}")
+            return 0
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            memory_entries = len(self._memory)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "ttl_sec": self.ttl,
+            "memory_entries": memory_entries,
+            "memory_max_entries": self.memory_entries,
+            "db_max_entries": self.db_max_entries,
+            **stats,
+            "hit_ratio": (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else None,
+        }
+
+
+llm_cache = LLMResponseCache()
+
+
+def prune_llm_cache() -> int:
+    return llm_cache.prune()
+
+
+def llm_cache_stats() -> dict:
+    return llm_cache.stats()
@@ -0,0 +1,221 @@
+import os
+import random
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+# ===================== Config =====================
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS") or 200)
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE") or 40)
+# Aynı anda upstream'e giden en fazla istek; fazlası kuyrukta bekler
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY") or 64)
+OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC") or 60)
+OPENAI_CONNECT_TIMEOUT_SEC = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SEC") or 10)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES") or 4)
+OPENAI_BACKOFF_BASE_SEC = float(os.getenv("OPENAI_BACKOFF_BASE_SEC") or 0.5)
+OPENAI_BACKOFF_MAX_SEC = float(os.getenv("OPENAI_BACKOFF_MAX_SEC") or 20)
+
+# Tek AsyncOpenAI istemcisi tek bir arka plan event loop'unda yaşar (tool_runner ile aynı düzen);
+# böylece bağlantı havuzu ve semafor hem async handler'lar hem thread'ler için ortaktır.
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_semaphore = None
+_stats = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "in_flight": 0, "waiting": 0}
+
+
+def _get_loop():
+    global _loop, _client, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("OPENAI_API_KEY env değişkeni set edilmeli.")
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                ),
+                timeout=httpx.Timeout(OPENAI_TIMEOUT_SEC, connect=OPENAI_CONNECT_TIMEOUT_SEC),
+            )
+            # Yeniden deneme burada yapılır (jitter + semafor farkındalığı); SDK'nınki kapalı
+            _client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+            _semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+            _loop = loop
+        return _loop
+
+
+@asynccontextmanager
+async def _slot():
+    _stats["waiting"] += 1
+    try:
+        await _semaphore.acquire()
+    finally:
+        _stats["waiting"] -= 1
+    _stats["in_flight"] += 1
+    _stats["requests"] += 1
+    try:
+        yield
+    finally:
+        _stats["in_flight"] -= 1
+        _semaphore.release()
+
+
+def _retry_delay(error, attempt: int):
+    """Yeniden denenebilir hatada beklenecek süre; denenmeyecekse None."""
+    if isinstance(error, APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), OPENAI_BACKOFF_MAX_SEC)
+            except ValueError:
+                pass
+    elif not isinstance(error, (APIConnectionError, APITimeoutError)):
+        return None
+    # Full jitter: aynı anda 429 alan istekler aynı anda tekrar denemesin
+    return random.uniform(0, min(OPENAI_BACKOFF_MAX_SEC, OPENAI_BACKOFF_BASE_SEC * 2 ** attempt))
+
+
+async def _with_retries(call):
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            if isinstance(e, APITimeoutError):
+                _stats["timeouts"] += 1
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt >= OPENAI_MAX_RETRIES:
+                _stats["failed"] += 1
+                raise
+            attempt += 1
+            _stats["retries"] += 1
+            print(f"OpenAI isteği tekrar denenecek ({attempt}/{OPENAI_MAX_RETRIES}, {delay:.1f}s): {e}")
+            await asyncio.sleep(delay)
+
+
+async def _chat(kwargs: dict, timeout: float):
+    async with _slot():
+        result = await _with_retries(lambda: _client.chat.completions.create(timeout=timeout, **kwargs))
+    _stats["succeeded"] += 1
+    return result
+
+
+def submit_chat(timeout: float = OPENAI_TIMEOUT_SEC, **kwargs):
+    """chat.completions.create'i ortak istemcide başlatır; concurrent.futures.Future döner."""
+    return asyncio.run_coroutine_threadsafe(_chat(kwargs, timeout), _get_loop())
+
+
+async def achat(timeout: float = OPENAI_TIMEOUT_SEC, **kwargs):
+    """Async handler'lar için: thread tutmadan yanıtı bekler."""
+    return await asyncio.wrap_future(submit_chat(timeout=timeout, **kwargs))
+
+
+def chat(timeout: float = OPENAI_TIMEOUT_SEC, **kwargs):
+    """Thread'lerden (map-reduce, parça özetleri) çağrılır; yanıt gelene kadar bekler."""
+    return submit_chat(timeout=timeout, **kwargs).result()
+
+
+async def _bridge(make_agen):
+    """
+    İstemci loop'unda çalışan async üreticinin çıktısını çağıranın loop'una taşır.
+    Tüketici durursa (istemci bağlantıyı kapattı, iptal) üretici de iptal edilir
+    ve upstream yanıt kapanır.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for item in make_agen():
+                loop.call_soon_threadsafe(queue.put_nowait, (True, item))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (False, e))
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, (False, None))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    try:
+        while True:
+            ok, item = await queue.get()
+            if ok:
+                yield item
+            elif item is None:
+                return
+            else:
+                raise item
+    finally:
+        future.cancel()
+
+
+async def _retrying_stream(open_stream, iterate):
+    """Akış ilk parçayı vermeden hata alırsa tekrar dener; veri aktıktan sonra hata olduğu gibi çıkar."""
+    async with _slot():
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with open_stream() as response:
+                    async for item in iterate(response):
+                        started = True
+                        yield item
+                _stats["succeeded"] += 1
+                return
+            except Exception as e:
+                delay = None if started else _retry_delay(e, attempt)
+                if delay is None or attempt >= OPENAI_MAX_RETRIES:
+                    _stats["failed"] += 1
+                    raise
+                attempt += 1
+                _stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+
+@asynccontextmanager
+async def _chat_stream(kwargs: dict, timeout: float):
+    stream = await _client.chat.completions.create(stream=True, timeout=timeout, **kwargs)
+    try:
+        yield stream
+    finally:
+        await stream.close()
+
+
+async def _chat_deltas(stream):
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+def astream_chat(timeout: float = OPENAI_TIMEOUT_SEC, **kwargs):
+    """Sohbet yanıtını metin parçaları (delta) olarak akıtan async iterator."""
+    return _bridge(lambda: _retrying_stream(lambda: _chat_stream(kwargs, timeout), _chat_deltas))
+
+
+async def _speech_bytes(response):
+    async for chunk in response.iter_bytes():
+        yield chunk
+
+
+def astream_speech(timeout: float = OPENAI_TIMEOUT_SEC, **kwargs):
+    """TTS ses baytlarını akıtan async iterator."""
+    return _bridge(lambda: _retrying_stream(
+        lambda: _client.audio.speech.with_streaming_response.create(timeout=timeout, **kwargs),
+        _speech_bytes,
+    ))
+
+
+def llm_client_stats() -> dict:
+    return {
+        "max_concurrency": OPENAI_MAX_CONCURRENCY,
+        "max_connections": OPENAI_MAX_CONNECTIONS,
+        "timeout_sec": OPENAI_TIMEOUT_SEC,
+        **_stats,
+    }
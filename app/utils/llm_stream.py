@@ -0,0 +1,144 @@
+import json
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.llm_cache import llm_cache, cache_key
+from app.utils.llm_client import astream_chat
+
+_OPEN_TAG = "<think>"
+_CLOSE_TAG = "</think>"
+
+
+def _partial_tag_len(buffer: str, tag: str) -> int:
+    """buffer'ın sonu tag'in başlangıcıyla ne kadar örtüşüyor (yarım gelmiş etiket)."""
+    lowered = buffer.lower()
+    for n in range(min(len(tag) - 1, len(buffer)), 0, -1):
+        if lowered.endswith(tag[:n]):
+            return n
+    return 0
+
+
+class ThinkStripper:
+    """
+    clean_ai_response'un akış sürümü: <think>...</think> bloklarını parça parça
+    gelen metinden çıkarır. Parçalara bölünmüş etiketler için sondaki olası
+    etiket başlangıcı bir sonraki parçaya kadar bekletilir.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._started = False
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            # clean_ai_response gibi baştaki boşlukları at
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+    def feed(self, delta: str) -> str:
+        self._buffer += delta
+        out = []
+        while True:
+            if self._in_think:
+                end = self._buffer.lower().find(_CLOSE_TAG)
+                if end == -1:
+                    # Düşünce metni atılır; yalnız yarım kapanış etiketi tutulur
+                    keep = _partial_tag_len(self._buffer, _CLOSE_TAG)
+                    self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+                    break
+                self._buffer = self._buffer[end + len(_CLOSE_TAG):]
+                self._in_think = False
+            else:
+                start = self._buffer.lower().find(_OPEN_TAG)
+                if start == -1:
+                    keep = _partial_tag_len(self._buffer, _OPEN_TAG)
+                    cut = len(self._buffer) - keep
+                    out.append(self._buffer[:cut])
+                    self._buffer = self._buffer[cut:]
+                    break
+                out.append(self._buffer[:start])
+                self._buffer = self._buffer[start + len(_OPEN_TAG):]
+                self._in_think = True
+        return self._emit("".join(out))
+
+    def finish(self) -> str:
+        # Kapanmamış <think> bloğu sonuna kadar atılır
+        rest = "" if self._in_think else self._buffer
+        self._buffer = ""
+        return self._emit(rest)
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Proxy (nginx) tamponlamasın; parçalar anında istemciye gitsin
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def stream_chat_completion(request: Request, model: str, messages: list, max_tokens: int,
+                                 temperature: float, use_cache: bool = True, on_complete=None):
+    """
+    OpenAI token delta'larını SSE olarak aktarır: her parça "data: {"delta": ...}",
+    sonunda "event: done" ile temizlenmiş tam metin. İstemci bağlantıyı kapatırsa
+    upstream akış da kapatılır (token üretimi ve ücret durur). Tamamlanan yanıt
+    LLM önbelleğine yazılır; on_complete(text) varsa thread havuzunda çağrılır.
+    """
+    key = cache_key(model, messages, max_tokens, temperature)
+    if use_cache:
+        cached = await run_in_threadpool(llm_cache.get, key)
+        if cached is not None:
+            if on_complete:
+                await run_in_threadpool(on_complete, cached)
+            yield sse_event({"delta": cached})
+            yield sse_event({"text": cached, "cached": True}, event="done")
+            return
+    else:
+        llm_cache.note_bypass()
+
+    # Bağlantı kurulamazsa (retry'lar dahil) ilk parçadan önce hata gelir
+    stream = astream_chat(model=model, messages=messages, max_tokens=max_tokens, temperature=temperature, n=1)
+    stripper = ThinkStripper()
+    parts = []
+    started = False
+    completed = False
+    try:
+        async for delta in stream:
+            started = True
+            if await request.is_disconnected():
+                break
+            visible = stripper.feed(delta)
+            if visible:
+                parts.append(visible)
+                yield sse_event({"delta": visible})
+        else:
+            completed = True
+    except Exception as e:
+        print(f"LLM stream hatası: {e}")
+        detail = "AI yanıtı yarıda kesildi." if started else "AI servisine ulaşılamadı."
+        yield sse_event({"detail": detail}, event="error")
+    finally:
+        # Upstream akış istemci loop'unda iptal edilir; bağlantı açık kalmaz
+        await stream.aclose()
+
+    if not completed:
+        return
+    tail = stripper.finish()
+    if tail:
+        parts.append(tail)
+        yield sse_event({"delta": tail})
+    text = "".join(parts).strip()
+    await run_in_threadpool(llm_cache.put, key, model, text)
+    if on_complete and text:
+        await run_in_threadpool(on_complete, text)
+    yield sse_event({"text": text, "cached": False}, event="done")
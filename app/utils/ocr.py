@@ -0,0 +1,30 @@
+import os
+
+from PIL import Image
+import pytesseract
+
+try:
+    from pdf2image import convert_from_path
+except ImportError:
+    convert_from_path = None
+
+# Bu modül cpu havuzunun process'lerine import edilir; ağır bağımlılık (whisper/torch) eklemeyin.
+
+# ===================== Config =====================
+OCR_LANG = "tur+eng"
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI") or 200)
+
+
+def ocr_image(filepath, lang=OCR_LANG):
+    with Image.open(filepath) as img:
+        return pytesseract.image_to_string(img, lang=lang)
+
+
+def ocr_pdf_page(filepath, page_index):
+    """Tek bir sayfayı (0 tabanlı) rasterize edip OCR'lar."""
+    images = convert_from_path(filepath, dpi=PDF_OCR_DPI, first_page=page_index + 1, last_page=page_index + 1)
+    try:
+        return pytesseract.image_to_string(images[0], lang=OCR_LANG) if images else ""
+    finally:
+        for img in images:
+            img.close()
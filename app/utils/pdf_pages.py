@@ -0,0 +1,118 @@
+import os
+import math
+import signal
+import threading
+import traceback
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+
+from app.utils.executors import cpu_pool
+
+# Bu modül cpu havuzunun process'lerine import edilir; ağır bağımlılık (whisper/torch) eklemeyin.
+
+# ===================== Config =====================
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES") or 40)
+PDF_PAGE_TIMEOUT_SEC = float(os.getenv("PDF_PAGE_TIMEOUT_SEC") or 10)
+PDF_MIN_SHARD_PAGES = 8
+
+
+class PageTimeout(BaseException):
+    # BaseException: pdfminer'ın geniş "except Exception" blokları zaman aşımını yutmasın
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise PageTimeout()
+
+
+@contextmanager
+def _page_deadline(seconds: float):
+    """
+    Tek bir sayfanın okunmasına süre sınırı koyar. cpu worker'ları görevleri process'in
+    ana thread'inde çalıştırır; SIGALRM orada kullanılabilir. Başka bir thread'de sınır yok.
+    """
+    if seconds <= 0 or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def extract_page_range(filepath: str, start: int, end: int) -> list:
+    """
+    [start, end) aralığındaki sayfaların metin katmanını sırasıyla döndürür. Süresi
+    (PDF_PAGE_TIMEOUT_SEC) dolan sayfa boş kalır; worker öldürülmez, sonraki sayfaya geçilir.
+    """
+    texts = []
+    with pdfplumber.open(filepath) as pdf:
+        for number, page in enumerate(pdf.pages[start:end], start):
+            try:
+                with _page_deadline(PDF_PAGE_TIMEOUT_SEC):
+                    text = page.extract_text() or ""
+            except PageTimeout:
+                print(f"PDF page timeout: {filepath} page {number + 1}")
+                text = ""
+            texts.append(text)
+            page.flush_cache()
+    return texts
+
+
+def extract_page_ranges(filepath: str, ranges: list) -> list:
+    """Aralıkları tek worker'da art arda okur; çöken havuzdan kalan sayfalar için."""
+    return [extract_page_range(filepath, start, end) for start, end in ranges]
+
+
+def count_pages(filepath: str) -> int:
+    with pdfplumber.open(filepath) as pdf:
+        return len(pdf.pages)
+
+
+def _shards(page_count: int, workers: int):
+    size = max(PDF_MIN_SHARD_PAGES, math.ceil(page_count / (workers * 2)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def extract_native_pages(filepath: str, page_count: int = None) -> list:
+    """
+    Her sayfanın metin katmanını sayfa sırasıyla döndürür. Çağıran thread'de (extract
+    havuzu) çalışır ve yalnızca sayfa aralıklarını cpu havuzuna dağıtır: PDF_PARALLEL_MIN_PAGES
+    altındaki dosyalar tek parça, büyükler birden çok worker'da paralel okunur.
+    """
+    if page_count is None:
+        page_count = cpu_pool.call(count_pages, filepath)
+    if page_count < PDF_PARALLEL_MIN_PAGES or cpu_pool.max_workers < 2:
+        shards = [(0, page_count)]
+    else:
+        shards = _shards(page_count, cpu_pool.max_workers)
+    futures = [cpu_pool.submit(extract_page_range, filepath, start, end) for start, end in shards]
+
+    # Sayfa başına süre sınırı worker içinde uygulanır; burada parça parça zaman aşımı beklenmez
+    results, lost = {}, []
+    for shard, future in zip(shards, futures):
+        try:
+            results[shard] = future.result()
+        except BrokenProcessPool:
+            # Havuzdaki bir worker çöktü (ör. başka bir dosyada OOM); bu parça sonuçsuz düştü
+            lost.append(shard)
+        except Exception as e:
+            print(f"PDF page shard error: {filepath} {list(shard)} - {e}\n{traceback.format_exc()}")
+    if lost:
+        print(f"PDF page shards lost to a broken pool, re-reading serially: {filepath} {lost}")
+        try:
+            # Tek worker'da sırayla: çöküşün sebebi bu dosyaysa havuzu bir daha topluca düşürmesin
+            results.update(zip(lost, cpu_pool.call(extract_page_ranges, filepath, lost)))
+        except Exception as e:
+            print(f"PDF page re-read error: {filepath} - {e}")
+
+    pages = []
+    for start, end in shards:
+        # Eksik sayfalar boş string olarak kalır ki sayfa sırası bozulmasın
+        pages.extend((results.get((start, end), []) + [""] * (end - start))[: end - start])
+    return pages
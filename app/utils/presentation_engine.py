@@ -0,0 +1,146 @@
+import os
+import json
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.llm_cache import llm_cache, cache_key
+from app.utils.llm_client import achat
+from app.utils.single_flight import llm_flight, flight_key
+
+# ===================== Config =====================
+# İstem veya temizleme kuralları değişince artır; önbellekteki desteler bayat sayılır
+DECK_VERSION = 1
+DECK_MAX_TOKENS = int(os.getenv("DECK_MAX_TOKENS") or 1200)
+DECK_TEMPERATURE = 0.7
+DECK_MIN_SLIDES = 6
+DECK_MAX_SLIDES = 10
+DECK_MAX_BULLETS = 5
+
+_SYSTEM_MSG = (
+    "Sadece GEÇERLİ JSON üret. Markdown veya açıklama verme.\n"
+    "Şema:\n{\n"
+    '  "title": "string",\n'
+    '  "slides": [ {"title": "string", "bullets": ["string", ...], "notes": "string"} ]\n'
+    "}\n"
+    f"Kurallar: {DECK_MIN_SLIDES}-{DECK_MAX_SLIDES} slayt, bullets en fazla {DECK_MAX_BULLETS} madde; "
+    "her madde 15 kelimeyi aşmasın. 'notes' kısa olsun. Türkçe yaz."
+)
+
+_FALLBACK_DECK = {
+    "title": "Otomatik Sunum",
+    "slides": [{"title": "Özet", "bullets": ["İçerik analiz edildi.", "JSON formatı alınamadı."], "notes": ""}],
+}
+
+
+def _deck_messages(content: str, style: str = None) -> list:
+    style_hint = f"\nStil: {style}. Ton: net ve Türkçe. Başlıklar kısa, maddeler tek satır." if style else ""
+    return [
+        {"role": "system", "content": _SYSTEM_MSG},
+        {"role": "user", "content": f"Aşağıdaki içerikten {DECK_MIN_SLIDES}-{DECK_MAX_SLIDES} slayt arası sunum üret.{style_hint}\n\nİçerik:\n{content}"},
+    ]
+
+
+def normalize_deck(data: dict) -> dict:
+    """Model çıktısını tek biçime getirir: kısa başlıklar, en fazla 5 madde, 6-10 slayt."""
+    slides = []
+    for s in (data.get("slides") or []) if isinstance(data, dict) else []:
+        if not isinstance(s, dict):
+            continue
+        title = str(s.get("title") or "").strip()[:90]
+        bullets = [b.strip() for b in (s.get("bullets") or []) if isinstance(b, str) and b.strip()][:DECK_MAX_BULLETS]
+        notes = str(s.get("notes") or "").strip()
+        if title and bullets:
+            slides.append({"title": title, "bullets": bullets, "notes": notes})
+    while len(slides) < DECK_MIN_SLIDES:
+        slides.append({"title": f"Ek {len(slides) + 1}", "bullets": ["Önemli nokta", "Örnek/çıkarım"], "notes": ""})
+    title = (str(data.get("title") or "") if isinstance(data, dict) else "").strip()[:90] or "Sunum"
+    return {"title": title, "slides": slides[:DECK_MAX_SLIDES]}
+
+
+async def generate_deck(content: str, model: str, style: str = None, use_cache: bool = True) -> tuple:
+    """
+    Klasör içeriğinden normalize deste üretir; (deste, önbellekten mi) döner.
+    Anahtar içerik + stil + model'den türetilir, yani klasör değişmedikçe
+    Canva/Gamma/PPT görünümleri arasında geçiş yeni model çağrısı yapmaz.
+    """
+    messages = _deck_messages(content, style)
+    key = cache_key(model, messages, DECK_MAX_TOKENS, DECK_TEMPERATURE, kind="deck", deck_version=DECK_VERSION)
+    if use_cache:
+        cached = await run_in_threadpool(llm_cache.get, key)
+        if cached is not None:
+            return json.loads(cached), True
+    else:
+        llm_cache.note_bypass()
+    # Aynı klasör + stil için uçuştaki üretim varsa (görünüm değiştirme, çift tık) o beklenir
+    return await llm_flight.ado(flight_key(key, use_cache), _generate_deck, key, messages, model, use_cache)
+
+
+async def _generate_deck(key: str, messages: list, model: str, use_cache: bool = True) -> tuple:
+    if use_cache:
+        # Önceki lider ilk bakış ile liderlik arasında bitirip yazmış olabilir; model tekrar çağrılmasın
+        cached = await run_in_threadpool(llm_cache.get, key, False)
+        if cached is not None:
+            return json.loads(cached), True
+    raw = await achat(
+        model=model,
+        messages=messages,
+        max_tokens=DECK_MAX_TOKENS,
+        temperature=DECK_TEMPERATURE,
+        n=1,
+        response_format={"type": "json_object"},
+    )
+    try:
+        data = json.loads((raw.choices[0].message.content or "").strip())
+    except Exception as e:
+        # Bozuk çıktı önbelleğe yazılmaz; bir sonraki istek yeniden dener
+        print(f"Sunum JSON'u çözülemedi: {e}")
+        return normalize_deck(_FALLBACK_DECK), False
+
+    deck = normalize_deck(data)
+    await run_in_threadpool(llm_cache.put, key, model, json.dumps(deck, ensure_ascii=False))
+    return deck, False
+
+
+# ===================== Renderer'lar =====================
+def canva_pages(deck: dict, cover: bool = False) -> list:
+    pages = []
+    if cover:
+        pages.append({
+            "elements": [
+                {"type": "heading", "text": deck["title"]},
+                {"type": "subheading", "text": "AI tarafından oluşturulan sunum"},
+            ],
+            "notes": "",
+        })
+    for s in deck["slides"]:
+        pages.append({
+            "elements": [
+                {"type": "heading", "text": s["title"]},
+                {"type": "bulleted_list", "items": s["bullets"]},
+            ],
+            "notes": s.get("notes") or "",
+        })
+    return pages
+
+
+def render_canva_payload(deck: dict) -> dict:
+    return {"title": deck["title"], "pages": canva_pages(deck)}
+
+
+def render_gamma_markdown(deck: dict) -> str:
+    # Gamma.app "paste" akışı: her ## yeni kart
+    lines = [f"# {deck['title']}", ""]
+    for s in deck["slides"]:
+        lines.append(f"## {s['title']}")
+        lines += [f"- {b}" for b in s["bullets"]]
+        if s.get("notes"):
+            lines.append(f"> Konuşmacı Notu: {s['notes']}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def render_ppt_markdown(deck: dict) -> str:
+    return "\n".join(
+        [f"# {deck['title']}"]
+        + [f"## Slide {i + 1}: {s['title']}\n" + "\n".join(f"- {b}" for b in s["bullets"]) for i, s in enumerate(deck["slides"])]
+    )
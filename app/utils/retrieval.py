@@ -0,0 +1,293 @@
+import os
+import re
+import math
+import zlib
+import hashlib
+import importlib
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Note, File, RetrievalChunk
+from app.utils.context_builder import chunk_parts
+from app.utils.folder_content import note_label, file_label
+
+# ===================== Config =====================
+# "hashing" (yerel, çevrimdışı) veya "paket.modul:Sınıf" biçiminde özel embedder
+RETRIEVAL_EMBEDDER = os.getenv("RETRIEVAL_EMBEDDER", "hashing")
+RETRIEVAL_HASH_DIM = int(os.getenv("RETRIEVAL_HASH_DIM") or 1024)
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS") or 350)
+# Soru başına isteme giren parça sayısı; klasör büyüse de istem boyutu sabit kalır
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K") or 6)
+# Bellekte matrisi tutulan en fazla klasör
+RETRIEVAL_CACHE_FOLDERS = int(os.getenv("RETRIEVAL_CACHE_FOLDERS") or 64)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Türkçe ekler için kaba kök: kelimenin ilk harfleri ayrı bir özellik olarak da eklenir
+_PREFIX_LEN = 5
+
+
+# ===================== Embedder =====================
+def _normalize(text: str) -> str:
+    # str.lower() "İ"yi "i̇" yapar; Türkçe büyük harfler önce elle çevrilir
+    return text.replace("İ", "i").replace("I", "ı").lower()
+
+
+def _features(text: str) -> list:
+    words = _TOKEN_RE.findall(_normalize(text))
+    features = list(words)
+    features += [f"#{w[:_PREFIX_LEN]}" for w in words if len(w) > _PREFIX_LEN]
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return features
+
+
+class HashingEmbedder:
+    """
+    Model gerektirmeyen varsayılan embedder: kelime, kelime kökü ve ikili kelime
+    özellikleri sabit boyutlu vektöre hash'lenir (işaretli hashing trick), L2 normlu.
+    """
+
+    def __init__(self, dim: int = RETRIEVAL_HASH_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}-v1"
+
+    def embed(self, texts: list) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in Counter(_features(text)).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                out[row, h % self.dim] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+# Embedder arayüzü: .name (str, vektör uzayını tanımlar) ve .embed(texts) -> (n, dim) float32, L2 normlu
+_EMBEDDERS = {"hashing": HashingEmbedder}
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def register_embedder(name: str, factory):
+    _EMBEDDERS[name] = factory
+
+
+def get_embedder():
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            factory = _EMBEDDERS.get(RETRIEVAL_EMBEDDER)
+            if factory is None:
+                module_name, _, attr = RETRIEVAL_EMBEDDER.partition(":")
+                factory = getattr(importlib.import_module(module_name), attr)
+            _embedder = factory()
+        return _embedder
+
+
+# ===================== Yazma tarafı =====================
+def _source_hash(label: str, text: str, embedder_name: str) -> str:
+    raw = f"{embedder_name}\n{RETRIEVAL_CHUNK_TOKENS}\n{label}\n{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def index_source(db: Session, folder_id: int, source_type: str, source_id: int, label: str, text: str) -> int:
+    """
+    Kaynağın parçalarını yeniden yazar (commit etmez). Metin, etiket, klasör ve
+    embedder aynıysa dokunmaz. Yazılan parça sayısını döner.
+    """
+    embedder = get_embedder()
+    source_hash = _source_hash(label, text, embedder.name)
+    current = (
+        db.query(RetrievalChunk.source_hash, RetrievalChunk.folder_id)
+        .filter(RetrievalChunk.source_type == source_type, RetrievalChunk.source_id == source_id)
+        .first()
+    )
+    if current is not None and current.source_hash == source_hash and current.folder_id == folder_id:
+        return 0
+
+    remove_source_chunks(db, source_type, source_id)
+    # Boş metinde de etiketli tek parça yazılır; kaynak "dizinlenmiş" sayılır, başlıkla bulunabilir
+    chunks = chunk_parts([text], RETRIEVAL_CHUNK_TOKENS) if text.strip() else [""]
+    vectors = embedder.embed([f"{label}\n{chunk}" for chunk in chunks])
+    for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
+        db.add(RetrievalChunk(
+            folder_id=folder_id,
+            source_type=source_type,
+            source_id=source_id,
+            source_hash=source_hash,
+            chunk_index=i,
+            label=label,
+            text=chunk,
+            embedder=embedder.name,
+            vector=vector.astype(np.float16).tobytes(),
+        ))
+    return len(chunks)
+
+
+def remove_source_chunks(db: Session, source_type: str, source_id: int):
+    db.query(RetrievalChunk).filter(
+        RetrievalChunk.source_type == source_type, RetrievalChunk.source_id == source_id
+    ).delete(synchronize_session=False)
+
+
+def drop_folder_chunks(db: Session, folder_ids: list):
+    """Klasör silinirken aynı transaction içinde çağrılır (commit etmez)."""
+    db.query(RetrievalChunk).filter(RetrievalChunk.folder_id.in_(folder_ids)).delete(synchronize_session=False)
+
+
+def _apply(db: Session, what: str, fn, *args):
+    # Dizin hatası not/dosya kaydını bozmamalı; eksik kaynak ilk aramada tamamlanır
+    for attempt in range(2):
+        try:
+            fn(db, *args)
+            db.commit()
+            return
+        except IntegrityError as e:
+            # Aynı kaynağı eşzamanlı başka bir istek yazdı; bir kez daha denenince onunkinin yerine geçer
+            db.rollback()
+            if attempt:
+                print(f"Arama dizini güncellenemedi ({what}): {e}")
+        except Exception as e:
+            db.rollback()
+            print(f"Arama dizini güncellenemedi ({what}): {e}")
+            return
+
+
+def index_note(db: Session, note: Note):
+    """Not oluşturma/düzenleme commit'inden sonra çağrılır."""
+    _apply(db, f"note {note.id}", index_source, note.folder_id, "note", note.id, note_label(note), note.content or "")
+
+
+def index_file(db: Session, f: File):
+    _apply(db, f"file {f.id}", index_source, f.folder_id, "file", f.id, file_label(f), f.extracted_text or "")
+
+
+def remove_source(db: Session, source_type: str, source_id: int):
+    _apply(db, f"{source_type} {source_id}", remove_source_chunks, source_type, source_id)
+
+
+def _reconcile(db: Session, folder_id: int, embedder_name: str):
+    """
+    Yalnızca id'lerle karşılaştırır: dizinde olmayan (eski kayıt, başka yoldan
+    eklenmiş) kaynakları ekler, silinmiş kaynakların ve eski embedder'ın parçalarını atar.
+    Metni okunmayan kaynaklar için maliyet birkaç küçük sorgudur.
+    """
+    note_ids = {nid for (nid,) in db.query(Note.id).filter(Note.folder_id == folder_id).all()}
+    file_ids = {fid for (fid,) in db.query(File.id).filter(File.folder_id == folder_id).all()}
+    current = {("note", i) for i in note_ids} | {("file", i) for i in file_ids}
+
+    indexed, up_to_date = set(), set()
+    for stype, sid, embedder in (
+        db.query(RetrievalChunk.source_type, RetrievalChunk.source_id, RetrievalChunk.embedder)
+        .filter(RetrievalChunk.folder_id == folder_id)
+        .distinct()
+        .all()
+    ):
+        indexed.add((stype, sid))
+        if embedder == embedder_name:
+            up_to_date.add((stype, sid))
+
+    gone = indexed - current
+    # Eski embedder'ın parçaları index_source içinde kaynakla birlikte silinir
+    missing = current - up_to_date
+    if not gone and not missing:
+        return
+
+    for stype, sid in gone:
+        remove_source_chunks(db, stype, sid)
+    missing_notes = [sid for stype, sid in missing if stype == "note"]
+    missing_files = [sid for stype, sid in missing if stype == "file"]
+    if missing_notes:
+        for note in db.query(Note).filter(Note.id.in_(missing_notes)).all():
+            index_source(db, folder_id, "note", note.id, note_label(note), note.content or "")
+    if missing_files:
+        for f in db.query(File).filter(File.id.in_(missing_files)).all():
+            index_source(db, folder_id, "file", f.id, file_label(f), f.extracted_text or "")
+    try:
+        db.commit()
+    except IntegrityError:
+        # Aynı klasörü eşzamanlı başka bir istek eşitledi; onun yazdığı parçalar geçerli
+        db.rollback()
+        return
+    print(f"Arama dizini eşitlendi: klasör {folder_id}, +{len(missing)} / -{len(gone)} kaynak")
+
+
+# ===================== Okuma tarafı =====================
+class _FolderIndex:
+    def __init__(self, stamp, labels, texts, matrix):
+        self.stamp = stamp
+        self.labels = labels
+        self.texts = texts
+        self.matrix = matrix
+        # Klasör içi IDF: her yerde geçen özelliklerin (ve, bir, ...) skoru ezmesini önler
+        df = np.count_nonzero(matrix, axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1.0).astype(np.float32)
+
+
+_indexes: "OrderedDict[tuple, _FolderIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _folder_index(db: Session, folder_id: int, embedder_name: str):
+    # (adet, en büyük id) her ekleme/silmede değişir; diğer worker'ların yazdıkları da görülür
+    stamp = tuple(
+        db.query(func.count(RetrievalChunk.id), func.max(RetrievalChunk.id))
+        .filter(RetrievalChunk.folder_id == folder_id, RetrievalChunk.embedder == embedder_name)
+        .one()
+    )
+    if not stamp[0]:
+        return None
+    key = (folder_id, embedder_name)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and index.stamp == stamp:
+            _indexes.move_to_end(key)
+            return index
+
+    rows = (
+        db.query(RetrievalChunk.label, RetrievalChunk.text, RetrievalChunk.vector)
+        .filter(RetrievalChunk.folder_id == folder_id, RetrievalChunk.embedder == embedder_name)
+        .order_by(RetrievalChunk.id)
+        .all()
+    )
+    matrix = np.vstack([np.frombuffer(vector, dtype=np.float16) for _, _, vector in rows]).astype(np.float32)
+    index = _FolderIndex(stamp, [r.label for r in rows], [r.text for r in rows], matrix)
+    with _indexes_lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > RETRIEVAL_CACHE_FOLDERS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def retrieve(db: Session, folder_id: int, query: str, k: int = RETRIEVAL_TOP_K) -> list:
+    """
+    Soruyla en ilgili k parçayı etiketleriyle döner; parçalar klasördeki
+    sıralarına göre dizilir. Aynı metin (dosya + ondan üretilen not) bir kez girer.
+    """
+    embedder = get_embedder()
+    _reconcile(db, folder_id, embedder.name)
+    index = _folder_index(db, folder_id, embedder.name)
+    if index is None:
+        return []
+
+    scores = index.matrix @ (embedder.embed([query])[0] * index.idf)
+    n = len(scores)
+    # Tekrarlar elenebilsin diye k'dan fazla aday alınır
+    candidates = min(n, k * 3)
+    top = np.argpartition(-scores, candidates - 1)[:candidates] if candidates < n else np.arange(n)
+    picked, seen = [], set()
+    for i in sorted(top, key=lambda i: -scores[i]):
+        body = index.texts[i].strip()
+        if body in seen:
+            continue
+        seen.add(body)
+        picked.append(int(i))
+        if len(picked) >= k:
+            break
+    return [f"{index.labels[i]}\n{index.texts[i]}".rstrip() for i in sorted(picked)]
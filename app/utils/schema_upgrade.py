@@ -0,0 +1,93 @@
+from sqlalchemy import inspect, text
+
+# create_all yalnızca eksik tabloları kurar, var olan tablolara sonradan eklenen
+# kolonları eklemez. Modele eklenen her kolon buraya da yazılır ve açılışta eksikse eklenir.
+# (tablo, kolon, SQL tipi, kolon eklendiği anda bir kez çalışacak SQL veya None)
+ADDED_COLUMNS = [
+    ("files", "extractor_version", "INTEGER", None),
+    ("files", "extracted_at", "TIMESTAMP", None),
+    ("ingest_jobs", "claimed_by", "VARCHAR", None),
+    # FK kısıtı sonradan eklenmez (doğrulaması tabloyu kilit altında tarar); paylaşım ref_count ile korunur
+    ("files", "blob_sha256", "VARCHAR(64)", None),
+    ("ingest_jobs", "sha256", "VARCHAR(64)", None),
+    ("ingest_jobs", "mime", "VARCHAR", None),
+    # Codec'ten önceki kayıtlar: sıkıştırılan her şey .zip'lenirdi, gerisi (görsel) olduğu gibi
+    ("files", "storage_codec", "VARCHAR",
+     "UPDATE files SET storage_codec = CASE WHEN filepath LIKE '%.zip' THEN 'deflate' ELSE 'store' END "
+     "WHERE storage_codec IS NULL"),
+    ("stored_blobs", "storage_codec", "VARCHAR",
+     "UPDATE stored_blobs SET storage_codec = CASE WHEN stored_path LIKE '%.zip' THEN 'deflate' ELSE 'store' END "
+     "WHERE storage_codec IS NULL AND stored_path IS NOT NULL"),
+]
+
+# Sonradan eklenen indeksler: (indeks adı, tablo, kolonlar, unique, kurulumdan önce çalışacak SQL veya None)
+ADDED_INDEXES = [
+    ("ix_files_blob_sha256", "files", ("blob_sha256",), False, None),
+    # Kısıttan önce eşzamanlı dizinlemeyle oluşmuş kopya parçalar atılır (her konumdan en eskisi kalır)
+    ("uq_retrieval_chunk_source", "retrieval_chunks", ("source_type", "source_id", "chunk_index"), True,
+     "DELETE FROM retrieval_chunks WHERE id NOT IN ("
+     "SELECT MIN(id) FROM retrieval_chunks GROUP BY source_type, source_id, chunk_index)"),
+]
+
+
+def _add_column(engine, table: str, column: str, ddl_type: str, backfill: str):
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # Uzun süren bir transaction varken kilit kuyruğunda bekleyip tüm yazmaları durdurmasın
+            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        # Nullable ve varsayılansız: Postgres'te yalnızca katalog değişir, tablo yeniden yazılmaz
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    if backfill:
+        # Ayrı transaction: ALTER'in tablo kilidi güncelleme boyunca tutulmasın
+        with engine.begin() as conn:
+            conn.execute(text(backfill))
+
+
+def _add_index(engine, name: str, table: str, columns: tuple, unique: bool, prepare: str):
+    postgres = engine.dialect.name == "postgresql"
+    if prepare:
+        with engine.begin() as conn:
+            conn.execute(text(prepare))
+    ddl = (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if postgres else ''}"
+        f"IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    )
+    # CONCURRENTLY transaction içinde çalışmaz; tablo indeks kurulurken yazılabilir kalır
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(ddl))
+
+
+def ensure_schema(engine):
+    """
+    Açılışta create_all'dan sonra çağrılır; idempotent. Eksik kolonları ve indeksleri ekler.
+    Birden çok worker aynı anda denerse biri ekler, diğerlerinin hatası yalnızca loglanır.
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    columns = {}
+    for table, column, ddl_type, backfill in ADDED_COLUMNS:
+        if table not in tables:
+            continue  # tablo bu açılışta create_all ile tam haliyle kuruldu
+        if table not in columns:
+            columns[table] = {c["name"] for c in inspector.get_columns(table)}
+        if column in columns[table]:
+            continue
+        try:
+            _add_column(engine, table, column, ddl_type, backfill)
+            print(f"Şema güncellendi: {table}.{column} eklendi")
+        except Exception as e:
+            print(f"Şema güncellenemedi ({table}.{column}): {e}")
+
+    for name, table, index_columns, unique, prepare in ADDED_INDEXES:
+        if table not in tables:
+            continue
+        # create_all unique kısıtı kurduysa (SQLite'ta otomatik indeks adıyla) kısıt adıyla görünür
+        existing = {i["name"] for i in inspector.get_indexes(table)}
+        existing |= {c["name"] for c in inspector.get_unique_constraints(table)}
+        if name in existing:
+            continue
+        try:
+            _add_index(engine, name, table, index_columns, unique, prepare)
+            print(f"Şema güncellendi: {name} indeksi kuruldu")
+        except Exception as e:
+            print(f"İndeks kurulamadı ({name}): {e}")
@@ -0,0 +1,370 @@
+import os
+import re
+import html
+
+from sqlalchemy import text, bindparam, or_
+from sqlalchemy.orm import Session
+
+from app.models import Note, File, Folder
+
+# ===================== Config =====================
+# Postgres metin arama yapılandırması (turkish, english, simple...). Tetikleyici ve doldurma bununla
+# kurulur; değiştirmek için notes/files.search_vector kolonları düşürülüp migration yeniden çalıştırılmalı
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "turkish")
+# Çok uzun dökümlerde tsvector sınırına (1MB) takılmamak için dizinlenen en fazla karakter
+SEARCH_MAX_INDEXED_CHARS = int(os.getenv("SEARCH_MAX_INDEXED_CHARS") or 200000)
+SEARCH_MAX_LIMIT = 50
+# Derin sayfalama her sayfada öncekileri de sıralatır; ötesi için sorgu daraltılmalı
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET") or 1000)
+
+# Vurgu işaretleri SQL'de özel karakterlerle üretilir; metin HTML-escape edildikten sonra <mark>'a çevrilir
+_HL_START = "\ue000"
+_HL_STOP = "\ue001"
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_backend = None  # postgres | fts5 | like
+
+# Postgres: tsvector kolonu tetikleyiciyle güncel tutulur. Kolon, tetikleyici, toplu doldurma ve
+# GIN indeksi açılışta değil, migrations/search_index.py ile bir kez kurulur (tablo yeniden yazılmaz,
+# indeks CONCURRENTLY kurulur; yazmalar hiç durmaz). Kurulum bitene kadar arama LIKE ile çalışır.
+_PG_TABLES = {
+    "notes": ("title", "content"),
+    "files": ("filename", "extracted_text"),
+}
+
+
+def _pg_vector_expr(title_col: str, body_col: str, row: str = "") -> str:
+    return (
+        f"setweight(to_tsvector('{SEARCH_TS_CONFIG}'::regconfig, coalesce({row}{title_col}, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_TS_CONFIG}'::regconfig, "
+        f"left(coalesce({row}{body_col}, ''), {SEARCH_MAX_INDEXED_CHARS})), 'B')"
+    )
+
+
+# External content FTS5: metin notes/files'ta kalır, dizin tetikleyicilerle eşitlenir
+_SQLITE_FTS = {
+    "notes_fts": ("notes", ("title", "content")),
+    "files_fts": ("files", ("filename", "extracted_text")),
+}
+
+
+def _sqlite_ddl(fts: str, table: str, columns: tuple) -> list:
+    cols = ", ".join(columns)
+    new_vals = ", ".join(f"new.{c}" for c in columns)
+    old_vals = ", ".join(f"old.{c}" for c in columns)
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals});"
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 1')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_folder_id ON {table} (folder_id)",
+    ]
+
+
+def _setup_sqlite(conn):
+    for fts, (table, columns) in _SQLITE_FTS.items():
+        existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": fts}).first()
+        for ddl in _sqlite_ddl(fts, table, columns):
+            conn.execute(text(ddl))
+        if not existed:
+            # Tablo yeni açıldıysa mevcut kayıtlar bir kez dizinlenir
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def ensure_search_index(engine):
+    """
+    Açılışta create_all'dan sonra çağrılır; idempotent. SQLite'ta FTS5 + tetikleyicileri
+    kurar (yerel geliştirme). Postgres'te DDL çalıştırmaz, yalnızca migrations/search_index.py
+    ile kurulmuş dizinin hazır olup olmadığına bakar; değilse arama LIKE ile çalışır.
+    """
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        if dialect == "postgresql":
+            _backend = "postgres" if _postgres_index_ready(engine) else "like"
+            if _backend == "like":
+                print("Postgres arama dizini hazır değil; 'python migrations/search_index.py' çalıştırılana kadar LIKE kullanılacak")
+        elif dialect == "sqlite":
+            with engine.begin() as conn:
+                _setup_sqlite(conn)
+            _backend = "fts5"
+        else:
+            _backend = "like"
+    except Exception as e:
+        # Birden çok worker aynı anda kurmaya çalıştıysa biri kazanır; diğeri mevcut dizini kullanır
+        _backend = _detect_existing(engine, dialect)
+        print(f"Arama dizini kurulamadı, '{_backend}' kullanılacak: {e}")
+    return _backend
+
+
+def _postgres_index_ready(engine) -> bool:
+    # Geçerli (CONCURRENTLY kurulumu yarıda kalmamış) GIN indeksleri varsa kolon da doldurulmuştur
+    with engine.connect() as conn:
+        ready = conn.execute(text("""
+            SELECT count(*) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname IN ('ix_notes_search_vector', 'ix_files_search_vector') AND i.indisvalid
+        """)).scalar()
+    return ready == len(_PG_TABLES)
+
+
+def _detect_existing(engine, dialect: str) -> str:
+    try:
+        if dialect == "postgresql":
+            return "postgres" if _postgres_index_ready(engine) else "like"
+        if dialect == "sqlite":
+            with engine.connect() as conn:
+                found = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'")).first()
+            return "fts5" if found else "like"
+    except Exception as e:
+        print(f"Arama dizini kontrol edilemedi: {e}")
+    return "like"
+
+
+# ===================== Postgres migration =====================
+def _pg_prepare_table(engine, table: str, title_col: str, body_col: str):
+    """Kolonu ve tetikleyiciyi kurar."""
+    with engine.begin() as conn:
+        # Kısa kilit: nullable, varsayılansız kolon yalnızca kataloğu değiştirir
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                NEW.search_vector := {_pg_vector_expr(title_col, body_col, "NEW.")};
+                RETURN NEW;
+            END $$
+        """))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_search_vector_trg ON {table}"))
+        conn.execute(text(f"""
+            CREATE TRIGGER {table}_search_vector_trg BEFORE INSERT OR UPDATE OF {title_col}, {body_col}
+            ON {table} FOR EACH ROW EXECUTE PROCEDURE {table}_search_vector_update()
+        """))
+
+
+def _pg_backfill(engine, table: str, title_col: str, body_col: str, batch_size: int) -> int:
+    # id aralıklarıyla kısa transaction'lar: satır kilitleri batch başına, tablo kilidi yok
+    with engine.connect() as conn:
+        max_id = conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+    done, last = 0, 0
+    while last < max_id:
+        with engine.begin() as conn:
+            done += conn.execute(text(f"""
+                UPDATE {table} SET search_vector = {_pg_vector_expr(title_col, body_col)}
+                WHERE id > :after AND id <= :upto AND search_vector IS NULL
+            """), {"after": last, "upto": last + batch_size}).rowcount
+        last += batch_size
+        print(f"{table}: {min(last, max_id)}/{max_id} id tarandı, {done} satır dolduruldu")
+    return done
+
+
+def _pg_create_index(engine, name: str, ddl: str):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :n AND NOT i.indisvalid"
+        ), {"n": name}).first()
+        if invalid:
+            # Yarıda kalmış CONCURRENTLY kurulumu: IF NOT EXISTS onu "var" sayardı
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(ddl))
+
+
+def migrate_search_index(engine, batch_size: int = 5000):
+    """
+    Postgres arama dizinini yazmaları durdurmadan kurar; tekrar çalıştırılabilir.
+    Sıra: kolon + tetikleyici (yeni yazılar hemen dizinlenir), eski satırların toplu
+    doldurulması, ardından transaction dışında CREATE INDEX CONCURRENTLY.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Bu migration yalnızca Postgres içindir; SQLite dizini açılışta kurulur.")
+    if not re.fullmatch(r"\w+", SEARCH_TS_CONFIG):
+        raise ValueError(f"Geçersiz SEARCH_TS_CONFIG: {SEARCH_TS_CONFIG}")
+    for table, (title_col, body_col) in _PG_TABLES.items():
+        _pg_prepare_table(engine, table, title_col, body_col)
+        _pg_backfill(engine, table, title_col, body_col, batch_size)
+        _pg_create_index(engine, f"ix_{table}_search_vector",
+                         f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)")
+        _pg_create_index(engine, f"ix_{table}_folder_id",
+                         f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_folder_id ON {table} (folder_id)")
+        print(f"{table}: arama dizini hazır")
+
+
+def search_backend() -> str:
+    return _backend or "like"
+
+
+# ===================== Sorgu =====================
+def _scope_sql(scope: dict, folder_id) -> tuple:
+    clauses, params = [], {}
+    if "user_id" in scope:
+        clauses.append("f.user_id = :scope_user_id")
+        params["scope_user_id"] = scope["user_id"]
+    if "demo_session_id" in scope:
+        clauses.append("f.demo_session_id = :scope_demo_session_id")
+        params["scope_demo_session_id"] = scope["demo_session_id"]
+    if folder_id is not None:
+        clauses.append("f.id = :scope_folder_id")
+        params["scope_folder_id"] = folder_id
+    return "".join(f" AND {c}" for c in clauses), params
+
+
+def _fts5_query(q: str) -> str:
+    # Kullanıcı girdisi FTS5 sözdizimine hiç girmez: her kelime tırnaklanır, sonuncusu önek araması
+    words = _WORD_RE.findall(q)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+_PG_QUERIES = {
+    "note": ("notes", "n.title", "n.content"),
+    "file": ("files", "n.filename", "n.extracted_text"),
+}
+
+
+def _search_postgres(db: Session, kind: str, q: str, where: str, params: dict, fetch: int) -> list:
+    table, title_col, body_col = _PG_QUERIES[kind]
+    rows = db.execute(text(f"""
+        SELECT n.id, n.folder_id, {title_col} AS title, ts_rank_cd(n.search_vector, tsq) AS score
+        FROM {table} n
+        JOIN folders f ON f.id = n.folder_id,
+             websearch_to_tsquery(CAST(:cfg AS regconfig), :q) tsq
+        WHERE n.search_vector @@ tsq{where}
+        ORDER BY score DESC, n.id DESC
+        LIMIT :fetch
+    """), {"cfg": SEARCH_TS_CONFIG, "q": q, "fetch": fetch, **params}).all()
+    return [{"type": kind, "id": r.id, "folder_id": r.folder_id, "title": r.title, "score": float(r.score)} for r in rows]
+
+
+def _headlines_postgres(db: Session, kind: str, q: str, ids: list) -> dict:
+    # ts_headline pahalı; yalnızca dönen sayfadaki kayıtlar için
+    if not ids:
+        return {}
+    table, _, body_col = _PG_QUERIES[kind]
+    options = f"StartSel={_HL_START}, StopSel={_HL_STOP}, MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter=\" … \""
+    stmt = text(f"""
+        SELECT n.id, ts_headline(CAST(:cfg AS regconfig), left(coalesce({body_col}, ''), :max_chars),
+                                 websearch_to_tsquery(CAST(:cfg AS regconfig), :q), :options) AS snippet
+        FROM {table} n WHERE n.id IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    rows = db.execute(stmt, {
+        "cfg": SEARCH_TS_CONFIG, "q": q, "options": options, "ids": ids, "max_chars": SEARCH_MAX_INDEXED_CHARS,
+    }).all()
+    return {r.id: r.snippet for r in rows}
+
+
+_FTS5_QUERIES = {
+    "note": ("notes_fts", "notes", "n.title"),
+    "file": ("files_fts", "files", "n.filename"),
+}
+
+
+def _search_fts5(db: Session, kind: str, q: str, where: str, params: dict, fetch: int) -> list:
+    fts, table, title_col = _FTS5_QUERIES[kind]
+    match = _fts5_query(q)
+    if not match:
+        return []
+    # bm25 küçük = daha iyi; başlık eşleşmesi gövdeden 5 kat ağır
+    rows = db.execute(text(f"""
+        SELECT n.id, n.folder_id, {title_col} AS title, -bm25({fts}, 5.0, 1.0) AS score,
+               snippet({fts}, 1, :hl_start, :hl_stop, ' … ', 24) AS snippet
+        FROM {fts}
+        JOIN {table} n ON n.id = {fts}.rowid
+        JOIN folders f ON f.id = n.folder_id
+        WHERE {fts} MATCH :match{where}
+        ORDER BY score DESC, n.id DESC
+        LIMIT :fetch
+    """), {"match": match, "hl_start": _HL_START, "hl_stop": _HL_STOP, "fetch": fetch, **params}).all()
+    return [
+        {"type": kind, "id": r.id, "folder_id": r.folder_id, "title": r.title, "score": float(r.score), "snippet": r.snippet}
+        for r in rows
+    ]
+
+
+def _like_snippet(body: str, words: list, width: int = 160) -> str:
+    lowered = body.lower()
+    positions = [p for p in (lowered.find(w.lower()) for w in words) if p >= 0]
+    start = max(0, min(positions) - width // 3) if positions else 0
+    snippet = body[start:start + width]
+    for w in words:
+        snippet = re.sub(re.escape(w), lambda m: f"{_HL_START}{m.group(0)}{_HL_STOP}", snippet, flags=re.IGNORECASE)
+    return ("… " if start else "") + snippet
+
+
+def _search_like(db: Session, kind: str, q: str, scope: dict, folder_id, fetch: int) -> list:
+    # Yedek yol: dizin yok, sıralama yok; yalnızca küçük kurulumlar için
+    model, title_col, body_col = (Note, Note.title, Note.content) if kind == "note" else (File, File.filename, File.extracted_text)
+    words = _WORD_RE.findall(q)
+    if not words:
+        return []
+    query = db.query(model).join(Folder, Folder.id == model.folder_id)
+    if "user_id" in scope:
+        query = query.filter(Folder.user_id == scope["user_id"])
+    if "demo_session_id" in scope:
+        query = query.filter(Folder.demo_session_id == scope["demo_session_id"])
+    if folder_id is not None:
+        query = query.filter(Folder.id == folder_id)
+    for w in words:
+        pattern = f"%{w}%"
+        query = query.filter(or_(title_col.ilike(pattern), body_col.ilike(pattern)))
+    results = []
+    for item in query.order_by(model.id.desc()).limit(fetch).all():
+        body = (item.content if kind == "note" else item.extracted_text) or ""
+        title = item.title if kind == "note" else item.filename
+        results.append({
+            "type": kind, "id": item.id, "folder_id": item.folder_id, "title": title,
+            "score": 0.0, "snippet": _like_snippet(body, words),
+        })
+    return results
+
+
+def _render_snippet(snippet: str) -> str:
+    return html.escape(snippet or "").replace(_HL_START, "<mark>").replace(_HL_STOP, "</mark>")
+
+
+def search_contents(db: Session, q: str, scope: dict, folder_id: int = None, kinds=("note", "file"),
+                    limit: int = 20, offset: int = 0) -> dict:
+    """
+    Not ve dosya metinlerinde sıralı arama. scope: {"user_id": ...} veya
+    {"demo_session_id": ...}; boşsa (admin) tüm kayıtlar. Toplam sayım yapılmaz
+    (milyonlarca eşleşmede pahalı); bir sonraki sayfa "has_more" ile bildirilir.
+    """
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, min(offset, SEARCH_MAX_OFFSET))
+    # Her türden offset+limit+1 aday alınır, skorla birleştirilip sayfa kesilir
+    fetch = offset + limit + 1
+    backend = search_backend()
+    where, params = _scope_sql(scope, folder_id)
+
+    results = []
+    for kind in kinds:
+        if backend == "postgres":
+            results += _search_postgres(db, kind, q, where, params, fetch)
+        elif backend == "fts5":
+            results += _search_fts5(db, kind, q, where, params, fetch)
+        else:
+            results += _search_like(db, kind, q, scope, folder_id, fetch)
+
+    results.sort(key=lambda r: (-r["score"], -r["id"]))
+    page = results[offset:offset + limit]
+
+    if backend == "postgres":
+        for kind in kinds:
+            snippets = _headlines_postgres(db, kind, q, [r["id"] for r in page if r["type"] == kind])
+            for r in page:
+                if r["type"] == kind:
+                    r["snippet"] = snippets.get(r["id"], "")
+    for r in page:
+        r["snippet"] = _render_snippet(r.get("snippet"))
+
+    return {
+        "results": page,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(results) > offset + limit,
+        "backend": backend,
+    }
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Aynı anahtarla eşzamanlı gelen çağrılar tek bir üst akış çağrısını paylaşır:
+    ilk gelen (lider) çağrıyı yapar, diğerleri onun sonucunu (veya hatasını) alır.
+    Paylaşılan sonuç concurrent.futures.Future'dır; thread'lerdeki senkron
+    çağıranlar .result() ile, async handler'lar asyncio.wrap_future ile bekler.
+    Sonuç saklanmaz; çağrı bitince anahtar serbest kalır (kalıcılık LLM önbelleğinde).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = set()
+        self._stats = {"leaders": 0, "coalesce_hits": 0}
+
+    def _join(self, key: str):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["coalesce_hits"] += 1
+                return future, False
+            future = Future()
+            # RUNNING durumundaki Future iptal edilemez; bekleyenlerden birinin
+            # kopması (wrap_future iptali) diğerlerinin sonucunu bozmasın
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            self._stats["leaders"] += 1
+            return future, True
+
+    def _release(self, key: str, future: Future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key: str, fn, *args, **kwargs):
+        """Senkron çağıranlar için (thread havuzu, map-reduce)."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._release(key, future)
+            future.set_exception(e)
+            raise
+        self._release(key, future)
+        future.set_result(result)
+        return result
+
+    async def ado(self, key: str, coro_fn, *args, **kwargs):
+        """
+        Async çağıranlar için. Liderin çağrısı ayrı bir task'ta çalışır; liderin
+        istemcisi bağlantıyı kapatsa da bekleyen diğer istekler sonucu alır.
+        """
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self._tasks.add(task)
+
+            def _done(t):
+                self._tasks.discard(t)
+                self._release(key, future)
+                if t.cancelled():
+                    future.set_exception(RuntimeError("Paylaşılan çağrı iptal edildi."))
+                elif t.exception() is not None:
+                    future.set_exception(t.exception())
+                else:
+                    future.set_result(t.result())
+
+            task.add_done_callback(_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+# LLM tamamlama ve sunum destesi çağrıları; anahtarlar flight_key ile LLM önbellek anahtarlarından türer
+llm_flight = SingleFlight()
+
+
+def flight_key(cache_key: str, use_cache: bool = True) -> str:
+    """
+    Önbelleği atlayan (no_cache) çağrılar yalnızca birbirleriyle birleşir: önbellekli bir
+    liderin (belki önbellekten gelen) sonucunu almazlar, onların taze sonucu da önbellekli
+    çağıranlara dağıtılmaz.
+    """
+    return cache_key if use_cache else f"{cache_key}:bypass"
+
+
+def single_flight_stats() -> dict:
+    return llm_flight.stats()
@@ -0,0 +1,83 @@
+import os
+import glob
+from uuid import uuid4
+
+from PIL import Image, ImageOps
+
+from app.utils.compression import unpacked_copy, _flatten_to_rgb
+from app.utils.tool_runner import run_tool_sync
+
+# ===================== Config =====================
+# Statik /uploaded_files mount'unun dışında; önizlemeler yalnızca yetkili /files/{id}/thumbnail'dan
+STORAGE_DIR = os.getenv("STORAGE_DIR") or "storage"
+THUMB_DIR = os.path.join(STORAGE_DIR, "thumbs")
+# İstemcinin isteyebileceği kenar uzunlukları (px); her biri ayrı dosya olarak saklanır
+THUMBNAIL_SIZES = [int(s) for s in (os.getenv("THUMBNAIL_SIZES") or "128,256,512").split(",") if s.strip()]
+THUMBNAIL_DEFAULT_SIZE = int(os.getenv("THUMBNAIL_DEFAULT_SIZE") or 256)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY") or 75)
+# Yükleme pipeline'ında varsayılan boyutu hemen üret (0: yalnız ilk istekte)
+THUMBNAIL_EAGER = os.getenv("THUMBNAIL_EAGER", "1") == "1"
+
+os.makedirs(THUMB_DIR, exist_ok=True)
+
+
+def thumbnail_supported(mime: str) -> bool:
+    return bool(mime) and ("image" in mime or mime == "application/pdf")
+
+
+def thumbnail_path(key: str, size: int) -> str:
+    """storage/thumbs/ab/<key>_<size>.jpg — key içerik hash'i olduğundan dosya hiç değişmez."""
+    return os.path.join(THUMB_DIR, key[:2], f"{key}_{size}.jpg")
+
+
+def _image_thumbnail(src_path: str, out_path: str, size: int):
+    with Image.open(src_path) as img:
+        # JPEG'de tam çözünürlüklü bitmap hiç açılmaz, DCT ölçeklemesiyle küçük okunur
+        img.draft("RGB", (size, size))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size))
+        # Saydam PNG/WebP alanları siyah değil beyaz olsun (compress_image ile aynı)
+        img = _flatten_to_rgb(img)
+        img.save(out_path, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+
+
+def _pdf_thumbnail(src_path: str, out_path: str, size: int):
+    # Yalnız ilk sayfa, doğrudan hedef boyuta rasterlanır
+    out_prefix = out_path[:-len(".jpg")]
+    run_tool_sync(["pdftoppm", "-f", "1", "-l", "1", "-singlefile", "-jpeg",
+                   "-scale-to", str(size), src_path, out_prefix])
+
+
+def ensure_thumbnail(key: str, source_path: str, mime: str, size: int = THUMBNAIL_DEFAULT_SIZE, codec: str = None):
+    """
+    Küçük önizlemeyi diskte yoksa üretir ve yolunu döner; desteklenmeyen türde None.
+    source_path depolanmış artefakt (codec ile) veya ham dosya olabilir.
+    """
+    if not thumbnail_supported(mime):
+        return None
+    out_path = thumbnail_path(key, size)
+    if os.path.exists(out_path):
+        return out_path
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # Aynı önizlemeyi eşzamanlı üreten iki istek birbirinin yarım dosyasını görmesin
+    tmp_path = f"{out_path[:-len('.jpg')]}.{uuid4().hex}.part.jpg"
+    try:
+        with unpacked_copy(source_path, codec) as path:
+            if mime == "application/pdf":
+                _pdf_thumbnail(path, tmp_path, size)
+            else:
+                _image_thumbnail(path, tmp_path, size)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return out_path
+
+
+def remove_thumbnails(key: str):
+    for path in glob.glob(os.path.join(THUMB_DIR, key[:2], f"{key}_*.jpg")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Önizleme silinirken hata: {e}")
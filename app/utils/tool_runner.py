@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+import threading
+from typing import NamedTuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("neurodraft.tools")
+
+# ===================== Config =====================
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY") or 2)
+TOOL_TIMEOUT_SEC = float(os.getenv("TOOL_TIMEOUT_SEC") or 120)
+TOOL_CPU_LIMIT_SEC = int(os.getenv("TOOL_CPU_LIMIT_SEC") or 300)
+STDERR_LOG_BYTES = 4000
+
+
+class ToolResult(NamedTuple):
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+    elapsed: float
+
+
+class ToolError(Exception):
+    def __init__(self, tool: str, returncode: int, stderr: bytes):
+        super().__init__(f"{tool} exited with {returncode}")
+        self.tool = tool
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class ToolTimeout(Exception):
+    def __init__(self, tool: str, timeout: float):
+        super().__init__(f"{tool} timed out after {timeout:g}s")
+        self.tool = tool
+        self.timeout = timeout
+
+
+# Tüm harici araçlar tek bir arka plan event loop'unda çalışır;
+# böylece semafor hem thread'lerden hem async handler'lardan gelen çağrılar için ortaktır.
+_loop = None
+_loop_lock = threading.Lock()
+_semaphore = None
+_stats = {"started": 0, "succeeded": 0, "failed": 0, "timeouts": 0, "running": 0, "waiting": 0}
+
+
+def _get_loop():
+    global _loop, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="tool-runner", daemon=True).start()
+            _semaphore = asyncio.Semaphore(TOOL_MAX_CONCURRENCY)
+            _loop = loop
+        return _loop
+
+
+def _log(level, event: str, **fields):
+    logger.log(level, json.dumps({"event": event, **fields}, ensure_ascii=False, default=str))
+
+
+def _kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _run(args, timeout: float, cpu_seconds: int) -> ToolResult:
+    tool = os.path.basename(args[0])
+    _stats["waiting"] += 1
+    async with _semaphore:
+        _stats["waiting"] -= 1
+        _stats["running"] += 1
+        _stats["started"] += 1
+        started = time.monotonic()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,  # zaman aşımında alt process'leriyle birlikte öldürebilmek için
+            )
+        except BaseException:
+            _stats["running"] -= 1
+            _stats["failed"] += 1
+            raise
+        if resource is not None and hasattr(resource, "prlimit") and cpu_seconds:
+            try:
+                resource.prlimit(proc.pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+            except (ProcessLookupError, OSError):
+                pass
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            _kill_group(proc)
+            await proc.wait()
+            _stats["timeouts"] += 1
+            _log(logging.WARNING, "tool_timeout", tool=tool, args=args[1:], timeout=timeout,
+                 elapsed=round(time.monotonic() - started, 3))
+            raise ToolTimeout(tool, timeout)
+        except BaseException:
+            _kill_group(proc)
+            raise
+        finally:
+            _stats["running"] -= 1
+
+    elapsed = time.monotonic() - started
+    stderr_text = stderr[-STDERR_LOG_BYTES:].decode("utf-8", errors="replace")
+    if proc.returncode != 0:
+        _stats["failed"] += 1
+        _log(logging.ERROR, "tool_failed", tool=tool, args=args[1:], returncode=proc.returncode,
+             elapsed=round(elapsed, 3), stderr=stderr_text)
+        raise ToolError(tool, proc.returncode, stderr)
+    _stats["succeeded"] += 1
+    _log(logging.INFO, "tool_finished", tool=tool, elapsed=round(elapsed, 3), stderr=stderr_text or None)
+    return ToolResult(proc.returncode, stdout, stderr, elapsed)
+
+
+async def run_tool(args, timeout: float = TOOL_TIMEOUT_SEC, cpu_seconds: int = TOOL_CPU_LIMIT_SEC) -> ToolResult:
+    """Async handler'lar için: aracı ortak havuzda çalıştırır, event loop'u bloklamaz."""
+    future = asyncio.run_coroutine_threadsafe(_run(list(args), timeout, cpu_seconds), _get_loop())
+    return await asyncio.wrap_future(future)
+
+
+def run_tool_sync(args, timeout: float = TOOL_TIMEOUT_SEC, cpu_seconds: int = TOOL_CPU_LIMIT_SEC) -> ToolResult:
+    """Thread'lerden (io havuzu, ingest worker) çağrılır; sonuç gelene kadar bekler."""
+    future = asyncio.run_coroutine_threadsafe(_run(list(args), timeout, cpu_seconds), _get_loop())
+    return future.result()
+
+
+def tool_stats() -> dict:
+    return {"max_concurrency": TOOL_MAX_CONCURRENCY, **_stats}
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from uuid import uuid4
+
+from app.utils.executors import io_pool
+
+# ===================== Config =====================
+# Statik /uploaded_files mount'unun dışında; sesler yalnızca /ai/note_audio uçlarından okunur
+STORAGE_DIR = os.getenv("STORAGE_DIR") or "storage"
+TTS_CACHE_DIR = os.path.join(STORAGE_DIR, "tts")
+# Toplam boyut bunu aşınca en uzun süredir çalınmayan sesler silinir
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB") or 512) * 1024 * 1024
+# Akan parçalar bu boyuta ulaşınca io havuzunda tek seferde diske yazılır
+TTS_WRITE_BUFFER_BYTES = 64 * 1024
+
+os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+
+_evict_lock = threading.Lock()
+_size_lock = threading.Lock()
+# Önbelleğin toplam boyutu; ilk taramaya kadar bilinmez (None), sonra her kayıtta güncellenir
+_cached_bytes = None
+_stats = {"hits": 0, "misses": 0, "stored": 0, "aborted": 0, "evicted": 0, "evicted_bytes": 0, "scans": 0}
+
+
+def tts_key(text: str, voice: str, model: str) -> str:
+    raw = json.dumps({"text": text, "voice": voice, "model": model}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def tts_path(key: str) -> str:
+    """storage/tts/ab/<key>.mp3 — anahtar içerikten türediği için dosya hiç değişmez."""
+    return os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.mp3")
+
+
+def cached_tts(key: str):
+    """Önbellekteki sesin yolunu döner (yoksa None); LRU için erişim zamanını günceller."""
+    path = tts_path(key)
+    try:
+        st = os.stat(path)
+        # mtime (Last-Modified) korunur, yalnızca atime ileri alınır; noatime bağlamalarda da çalışır
+        os.utime(path, (time.time(), st.st_mtime))
+    except OSError:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return path
+
+
+def _open_part(path: str, tmp_path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(tmp_path, "wb")
+
+
+def _finish_part(f, tmp_path: str, path: str) -> int:
+    f.close()
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+    return size
+
+
+def _discard_part(f, tmp_path: str):
+    if f is not None and not f.closed:
+        f.close()
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def _add_cached_bytes(size: int) -> bool:
+    """Toplamı günceller; tarama gerekiyorsa (toplam bilinmiyor ya da sınırı aştı) True."""
+    global _cached_bytes
+    with _size_lock:
+        if _cached_bytes is None:
+            return True
+        _cached_bytes += size
+        return _cached_bytes > TTS_CACHE_MAX_BYTES
+
+
+async def tee_to_cache(key: str, chunks):
+    """
+    Ses parçalarını istemciye aktarırken aynı anda geçici dosyaya yazar. Akış
+    tamamlanırsa dosya atomik olarak yerine konur; istemci koparsa veya upstream
+    hata verirse yarım dosya silinir (önbelleğe asla yarım ses girmez).
+    Disk işleri io havuzunda yapılır; event loop yavaş bir diskte beklemez.
+    """
+    path = tts_path(key)
+    tmp_path = f"{path}.{uuid4().hex}.part"
+    f = None
+    completed = False
+    size = 0
+    try:
+        f = await io_pool.run(_open_part, path, tmp_path)
+        buffer = bytearray()
+        async for chunk in chunks:
+            buffer += chunk
+            if len(buffer) >= TTS_WRITE_BUFFER_BYTES:
+                await io_pool.run(f.write, bytes(buffer))
+                buffer.clear()
+            yield chunk
+        if buffer:
+            await io_pool.run(f.write, bytes(buffer))
+        size = await io_pool.run(_finish_part, f, tmp_path, path)
+        completed = True
+        _stats["stored"] += 1
+    finally:
+        if not completed:
+            _stats["aborted"] += 1
+            await io_pool.run(_discard_part, f, tmp_path)
+            # Üretici hemen kapatılsın (upstream TTS isteği iptal); GC'yi beklemeden
+            await chunks.aclose()
+    # Tam tarama yalnızca sınır aşıldığında; her kayıtta dizini dolaşmaz
+    if _add_cached_bytes(size):
+        await io_pool.run(evict_tts_cache)
+
+
+def evict_tts_cache(max_bytes: int = TTS_CACHE_MAX_BYTES) -> int:
+    """
+    Dizini tarar, toplam boyut sınırın altına inene kadar en eski atime'lı dosyaları
+    siler ve bulunan toplamı sonraki kayıtların karşılaştırması için saklar.
+    """
+    global _cached_bytes
+    if not _evict_lock.acquire(blocking=False):
+        return 0  # başka bir istek zaten temizliyor
+    try:
+        _stats["scans"] += 1
+        entries, total = [], 0
+        for root, _, names in os.walk(TTS_CACHE_DIR):
+            for name in names:
+                if not name.endswith(".mp3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"TTS önbelleği silinirken hata: {e}")
+                continue
+            total -= size
+            removed += 1
+            _stats["evicted"] += 1
+            _stats["evicted_bytes"] += size
+        with _size_lock:
+            _cached_bytes = total
+        return removed
+    finally:
+        _evict_lock.release()
+
+
+def tts_cache_stats() -> dict:
+    return {"max_bytes": TTS_CACHE_MAX_BYTES, "cached_bytes": _cached_bytes, **_stats}
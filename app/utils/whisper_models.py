@@ -0,0 +1,207 @@
+import os
+import time
+import threading
+import traceback
+from collections import OrderedDict
+
+try:
+    import whisper
+except ImportError:
+    whisper = None
+
+# ===================== Config =====================
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE") or None  # None -> cuda varsa cuda, yoksa cpu
+WHISPER_MEMORY_BUDGET_MB = int(os.getenv("WHISPER_MEMORY_BUDGET_MB") or 2048)
+WHISPER_IDLE_TTL_SEC = int(os.getenv("WHISPER_IDLE_TTL_SEC") or 1800)
+# Virgülle ayrılmış model listesi, ör: "base" veya "base,small"
+WHISPER_WARMUP_MODELS = os.getenv("WHISPER_WARMUP_MODELS", WHISPER_MODEL_SIZE)
+
+
+def _resolve_device(device):
+    if device:
+        return device
+    if WHISPER_DEVICE:
+        return WHISPER_DEVICE
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+def _model_nbytes(model) -> int:
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    except Exception:
+        return 0
+
+
+class _Entry:
+    def __init__(self, model, nbytes: int):
+        self.model = model
+        self.nbytes = nbytes
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        # Whisper decode sırasında modele kv-cache hook'ları takıyor;
+        # aynı model nesnesi üzerinde eşzamanlı transcribe güvenli değil.
+        self.infer_lock = threading.Lock()
+
+
+class WhisperModelRegistry:
+    """
+    Process başına (model_size, device) çiftlerini bir kez yükler.
+    Transkripsiyon ana process'teki audio havuzunda çalışır; cpu worker'ları model yüklemez.
+    Bellek bütçesi aşılırsa veya model uzun süre boşta kalırsa
+    en eski kullanılan (LRU) modeller bellekten atılır.
+    """
+
+    def __init__(self, memory_budget_mb: int = WHISPER_MEMORY_BUDGET_MB, idle_ttl_sec: int = WHISPER_IDLE_TTL_SEC):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.idle_ttl = idle_ttl_sec
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "hits": 0, "evictions": 0, "load_seconds": 0.0, "load_errors": 0}
+
+    # ---------- İç yardımcılar ----------
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _evict_locked(self, keep=None):
+        """self._lock tutulurken çağrılır."""
+        now = time.monotonic()
+        for key in list(self._entries.keys()):
+            entry = self._entries[key]
+            if key != keep and entry.in_use == 0 and now - entry.last_used > self.idle_ttl:
+                del self._entries[key]
+                self._stats["evictions"] += 1
+
+        total = sum(e.nbytes for e in self._entries.values())
+        for key in list(self._entries.keys()):  # OrderedDict: en eski kullanılan başta
+            if total <= self.memory_budget:
+                break
+            entry = self._entries[key]
+            if key == keep or entry.in_use > 0:
+                continue
+            total -= entry.nbytes
+            del self._entries[key]
+            self._stats["evictions"] += 1
+
+    def _acquire(self, model_size: str, device: str) -> _Entry:
+        if whisper is None:
+            raise RuntimeError("whisper yüklü değil")
+        key = (model_size, device)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.in_use += 1
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                # Boşta kalan diğer modeller her kullanımda gözden geçirilir
+                self._evict_locked(keep=key)
+                return entry
+
+        # Aynı model için yalnızca bir thread yükleme yapar, diğerleri bekler
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.in_use += 1
+                    entry.last_used = time.monotonic()
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry
+
+            started = time.monotonic()
+            try:
+                model = whisper.load_model(model_size, device=device)
+            except Exception:
+                with self._lock:
+                    self._stats["load_errors"] += 1
+                raise
+            elapsed = time.monotonic() - started
+
+            with self._lock:
+                entry = _Entry(model, _model_nbytes(model))
+                entry.in_use = 1
+                self._entries[key] = entry
+                self._stats["loads"] += 1
+                self._stats["load_seconds"] += elapsed
+                self._evict_locked(keep=key)
+            print(f"Whisper modeli yüklendi: {model_size}/{device} ({elapsed:.1f}s)")
+            return entry
+
+    def _release(self, entry: _Entry):
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    # ---------- Public API ----------
+    def transcribe(self, audio_path: str, model_size: str = None, device: str = None, **kwargs) -> dict:
+        model_size = model_size or WHISPER_MODEL_SIZE
+        entry = self._acquire(model_size, _resolve_device(device))
+        try:
+            with entry.infer_lock:
+                return entry.model.transcribe(audio_path, **kwargs)
+        finally:
+            self._release(entry)
+
+    def warm_up(self, model_sizes=None, device: str = None):
+        if whisper is None:
+            return
+        for size in model_sizes or []:
+            try:
+                self._release(self._acquire(size, _resolve_device(device)))
+            except Exception as e:
+                print(f"Whisper warm-up hatası ({size}): {e}\n{traceback.format_exc()}")
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            before = len(self._entries)
+            self._evict_locked()
+            return before - len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                **self._stats,
+                "memory_budget_bytes": self.memory_budget,
+                "resident_bytes": sum(e.nbytes for e in self._entries.values()),
+                "models": [
+                    {"model_size": k[0], "device": k[1], "bytes": e.nbytes, "in_use": e.in_use}
+                    for k, e in self._entries.items()
+                ],
+            }
+
+
+registry = WhisperModelRegistry()
+
+
+def transcribe(audio_path: str, model_size: str = None, device: str = None, **kwargs) -> dict:
+    return registry.transcribe(audio_path, model_size=model_size, device=device, **kwargs)
+
+
+def warm_up_in_background():
+    """Uygulama açılışında modelleri arka planda yükler; ilk istek beklerse aynı yüklemeyi bekler."""
+    sizes = [s.strip() for s in WHISPER_WARMUP_MODELS.split(",") if s.strip()]
+    if whisper is None or not sizes:
+        return None
+    t = threading.Thread(target=registry.warm_up, args=(sizes,), name="whisper-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def evict_idle_models() -> int:
+    return registry.evict_idle()
+
+
+def whisper_stats() -> dict:
+    return registry.stats()
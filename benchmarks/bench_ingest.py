@@ -0,0 +1,473 @@
+"""
+Yükleme hattının (app/utils/compression.py, app/utils/extractors.py) benchmark'ı.
+
+Sentetik dosyaları yerelde üretir, her extract_text_* / compress_* fonksiyonunu
+ayrı bir process'te ölçer ve sonuçları JSON olarak yazar. İnternet gerekmez;
+kurulu olmayan araçlar (gs, ffmpeg, tesseract, pdftoppm, whisper modeli) atlanır.
+
+Kullanım (repo kökünden):
+    python benchmarks/bench_ingest.py --out bench.json
+    python benchmarks/bench_ingest.py --only compress --repeat 5 --baseline bench.json
+    python benchmarks/bench_ingest.py --only extract_text_from_pdf --profile prof/
+
+--profile her vaka için bir pstats dökümü yazar (ör. "python -m pstats prof/x.pstats" ile
+açılır). Profil yalnızca vakayı çalıştıran process'i görür: cpu havuzuna dağıtılan PDF
+sayfa/OCR işleri orada bekleme olarak görünür. Profil açıkken süreler de şişer.
+"""
+import os
+import sys
+import json
+import math
+import time
+import wave
+import array
+import random
+import shutil
+import pstats
+import cProfile
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+MB = 1024 * 1024
+_WORDS = ("analiz veri model sistem ders konu not sinav proje rapor ozet bolum kaynak yontem sonuc "
+          "deney olcum grafik tablo denklem teori ornek soru cevap hafta kitap makale").split()
+
+
+# ===================== Fixture üretimi =====================
+def _sentence(rng, n=12):
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path, pages, lines_per_page=50, seed=1):
+    """Metin katmanlı çok sayfalı PDF; harici kütüphane olmadan elle yazılır."""
+    rng = random.Random(seed)
+    bodies = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(pages):
+        lines = "".join(f"({_pdf_escape(_sentence(rng))}) Tj T*\n" for _ in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 14 TL 50 800 Td\n{lines}ET".encode("latin-1")
+        page_no = len(bodies) + 1
+        kids.append(f"{page_no} 0 R")
+        bodies.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_no + 1} 0 R >>".encode()
+        )
+        bodies.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    bodies[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    bodies[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, body in enumerate(bodies, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(bodies) + 1))
+        for off in offsets:
+            f.write(b"%010d 00000 n \n" % off)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(bodies) + 1, xref))
+
+
+def write_scanned_pdf(path, pages, dpi=150, seed=2):
+    """Metin katmanı olmayan, sayfaları görüntü olan PDF (taranmış belge benzeri)."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    try:
+        font = ImageFont.load_default(size=22)
+    except TypeError:  # eski Pillow
+        font = ImageFont.load_default()
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    images = []
+    for _ in range(pages):
+        img = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(img)
+        for y in range(80, height - 80, 34):
+            draw.text((70, y), _sentence(rng, 8), fill=0, font=font)
+        images.append(img.convert("RGB"))
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+
+
+def write_photo(path, megapixels, fmt):
+    """Gürültü + gradyanlı, fotoğrafa benzer sıkıştırılabilirlikte görsel."""
+    from PIL import Image
+
+    width = int(math.sqrt(megapixels * 1e6 * 4 / 3))
+    height = int(width * 3 / 4)
+    img = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((width, height)),
+        Image.effect_noise((width, height), 48),
+        Image.radial_gradient("L").resize((width, height)),
+    ])
+    if fmt == "JPEG":
+        img.save(path, "JPEG", quality=92)
+    else:
+        img.save(path, "PNG")
+
+
+def write_tone_wav(path, seconds, rate=16000):
+    """Frekansı kayan sinüs; 16 kHz mono 16 bit."""
+    samples = array.array("h")
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        freq = 220 + 180 * math.sin(2 * math.pi * 0.1 * t)
+        samples.append(int(12000 * math.sin(2 * math.pi * freq * t)))
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+
+
+def write_text(path, size_bytes, seed=4):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < size_bytes:
+            line = _sentence(rng, 16) + "\n"
+            f.write(line)
+            written += len(line)
+
+
+def _module_available(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def build_fixtures(workdir, args):
+    """{ad: {"path", "kind", "pages"?, "seconds"?}} döner; üretilemeyenler atlanır."""
+    fixtures = {}
+    for pages in args.pdf_pages:
+        path = os.path.join(workdir, f"text_{pages}p.pdf")
+        write_text_pdf(path, pages)
+        fixtures[f"text_pdf_{pages}p"] = {"path": path, "kind": "pdf", "pages": pages}
+
+    if _module_available("PIL"):
+        for pages in args.scanned_pages:
+            path = os.path.join(workdir, f"scanned_{pages}p.pdf")
+            write_scanned_pdf(path, pages)
+            fixtures[f"scanned_pdf_{pages}p"] = {"path": path, "kind": "pdf", "pages": pages}
+        for mp in args.image_mp:
+            for fmt, ext in (("JPEG", "jpg"), ("PNG", "png")):
+                path = os.path.join(workdir, f"photo_{mp:g}mp.{ext}")
+                write_photo(path, mp, fmt)
+                fixtures[f"{ext}_{mp:g}mp"] = {"path": path, "kind": "image"}
+
+    for seconds in args.wav_seconds:
+        path = os.path.join(workdir, f"tone_{seconds}s.wav")
+        write_tone_wav(path, seconds)
+        fixtures[f"wav_{seconds}s"] = {"path": path, "kind": "audio", "seconds": seconds}
+
+    for size_mb in args.text_mb:
+        path = os.path.join(workdir, f"text_{size_mb:g}mb.txt")
+        write_text(path, int(size_mb * MB))
+        fixtures[f"txt_{size_mb:g}mb"] = {"path": path, "kind": "text"}
+    return fixtures
+
+
+# ===================== Ölçülecek fonksiyonlar =====================
+_EXTRACT_MODULES = ("PIL", "pytesseract", "pdfplumber")
+_COMPRESS_MODULES = ("PIL", "PyPDF2")
+
+# hedef: (modül, fonksiyon, fixture türü, gereken python modülleri, gereken araçlar)
+TARGETS = {
+    "extract_text_from_pdf": ("extractors", "extract_text_from_pdf", "pdf", _EXTRACT_MODULES, ()),
+    "extract_text_from_image": ("extractors", "extract_text_from_image", "image", _EXTRACT_MODULES, ("tesseract",)),
+    "extract_text_from_audio": ("extractors", "extract_text_from_audio", "audio", _EXTRACT_MODULES + ("whisper",), ("ffmpeg",)),
+    "extract_text_from_txt": ("extractors", "extract_text_from_txt", "text", _EXTRACT_MODULES, ()),
+    "compress_image": ("compression", "compress_image", "image", _COMPRESS_MODULES, ()),
+    "compress_pdf": ("compression", "compress_pdf", "pdf", _COMPRESS_MODULES, ("gs",)),
+    "compress_audio": ("compression", "compress_audio", "audio", _COMPRESS_MODULES, ("ffmpeg",)),
+    "zip_any_file": ("compression", "zip_any_file", "*", _COMPRESS_MODULES, ()),
+    "store_zstd": ("compression", "store_with_codec", "*", _COMPRESS_MODULES + ("zstandard",), ()),
+}
+
+_OUT_EXT = {"compress_image": ".jpg", "compress_pdf": ".pdf", "compress_audio": ".mp3", "zip_any_file": ".zip"}
+
+
+def _tesseract_langs():
+    try:
+        out = subprocess.run(["tesseract", "--list-langs"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return set()
+    return {line.strip() for line in out.splitlines()[1:] if line.strip()}
+
+
+def _whisper_model_cached(model_size):
+    cache = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "whisper")
+    return os.path.exists(os.path.join(cache, f"{model_size}.pt"))
+
+
+def skip_reason(target, fixture, env):
+    """Ölçüm yapılamıyorsa nedenini, yapılabiliyorsa None döner."""
+    _, _, _, modules, tools = TARGETS[target]
+    for name in modules:
+        if not _module_available(name):
+            return f"python modülü yok: {name}"
+    for tool in tools:
+        if shutil.which(tool) is None:
+            return f"araç yok: {tool}"
+    scanned = "scanned" in fixture["path"]
+    if target == "extract_text_from_pdf" and scanned:
+        if shutil.which("pdftoppm") is None or shutil.which("tesseract") is None:
+            return "taranmış PDF için pdftoppm/tesseract gerekli"
+    if target == "extract_text_from_image" or (target == "extract_text_from_pdf" and scanned):
+        missing = {"tur", "eng"} - env["tesseract_langs"]
+        if missing:
+            return f"tesseract dil verisi yok: {','.join(sorted(missing))}"
+    if target == "extract_text_from_audio" and not _whisper_model_cached(env["whisper_model"]):
+        return f"whisper modeli önbellekte yok (çevrimdışı): {env['whisper_model']}"
+    return None
+
+
+def _rss_mb(who):
+    if resource is None:
+        return None
+    # Linux'ta ru_maxrss KB cinsinden
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def run_case(target, fixture, repeat, whisper_model, profile_path=None):
+    """
+    Temiz bir process'te çalışır: import maliyeti ve önceki vakaların belleği ölçüme karışmaz.
+    profile_path verilirse ölçülen çağrılar cProfile ile izlenir ve pstats dökümü oraya yazılır.
+    """
+    module_name, fn_name, _, _, _ = TARGETS[target]
+    module = importlib.import_module(f"app.utils.{module_name}")
+    fn = getattr(module, fn_name)
+    rss_before = _rss_mb(resource.RUSAGE_SELF) if resource else None
+
+    src = fixture["path"]
+    out_dir = tempfile.mkdtemp(prefix="bench-out-")
+    times, cpu_times, output_bytes, chars = [], [], None, None
+    profiler = cProfile.Profile() if profile_path else None
+    try:
+        for i in range(repeat):
+            out_path = os.path.join(out_dir, f"out{i}{_OUT_EXT.get(target, '')}")
+            if profiler:
+                profiler.enable()
+            started, cpu_started = time.perf_counter(), time.process_time()
+            if module_name == "extractors":
+                text = fn(src, model_size=whisper_model) if target == "extract_text_from_audio" else fn(src)
+                chars = len(text or "")
+            elif target == "store_zstd":
+                out_path = fn(src, out_path, module.CODEC_ZSTD)
+            else:
+                fn(src, out_path)
+            times.append(time.perf_counter() - started)
+            cpu_times.append(time.process_time() - cpu_started)
+            if profiler:
+                profiler.disable()
+            if module_name == "compression":
+                output_bytes = os.path.getsize(out_path)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        # cpu havuzunun worker'ları kapatılmazsa bu process çıkışta onları sonsuza dek bekler;
+        # kapatınca toplanırlar ve RSS'leri children_peak_rss_mb'ye de girer
+        from app.utils.executors import shutdown_executors
+        shutdown_executors()
+    if profiler:
+        profiler.dump_stats(profile_path)
+
+    return {
+        "times": times,
+        "cpu_times": cpu_times,
+        "output_bytes": output_bytes,
+        "chars": chars,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _rss_mb(resource.RUSAGE_SELF) if resource else None,
+        # gs/ffmpeg/tesseract/pdftoppm gibi alt process'lerin en yüksek RSS'i
+        "children_peak_rss_mb": _rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+        "profile": profile_path,
+    }
+
+
+def summarize(target, fixture_name, fixture, raw):
+    size = os.path.getsize(fixture["path"])
+    median = statistics.median(raw["times"])
+    result = {
+        "target": target,
+        "fixture": fixture_name,
+        "status": "ok",
+        "input_bytes": size,
+        "repeat": len(raw["times"]),
+        "seconds_median": round(median, 4),
+        "seconds_min": round(min(raw["times"]), 4),
+        "cpu_seconds_median": round(statistics.median(raw["cpu_times"]), 4),
+        "mb_per_s": round(size / MB / median, 3) if median else None,
+        "peak_rss_mb": raw["peak_rss_mb"] and round(raw["peak_rss_mb"], 1),
+        "rss_delta_mb": raw["peak_rss_mb"] and round(raw["peak_rss_mb"] - raw["rss_before_mb"], 1),
+        "children_peak_rss_mb": raw["children_peak_rss_mb"] and round(raw["children_peak_rss_mb"], 1),
+    }
+    # Sayfa hızı yalnızca çıkarıcılar için anlamlı; sıkıştırıcılar mb_per_s ile raporlanır
+    if fixture.get("pages") and TARGETS[target][0] == "extractors":
+        result["pages"] = fixture["pages"]
+        result["pages_per_s"] = round(fixture["pages"] / median, 3) if median else None
+    if fixture.get("seconds"):
+        result["realtime_factor"] = round(fixture["seconds"] / median, 3) if median else None
+    if raw["output_bytes"] is not None:
+        result["output_bytes"] = raw["output_bytes"]
+        result["ratio"] = round(raw["output_bytes"] / size, 4) if size else None
+    if raw["chars"] is not None:
+        result["chars"] = raw["chars"]
+    if raw["profile"]:
+        result["profile"] = raw["profile"]
+        result["hotspots"] = _hotspots(raw["profile"])
+    return result
+
+
+def _hotspots(profile_path, limit=5):
+    """Kendi süresi (tottime) en yüksek fonksiyonlar: darboğazı kimin yarattığı."""
+    stats = pstats.Stats(profile_path)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {"function": f"{os.path.relpath(file, ROOT) if file.startswith(ROOT) else file}:{line}({name})",
+         "self_seconds": round(tottime, 4), "cumulative_seconds": round(cumtime, 4), "calls": ncalls}
+        for (file, line, name), (_, ncalls, tottime, cumtime, _) in rows
+    ]
+
+
+# ===================== Çalıştırma =====================
+def _floats(value):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def _ints(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _print_row(r):
+    if r["status"] != "ok":
+        print(f"  {r['target']:<26} {r['fixture']:<18} {r['status']}: {r.get('reason', '')}")
+        return
+    extra = []
+    if "pages_per_s" in r:
+        extra.append(f"{r['pages_per_s']} sayfa/s")
+    if "ratio" in r:
+        extra.append(f"oran {r['ratio']}")
+    if "chars" in r:
+        extra.append(f"{r['chars']} karakter")
+    print(f"  {r['target']:<26} {r['fixture']:<18} {r['seconds_median']:>9.3f}s "
+          f"{r['mb_per_s'] or 0:>9.2f} MB/s  peak {r['peak_rss_mb'] or 0:>7.1f} MB  {'  '.join(extra)}")
+    for h in r.get("hotspots") or []:
+        print(f"      {h['self_seconds']:>8.3f}s self  {h['cumulative_seconds']:>8.3f}s cum  {h['function']}")
+
+
+def _print_baseline(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["target"], r["fixture"]): r for r in json.load(f)["results"] if r["status"] == "ok"}
+    print(f"\nKarşılaştırma ({baseline_path}), süre oranı <1 daha hızlı:")
+    for r in results:
+        old = baseline.get((r["target"], r["fixture"]))
+        if r["status"] != "ok" or not old or not old["seconds_median"]:
+            continue
+        speed = r["seconds_median"] / old["seconds_median"]
+        mem = (r["peak_rss_mb"] or 0) - (old["peak_rss_mb"] or 0)
+        print(f"  {r['target']:<26} {r['fixture']:<18} süre x{speed:.2f}  peak {mem:+.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="compression/extractors benchmark'ı")
+    parser.add_argument("--out", help="JSON sonuç dosyası (varsayılan: stdout'a yazılmaz)")
+    parser.add_argument("--only", default="", help="virgülle ayrılmış; hedef veya fixture adında geçen parçalar")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pdf-pages", type=_ints, default=[5, 50], help="metin PDF sayfa sayıları")
+    parser.add_argument("--scanned-pages", type=_ints, default=[3], help="taranmış PDF sayfa sayıları")
+    parser.add_argument("--image-mp", type=_floats, default=[0.3, 12, 48], help="görsel boyutları (megapiksel)")
+    parser.add_argument("--wav-seconds", type=_ints, default=[10, 60])
+    parser.add_argument("--text-mb", type=_floats, default=[1, 10])
+    parser.add_argument("--whisper-model", default=os.getenv("WHISPER_MODEL_SIZE", "base"))
+    parser.add_argument("--baseline", help="önceki bir JSON çıktısıyla karşılaştır")
+    parser.add_argument("--keep-fixtures", action="store_true")
+    parser.add_argument("--profile", metavar="DIR", help="her vaka için cProfile pstats dökümünü bu klasöre yaz")
+    args = parser.parse_args(argv)
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    only = [s.strip() for s in args.only.split(",") if s.strip()]
+    env = {"tesseract_langs": _tesseract_langs(), "whisper_model": args.whisper_model}
+    workdir = tempfile.mkdtemp(prefix="bench-fixtures-")
+    results = []
+    try:
+        print(f"Fixture'lar üretiliyor: {workdir}")
+        fixtures = build_fixtures(workdir, args)
+        ctx = multiprocessing.get_context("spawn")
+        for target, (_, _, kind, _, _) in TARGETS.items():
+            for fixture_name, fixture in fixtures.items():
+                if kind != "*" and fixture["kind"] != kind:
+                    continue
+                if only and not any(s in target or s in fixture_name for s in only):
+                    continue
+                reason = skip_reason(target, fixture, env)
+                if reason:
+                    row = {"target": target, "fixture": fixture_name, "status": "skipped", "reason": reason}
+                else:
+                    profile_path = (
+                        os.path.abspath(os.path.join(args.profile, f"{target}__{fixture_name}.pstats"))
+                        if args.profile else None
+                    )
+                    try:
+                        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                            raw = pool.submit(run_case, target, fixture, args.repeat, args.whisper_model,
+                                              profile_path).result()
+                        row = summarize(target, fixture_name, fixture, raw)
+                    except Exception as e:
+                        row = {"target": target, "fixture": fixture_name, "status": "error", "reason": repr(e)}
+                results.append(row)
+                _print_row(row)
+    finally:
+        if args.keep_fixtures:
+            print(f"Fixture'lar korundu: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "profiled": bool(args.profile),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Sonuçlar yazıldı: {args.out}")
+    if args.baseline:
+        _print_baseline(results, args.baseline)
+    return 0 if all(r["status"] != "error" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Postgres tam metin arama dizinini kurar: notes/files.search_vector kolonları,
+onları güncel tutan tetikleyiciler, eski satırların toplu doldurulması ve
+CREATE INDEX CONCURRENTLY ile GIN indeksleri.
+
+Uygulama açılışında çalışmaz; deploy'dan bağımsız, bir kez çalıştırılır. Tablo
+yeniden yazılmaz ve yazmalar durmaz. Yarıda kesilirse tekrar çalıştırmak güvenlidir.
+Bitene kadar /search LIKE ile çalışır; bittikten sonra uygulama worker'ları yeniden
+başlatılınca dizin kullanılır.
+
+Kullanım (repo kökünden, DATABASE_URL ayarlıyken):
+    python migrations/search_index.py
+    python migrations/search_index.py --batch-size 2000
+"""
+import os
+import sys
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.database import engine  # noqa: E402
+from app.utils.search import migrate_search_index  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Postgres arama dizini migration'ı")
+    parser.add_argument("--batch-size", type=int, default=5000, help="doldurmada transaction başına id aralığı")
+    args = parser.parse_args(argv)
+    migrate_search_index(engine, batch_size=args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
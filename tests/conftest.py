@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# app.database modül yüklenirken engine kurar; testler kendi SQLite engine'lerini açar
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# Depolama klasörleri import sırasında oluşturulur; repo köküne yazılmasın
+os.environ.setdefault("STORAGE_DIR", os.path.join(ROOT, ".pytest_cache", "storage"))
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Her test için boş şemalı, dosya tabanlı SQLite oturumu."""
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("dotenv")
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
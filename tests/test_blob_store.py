@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+for _module in ("sqlalchemy", "dotenv", "PIL", "PyPDF2", "pytesseract", "pdfplumber"):
+    pytest.importorskip(_module)
+
+from app.models import StoredBlob  # noqa: E402
+from app.utils import blob_store  # noqa: E402
+from app.utils.blob_store import (  # noqa: E402
+    BlobRefLost, acquire_ref, materialize_and_acquire, release_ref, remove_released,
+)
+
+SHA = "ab" * 32
+
+
+def _blob(db, tmp_path, ref_count):
+    path = tmp_path / f"{SHA}.txt"
+    path.write_bytes(b"icerik")
+    db.add(StoredBlob(sha256=SHA, size=6, mime="text/plain", stored_path=str(path), ref_count=ref_count))
+    db.commit()
+    return str(path)
+
+
+def _ref_count(db):
+    db.expire_all()
+    blob = db.query(StoredBlob).filter(StoredBlob.sha256 == SHA).first()
+    return None if blob is None else blob.ref_count
+
+
+def test_acquire_ref_increments_existing_blob_only(db, tmp_path):
+    assert acquire_ref(db, SHA) is False
+    _blob(db, tmp_path, ref_count=1)
+
+    assert acquire_ref(db, SHA) is True
+    db.commit()
+    assert _ref_count(db) == 2
+
+
+def test_release_of_shared_blob_only_decrements(db, tmp_path):
+    path = _blob(db, tmp_path, ref_count=2)
+
+    assert release_ref(db, SHA) is None
+    db.commit()
+
+    assert _ref_count(db) == 1
+    assert os.path.exists(path)
+
+
+def test_last_release_deletes_row_and_file_only_after_commit(db, tmp_path):
+    path = _blob(db, tmp_path, ref_count=1)
+
+    released = release_ref(db, SHA)
+    assert released == (SHA, path)
+    # Commit edilmeden dosyaya dokunulmaz
+    assert os.path.exists(path)
+    db.commit()
+    remove_released(db, [released])
+
+    assert _ref_count(db) is None
+    assert not os.path.exists(path)
+
+
+def test_rolled_back_release_keeps_ref_and_file(db, tmp_path):
+    path = _blob(db, tmp_path, ref_count=1)
+
+    release_ref(db, SHA)
+    # Çağıranın transaction'ı (File silme) başarısız oldu
+    db.rollback()
+
+    assert _ref_count(db) == 1
+    assert os.path.exists(path)
+
+
+def test_remove_released_keeps_file_of_blob_uploaded_again(db, tmp_path):
+    path = _blob(db, tmp_path, ref_count=1)
+    released = release_ref(db, SHA)
+    db.commit()
+    # Aynı içerik commit ile dosya silme arasında yeniden yüklendi
+    db.add(StoredBlob(sha256=SHA, size=6, mime="text/plain", stored_path=path, ref_count=1))
+    db.commit()
+
+    remove_released(db, [released])
+
+    assert os.path.exists(path)
+
+
+def test_materialize_and_acquire_rebuilds_blob_deleted_in_between(db, tmp_path, monkeypatch):
+    calls = []
+
+    def fake_materialize(db_, sha256, raw_path, original_filename, compress=None, mime=None):
+        calls.append(sha256)
+        if len(calls) == 2:
+            # İlk denemeden sonra blob son referansıyla silinmişti; ikinci deneme yeniden üretir
+            db_.add(StoredBlob(sha256=sha256, ref_count=0))
+            db_.commit()
+        return "blob", False, False
+
+    monkeypatch.setattr(blob_store, "materialize_blob", fake_materialize)
+
+    assert materialize_and_acquire(db, SHA, "raw", "a.txt") == ("blob", False, False)
+    db.commit()
+    assert len(calls) == 2
+    assert _ref_count(db) == 1
+
+
+def test_materialize_and_acquire_gives_up_after_one_retry(db, monkeypatch):
+    monkeypatch.setattr(blob_store, "materialize_blob", lambda *a, **k: ("blob", False, False))
+
+    with pytest.raises(BlobRefLost):
+        materialize_and_acquire(db, SHA, "raw", "a.txt")
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("pytesseract")
+pytest.importorskip("pdfplumber")
+
+from app.utils import extractors, pdf_pages  # noqa: E402
+from app.utils.executors import BoundedExecutor  # noqa: E402
+
+
+@pytest.fixture
+def thread_cpu_pool(monkeypatch):
+    # Process havuzu yerine thread'li eşdeğeri: sahte sayfa okuyucu worker'lara taşınabilsin
+    pool = BoundedExecutor("cpu", "thread", 4)
+    monkeypatch.setattr(pdf_pages, "cpu_pool", pool)
+    monkeypatch.setattr(extractors, "cpu_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_large_pdf_from_ingest_runs_on_several_cpu_workers(monkeypatch, thread_cpu_pool):
+    workers = set()
+    # Parçalar sırayla tek worker'da çalışsaydı bariyer dolmaz ve zaman aşımına düşerdi
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_range(filepath, start, end):
+        workers.add(threading.get_ident())
+        barrier.wait()
+        return [f"sayfa {i} metin katmanı yeterince uzun bir satır" for i in range(start, end)]
+
+    monkeypatch.setattr(pdf_pages, "count_pages", lambda filepath: 64)
+    monkeypatch.setattr(pdf_pages, "extract_page_range", fake_range)
+
+    # Yükleme ve yeniden çıkarma akışlarının kullandığı giriş noktası
+    text = extractors.submit_extraction("rapor.pdf", "application/pdf").result(timeout=30)
+
+    assert len(workers) > 1
+    assert thread_cpu_pool.stats()["completed"] >= 2
+    assert text.count("\n") == 63
+    assert text.startswith("sayfa 0 ")
+
+
+def test_small_pdf_is_a_single_shard(monkeypatch, thread_cpu_pool):
+    calls = []
+
+    def fake_range(filepath, start, end):
+        calls.append((start, end))
+        return ["x" * 40] * (end - start)
+
+    monkeypatch.setattr(pdf_pages, "extract_page_range", fake_range)
+
+    assert pdf_pages.extract_native_pages("kisa.pdf", page_count=5) == ["x" * 40] * 5
+    assert calls == [(0, 5)]
+
+
+def test_scanned_pages_are_ocred_on_several_cpu_workers(monkeypatch, thread_cpu_pool):
+    workers = set()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_ocr(filepath, page_index):
+        workers.add(threading.get_ident())
+        barrier.wait()
+        return f"taranmış sayfa {page_index} için OCR metni"
+
+    # Metin katmanı yok: her sayfa OCR hedefi
+    monkeypatch.setattr(extractors, "extract_native_pages", lambda filepath: [""] * 6)
+    monkeypatch.setattr(extractors, "convert_from_path", object())
+    monkeypatch.setattr(extractors, "ocr_pdf_page", fake_ocr)
+
+    text = extractors.submit_extraction("tarama.pdf", "application/pdf").result(timeout=30)
+
+    assert len(workers) > 1
+    assert text.splitlines() == [f"taranmış sayfa {i} için OCR metni" for i in range(6)]
@@ -0,0 +1,61 @@
+import pytest
+
+for _module in ("sqlalchemy", "dotenv", "numpy", "PIL", "PyPDF2", "pytesseract", "pdfplumber"):
+    pytest.importorskip(_module)
+
+from app.models import File, RetrievalChunk, StoredBlob  # noqa: E402
+from app.utils import folder_content  # noqa: E402
+from app.utils.extractors import EXTRACTOR_VERSION  # noqa: E402
+from app.utils.retrieval import index_file  # noqa: E402
+
+
+def _file(db, text, version):
+    f = File(folder_id=1, user_id=1, filename="rapor.pdf", filepath="yok.pdf", filetype="application/pdf",
+             extracted_text=text, extractor_version=version)
+    db.add(f)
+    db.commit()
+    index_file(db, f)
+    return f
+
+
+def _chunk_text(db, f):
+    db.expire_all()
+    return " ".join(c.text for c in db.query(RetrievalChunk).filter(
+        RetrievalChunk.source_type == "file", RetrievalChunk.source_id == f.id).order_by(RetrievalChunk.chunk_index))
+
+
+def test_reextracted_text_is_reindexed(db, tmp_path, monkeypatch):
+    src = tmp_path / "rapor.pdf"
+    src.write_bytes(b"%PDF")
+    f = _file(db, "eski çıkarıcının bozuk metni", EXTRACTOR_VERSION - 1)
+    f.filepath = str(src)
+    f.storage_codec = "store"
+    db.commit()
+
+    class _Done:
+        def result(self):
+            return "yeni çıkarıcının doğru metni"
+
+    monkeypatch.setattr(folder_content, "submit_extraction", lambda path, mime: _Done())
+
+    assert folder_content.file_text(db, f) == "yeni çıkarıcının doğru metni"
+    assert "doğru metni" in _chunk_text(db, f)
+    assert "bozuk" not in _chunk_text(db, f)
+
+
+def test_text_copied_from_shared_blob_is_reindexed(db):
+    db.add(StoredBlob(sha256="cd" * 32, extracted_text="paylaşılan güncel metin", extractor_version=EXTRACTOR_VERSION))
+    db.commit()
+    f = _file(db, "eski metin", EXTRACTOR_VERSION - 1)
+    f.blob_sha256 = "cd" * 32
+    db.commit()
+
+    assert folder_content.file_text(db, f) == "paylaşılan güncel metin"
+    assert "paylaşılan güncel metin" in _chunk_text(db, f)
+
+
+def test_missing_source_keeps_text_and_chunks(db):
+    f = _file(db, "korunan metin", EXTRACTOR_VERSION - 1)
+
+    assert folder_content.refresh_extracted_text(db, f) == "korunan metin"
+    assert "korunan metin" in _chunk_text(db, f)
@@ -0,0 +1,86 @@
+import io
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.utils.http_range import ranged_response  # noqa: E402
+
+BODY = bytes(range(256)) * 4
+ETAG = '"v1"'
+MTIME = 1_700_000_000.0
+
+app = FastAPI()
+
+
+@app.get("/blob")
+def blob(request: Request):
+    return ranged_response(request, lambda: io.BytesIO(BODY), len(BODY), "application/octet-stream",
+                           ETAG, MTIME, filename="örnek.bin")
+
+
+client = TestClient(app)
+
+
+def test_full_body_without_range():
+    r = client.get("/blob")
+
+    assert r.status_code == 200
+    assert r.content == BODY
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["etag"] == ETAG
+    assert r.headers["content-length"] == str(len(BODY))
+
+
+@pytest.mark.parametrize("header,start,end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=1000-", 1000, len(BODY) - 1),
+    ("bytes=-24", len(BODY) - 24, len(BODY) - 1),
+    ("bytes=1020-5000", 1020, len(BODY) - 1),  # dosya sonunu aşan uç kırpılır
+])
+def test_range_returns_206_with_slice(header, start, end):
+    r = client.get("/blob", headers={"Range": header})
+
+    assert r.status_code == 206
+    assert r.content == BODY[start:end + 1]
+    assert r.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert r.headers["content-length"] == str(end - start + 1)
+
+
+def test_unsatisfiable_range_is_416():
+    r = client.get("/blob", headers={"Range": f"bytes={len(BODY)}-"})
+
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_if_range_with_stale_etag_sends_full_body():
+    r = client.get("/blob", headers={"Range": "bytes=0-9", "If-Range": '"eski"'})
+
+    assert r.status_code == 200
+    assert r.content == BODY
+
+
+@pytest.mark.parametrize("headers", [
+    {"If-None-Match": ETAG},
+    {"If-None-Match": f'"baska", {ETAG}'},
+    {"If-None-Match": "*"},
+    {"If-Modified-Since": "Tue, 14 Nov 2023 22:13:20 GMT"},
+])
+def test_matching_validators_return_304(headers):
+    r = client.get("/blob", headers=headers)
+
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == ETAG
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    r = client.get("/blob", headers={"If-None-Match": '"eski"', "If-Modified-Since": "Tue, 14 Nov 2023 22:13:20 GMT"})
+
+    assert r.status_code == 200
+    assert r.content == BODY
@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+for _module in ("sqlalchemy", "dotenv", "numpy", "PIL", "PyPDF2", "pytesseract", "pdfplumber"):
+    pytest.importorskip(_module)
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import IngestJob  # noqa: E402
+from app.utils import ingest_queue  # noqa: E402
+from app.utils.ingest_queue import _claim_next, requeue_orphaned_jobs  # noqa: E402
+
+ME = f"{ingest_queue._HOST}:{os.getpid()}"
+
+
+def _job(db, job_id, minutes_ago, status="queued", attempts=0, claimed_by=None, started_at=None):
+    db.add(IngestJob(
+        id=job_id, folder_id=1, original_filename=f"{job_id}.txt", raw_path=f"/tmp/{job_id}",
+        status=status, attempts=attempts, claimed_by=claimed_by, started_at=started_at,
+        created_at=datetime.utcnow() - timedelta(minutes=minutes_ago),
+    ))
+    db.commit()
+
+
+def _get(db, job_id):
+    db.expire_all()
+    return db.query(IngestJob).filter(IngestJob.id == job_id).first()
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", ""])
+    proc.wait()
+    return proc.pid
+
+
+@pytest.fixture
+def own_sessions(db, monkeypatch):
+    # requeue_orphaned_jobs kendi oturumunu açar; testin SQLite dosyasına yönlendirilir
+    monkeypatch.setattr(ingest_queue, "SessionLocal", sessionmaker(bind=db.get_bind()))
+
+
+def test_claim_takes_oldest_queued_job_once(db):
+    _job(db, "yeni", minutes_ago=1)
+    _job(db, "eski", minutes_ago=5)
+
+    first = _claim_next(db)
+    second = _claim_next(db)
+
+    assert (first.id, second.id) == ("eski", "yeni")
+    assert first.status == "running"
+    assert first.attempts == 1
+    assert first.claimed_by == ME
+    assert first.started_at is not None
+    assert _claim_next(db) is None
+
+
+def test_claim_skips_fresh_running_but_takes_stale_one(db):
+    stale = datetime.utcnow() - timedelta(seconds=ingest_queue.INGEST_JOB_TIMEOUT_SEC + 60)
+    _job(db, "taze", minutes_ago=10, status="running", attempts=1, claimed_by="baska:1", started_at=datetime.utcnow())
+    _job(db, "bayat", minutes_ago=5, status="running", attempts=1, claimed_by="baska:2", started_at=stale)
+
+    job = _claim_next(db)
+
+    assert job.id == "bayat"
+    assert job.attempts == 2
+    assert job.claimed_by == ME
+    assert _claim_next(db) is None
+
+
+def test_requeue_returns_dead_local_jobs_only(db, own_sessions):
+    host = ingest_queue._HOST
+    _job(db, "olu", minutes_ago=3, status="running", attempts=2, claimed_by=f"{host}:{_dead_pid()}",
+         started_at=datetime.utcnow())
+    _job(db, "canli", minutes_ago=2, status="running", attempts=1, claimed_by=f"{host}:{os.getppid()}",
+         started_at=datetime.utcnow())
+    _job(db, "uzak", minutes_ago=1, status="running", attempts=1, claimed_by="baska-makine:1",
+         started_at=datetime.utcnow())
+
+    assert requeue_orphaned_jobs() == 1
+
+    dead = _get(db, "olu")
+    assert dead.status == "queued"
+    # Yeniden başlatma işin hatası değil; deneme hakkı iade edilir
+    assert dead.attempts == 1
+    assert dead.claimed_by is None and dead.started_at is None
+    assert _get(db, "canli").status == "running"
+    assert _get(db, "uzak").status == "running"
+
+
+def test_requeue_treats_own_pid_as_previous_process(db, own_sessions):
+    # Açılışta aynı pid'le kayıtlı iş, pid'i tekrar kullanılan ölü process'ten kalmıştır
+    _job(db, "onceki", minutes_ago=1, status="running", attempts=1, claimed_by=ME, started_at=datetime.utcnow())
+
+    assert requeue_orphaned_jobs() == 1
+    assert _get(db, "onceki").status == "queued"
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+for _module in ("sqlalchemy", "dotenv", "fastapi", "openai", "requests", "numpy",
+                "PIL", "PyPDF2", "pytesseract", "pdfplumber"):
+    pytest.importorskip(_module)
+
+# app.ai import sırasında anahtarı zorunlu tutar; testlerde istek atılmaz
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.ai import clean_ai_response  # noqa: E402
+from app.utils.llm_stream import ThinkStripper  # noqa: E402
+
+SAMPLES = [
+    "Düz yanıt, etiket yok.",
+    "<think>plan yapıyorum</think>\n\n  Asıl yanıt burada.",
+    "Giriş <THINK>büyük harf</Think> sonuç",
+    "a<think>1</think>b<think>2</think>c",
+    "Cevap: x < y ve <thin olmayan etiket",
+    "Önce metin <think>kapanmayan düşünce...",
+    "  <think></think>  ",
+    "<think>iç içe <think>gibi</think> kalan</think> son",
+]
+
+
+def _stream(chunks):
+    stripper = ThinkStripper()
+    out = "".join(stripper.feed(chunk) for chunk in chunks) + stripper.finish()
+    # stream_chat_completion tam metni bu şekilde kırpar
+    return out.strip()
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_whole_text_matches_clean_ai_response(text):
+    assert _stream([text]) == clean_ai_response(text)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_every_two_chunk_split_matches(text):
+    # Etiketler her noktadan bölünür: "<thi" + "nk>" gibi yarım gelen parçalar
+    expected = clean_ai_response(text)
+    for i in range(len(text) + 1):
+        assert _stream([text[:i], text[i:]]) == expected, (text[:i], text[i:])
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_char_by_char_stream_matches(text):
+    assert _stream(list(text)) == clean_ai_response(text)
+
+
+def test_think_text_is_never_emitted_mid_stream():
+    stripper = ThinkStripper()
+    emitted = [stripper.feed(chunk) for chunk in ["Merhaba <th", "ink>gizli", " düşünce</th", "ink> dünya"]]
+
+    assert "gizli" not in "".join(emitted)
+    assert emitted[0] == "Merhaba "
+    assert "".join(emitted) + stripper.finish() == "Merhaba  dünya"
@@ -0,0 +1,88 @@
+import sys
+import time
+import types
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+from app.utils import pdf_pages  # noqa: E402
+from app.utils.executors import BoundedExecutor  # noqa: E402
+
+
+class _FakePage:
+    def __init__(self, text, delay=0.0):
+        self.text = text
+        self.delay = delay
+
+    def extract_text(self):
+        time.sleep(self.delay)
+        return self.text
+
+    def flush_cache(self):
+        pass
+
+
+class _FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def thread_cpu_pool(monkeypatch):
+    pool = BoundedExecutor("cpu", "thread", 4)
+    monkeypatch.setattr(pdf_pages, "cpu_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGALRM yok")
+def test_slow_page_is_blanked_and_the_rest_is_read(monkeypatch):
+    pages = [_FakePage("birinci"), _FakePage("takılan", delay=5), _FakePage("üçüncü")]
+    monkeypatch.setattr(pdf_pages, "pdfplumber", types.SimpleNamespace(open=lambda path: _FakePdf(pages)))
+    monkeypatch.setattr(pdf_pages, "PDF_PAGE_TIMEOUT_SEC", 0.2)
+
+    started = time.monotonic()
+    texts = pdf_pages.extract_page_range("x.pdf", 0, 3)
+
+    assert texts == ["birinci", "", "üçüncü"]
+    assert time.monotonic() - started < 2
+
+
+def test_shards_lost_to_a_broken_pool_are_reread(monkeypatch, thread_cpu_pool):
+    failed = set()
+
+    def flaky_range(filepath, start, end):
+        # Her parçanın ilk denemesi havuz çökmüş gibi düşer
+        if start not in failed and start % 16 == 0:
+            failed.add(start)
+            raise BrokenProcessPool("worker öldü")
+        return [f"p{i}" for i in range(start, end)]
+
+    monkeypatch.setattr(pdf_pages, "extract_page_range", flaky_range)
+
+    pages = pdf_pages.extract_native_pages("x.pdf", page_count=64)
+
+    assert failed
+    assert pages == [f"p{i}" for i in range(64)]
+
+
+def test_failed_shard_keeps_page_order(monkeypatch, thread_cpu_pool):
+    def broken_range(filepath, start, end):
+        if start == 8:
+            raise ValueError("bozuk sayfa")
+        return [f"p{i}" for i in range(start, end)]
+
+    monkeypatch.setattr(pdf_pages, "extract_page_range", broken_range)
+
+    pages = pdf_pages.extract_native_pages("x.pdf", page_count=64)
+
+    assert len(pages) == 64
+    assert pages[7] == "p7" and pages[8:16] == [""] * 8 and pages[16] == "p16"
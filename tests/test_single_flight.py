@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.single_flight import SingleFlight, flight_key
+
+
+def test_concurrent_sync_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def upstream():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "yanıt"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", upstream)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", upstream))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    # Takipçiler uçuştaki çağrıya katılana kadar bekle
+    deadline = time.monotonic() + 5
+    while flight.stats()["coalesce_hits"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert calls == [1]
+    assert results == ["yanıt"] * 4
+    assert flight.stats() == {"leaders": 1, "coalesce_hits": 3, "in_flight": 0}
+
+
+def test_leader_error_reaches_followers_and_key_is_released():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream hata")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["coalesce_hits"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert errors == ["upstream hata", "upstream hata"]
+    # Hata saklanmaz; sonraki çağrı yeniden dener
+    assert flight.do("k", lambda: "tekrar") == "tekrar"
+
+
+def test_async_callers_share_one_call_even_if_leader_disconnects():
+    flight = SingleFlight()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "deste"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.ado("k", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", upstream))
+        await asyncio.sleep(0)
+        # Liderin istemcisi bağlantıyı kapattı
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "deste"
+    assert calls == [1]
+
+
+def test_bypass_callers_do_not_join_cached_flight():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def cached_leader():
+        started.set()
+        release.wait(5)
+        return "önbellekten"
+
+    t = threading.Thread(target=lambda: results.setdefault("cached", flight.do(flight_key("k"), cached_leader)))
+    t.start()
+    assert started.wait(5)
+    # no_cache isteği aynı önbellek anahtarıyla gelir ama taze sonuç almalı
+    results["bypass"] = flight.do(flight_key("k", use_cache=False), lambda: "taze")
+    release.set()
+    t.join(5)
+
+    assert results == {"cached": "önbellekten", "bypass": "taze"}
+    assert flight.stats()["coalesce_hits"] == 0
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_flight_key_is_stable_per_mode(use_cache):
+    assert flight_key("abc", use_cache) == flight_key("abc", use_cache)
+    assert flight_key("abc", True) != flight_key("abc", False)
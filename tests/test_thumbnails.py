@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("PyPDF2")
+
+from PIL import Image  # noqa: E402
+
+from app.utils.thumbnails import _image_thumbnail  # noqa: E402
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "WEBP"])
+def test_transparent_areas_become_white(tmp_path, fmt):
+    src = tmp_path / f"logo.{fmt.lower()}"
+    img = Image.new("RGBA", (400, 200), (0, 0, 0, 0))
+    img.paste((200, 0, 0, 255), (150, 50, 250, 150))
+    img.save(src, fmt)
+    out = tmp_path / "thumb.jpg"
+
+    _image_thumbnail(str(src), str(out), 128)
+
+    with Image.open(out) as thumb:
+        assert thumb.mode == "RGB"
+        assert max(thumb.size) == 128
+        assert all(c > 240 for c in thumb.getpixel((2, 2)))
+        r, g, b = thumb.getpixel((thumb.width // 2, thumb.height // 2))
+        assert r > 150 and g < 60 and b < 60